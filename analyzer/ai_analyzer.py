@@ -1,124 +1,174 @@
 # -*- coding: utf-8 -*-
-import subprocess
 import re
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Callable, List, Optional
 
+from config_manager import config
+from llm_backend import get_backend
+from llm_cache import llm_cache
+from llm_telemetry import llm_telemetry
+from prompt_digest import build_summary_digest, build_target_digest, latest_change, main_flow_total, pack_batches
 
-def call_ai(prompt):
-    """调用 AI CLI 执行分析"""
-    # Qoder CLI 路径
-    qodercli_path = "/Applications/Qoder.app/Contents/Resources/app/resources/bin/aarch64_darwin/qodercli"
-
-    try:
-        # 使用 qodercli 进行分析
-        result = subprocess.run(
-            [qodercli_path, "-p", prompt],
-            capture_output=True,
-            text=True,
-            timeout=180
-        )
-        if result.returncode == 0:
-            response = result.stdout.strip()
-            # 检查返回内容是否为拒绝回答
-            refuse_patterns = [
-                r"我是Qoder.*软件工程",
-                r"无法提供.*投资建议",
-                r"没有.*金融.*能力",
-                r"不属于.*专业范围"
-            ]
-            for pattern in refuse_patterns:
-                if re.search(pattern, response):
-                    # Qoder拒绝回答，使用规则模板
-                    return None
-            return response
-        else:
-            return f"*AI 分析调用失败: {result.stderr}*"
-    except FileNotFoundError:
-        return "*Qoder CLI 未找到，跳过 AI 分析*"
-    except subprocess.TimeoutExpired:
-        return "*AI 分析超时*"
-    except Exception as e:
-        return f"*AI 分析出错: {e}*"
-
-
-def generate_rule_based_analysis(name, data):
-    """基于规则生成简单分析（当AI不可用时使用）"""
-    # 提取关键数据
+
+class AIPool:
+    """AI 调用执行池
+
+    1. 相互独立的提示词在线程池中并发执行（线程只是等待 AI 后端的子进程或 HTTP 响应），最多 max_workers 个同时进行
+    2. 单次调用的超时为 AI_CALL_TIMEOUT，且不超过整次运行的截止时间（start_run() 之后 AI_RUN_DEADLINE 秒）
+    3. 结果按提交顺序取回；截止时间到达时仍未完成的调用取消，改用各自的规则模板（fallback）
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, call_timeout: Optional[float] = None,
+                 run_deadline: Optional[float] = None):
+        self.max_workers = max_workers or config.ai_max_workers
+        self.call_timeout = call_timeout or config.ai_call_timeout
+        self.run_deadline = run_deadline or config.ai_run_deadline
+        self._deadline: Optional[float] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def start_run(self):
+        """开始一次运行：截止时间从现在起算"""
+        self._deadline = time.monotonic() + self.run_deadline
+
+    def remaining(self) -> Optional[float]:
+        """距整次运行截止的秒数（未调用 start_run 时为 None）"""
+        return None if self._deadline is None else self._deadline - time.monotonic()
+
+    def timeout_for_call(self) -> float:
+        """单次调用可用的超时：AI_CALL_TIMEOUT 与剩余时间中较小者"""
+        remaining = self.remaining()
+        return self.call_timeout if remaining is None else max(0.0, min(self.call_timeout, remaining))
+
+    def submit(self, fn: Callable, *args) -> Future:
+        """提交一个 AI 任务（fn 内部调用 call_ai）"""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="ai")
+            return self._executor.submit(fn, *args)
+
+    def result(self, future: Future, fallback: Callable[[], str]):
+        """等待任务结果，截止时间到达或任务出错时返回 fallback()"""
+        remaining = self.remaining()
+        try:
+            return future.result(timeout=None if remaining is None else max(0.0, remaining))
+        except FutureTimeout:
+            future.cancel()
+            print("AI 分析已到达本次运行的截止时间，使用规则模板")
+        except Exception as e:
+            print(f"AI 分析出错，使用规则模板: {e}")
+        return fallback()
+
+    def map(self, fn: Callable, items: List, fallback: Callable) -> List:
+        """并发执行 fn(item)，按 items 的顺序返回结果（未完成的为 fallback(item)）"""
+        futures = [self.submit(fn, item) for item in items]
+        return [self.result(future, lambda item=item: fallback(item)) for future, item in zip(futures, items)]
+
+    def shutdown(self):
+        """取消尚未开始的任务（正在进行的子进程由各自的超时结束）"""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+        self._deadline = None
+
+
+# 全局实例
+ai_pool = AIPool()
+
+
+def call_ai(prompt, kind=None, accept=None):
+    """调用 AI 后端（LLM_BACKEND：常驻 HTTP 服务或命令行）执行分析
+
+    - kind 为提示词类型（"target"、"summary"、"index"、"cyclical"），按 LLM_CACHE_TTL 复用缓存的回答；
+      为 None 时不使用缓存。accept 不为 None 时，只缓存 accept(回答) 为真的回答（如能按格式解析的批量回答）
+    - 超时不超过本次运行的剩余时间，已到截止时间时返回 None
+    - 拒绝回答时返回 None（同样会缓存），超时或调用失败时返回错误说明（不缓存）
+    - 每次调用的字节数、耗时和结果记录到 llm_telemetry
+    """
+    backend = get_backend()
+    if kind is not None:
+        hit, cached = llm_cache.get(prompt, kind, backend.identity)
+        if hit:
+            llm_telemetry.record(kind, backend.identity, prompt, "cache_hit" if cached is not None else "cache_refused", cached)
+            return cached
+
+    timeout = ai_pool.timeout_for_call()
+    if timeout <= 0:
+        # 已到达本次运行的截止时间，由调用方使用规则模板
+        llm_telemetry.record(kind, backend.identity, prompt, "deadline")
+        return None
+
+    started = time.monotonic()
+    completion = backend.complete(prompt, timeout)
+    llm_telemetry.record(kind, backend.identity, prompt, completion.status, completion.text,
+                         time.monotonic() - started, completion.exit_code, completion.refusal)
+    response = completion.text
+    if kind is not None and completion.status in ("ok", "refused") and (accept is None or response is None or accept(response)):
+        llm_cache.put(prompt, kind, backend.identity, response)
+    return response
+
+
+def generate_rule_based_analysis(name, status):
+    """基于规则生成简单分析（当AI不可用时使用，读取 generate_target_report 返回的结构化数据）"""
     analysis_parts = []
-    
-    # 尝试从数据中提取涨跌幅信息
-    change_pattern = r'涨跌幅[:：]\s*([-\d.]+)%'
-    matches = re.findall(change_pattern, data)
-    
-    # 尝试提取主力资金流向
-    flow_pattern = r'主力净流入[:：]\s*([-\d.]+)'
-    flow_matches = re.findall(flow_pattern, data)
+    change = latest_change(status)
+    # 最近3天主力资金净流入合计（亿元）
+    flow = main_flow_total(status)
+    total_flow = flow / 100000000 if flow is not None else None
     
     # 生成分析
-    if name == "沪深300":
+    if "沪深" in name and "300" in name:
         analysis_parts.append(f"**{name}市场分析**：")
-        if matches:
-            try:
-                change = float(matches[0])
-                if change < 0:
-                    analysis_parts.append(f"今日下跌{abs(change):.2f}%，")
-                else:
-                    analysis_parts.append(f"今日上涨{change:.2f}%，")
-            except:
-                pass
+        if change is not None:
+            if change < 0:
+                analysis_parts.append(f"今日下跌{abs(change):.2f}%，")
+            else:
+                analysis_parts.append(f"今日上涨{change:.2f}%，")
         analysis_parts.append("市场整体表现较为震荡。")
-        if flow_matches:
-            try:
-                total_flow = sum(float(f) for f in flow_matches[:3]) / 100000000
-                if total_flow < 0:
-                    analysis_parts.append(f"近期主力资金呈净流出状态，累计约{total_flow:.0f}亿元。")
-                else:
-                    analysis_parts.append(f"近期主力资金呈净流入状态。")
-            except:
-                pass
+        if total_flow is not None:
+            if total_flow < 0:
+                analysis_parts.append(f"近期主力资金呈净流出状态，累计约{abs(total_flow):.0f}亿元。")
+            else:
+                analysis_parts.append(f"近期主力资金呈净流入状态。")
     elif "白酒" in name:
         analysis_parts.append(f"**{name}分析**：")
-        if matches:
-            try:
-                change = float(matches[0])
-                if change < 0:
-                    analysis_parts.append(f"近期下跌{abs(change):.2f}%，")
-                else:
-                    analysis_parts.append(f"近期上涨{change:.2f}%，")
-            except:
-                pass
+        if change is not None:
+            if change < 0:
+                analysis_parts.append(f"近期下跌{abs(change):.2f}%，")
+            else:
+                analysis_parts.append(f"近期上涨{change:.2f}%，")
         analysis_parts.append("建议关注消费板块政策和行业基本面变化。")
     elif "银行" in name:
         analysis_parts.append(f"**{name}分析**：")
-        if matches:
-            try:
-                change = float(matches[0])
-                if change < 0:
-                    analysis_parts.append(f"近期回调{abs(change):.2f}%，")
-                else:
-                    analysis_parts.append(f"近期上涨{change:.2f}%，")
-            except:
-                pass
-        if flow_matches:
-            try:
-                total_flow = sum(float(f) for f in flow_matches[:3]) / 100000000
-                if total_flow < 0:
-                    analysis_parts.append(f"主力资金净流出约{abs(total_flow):.0f}亿元，需关注资金面变化。")
-            except:
-                pass
+        if change is not None:
+            if change < 0:
+                analysis_parts.append(f"近期回调{abs(change):.2f}%，")
+            else:
+                analysis_parts.append(f"近期上涨{change:.2f}%，")
+        if total_flow is not None and total_flow < 0:
+            analysis_parts.append(f"主力资金净流出约{abs(total_flow):.0f}亿元，需关注资金面变化。")
     else:
         analysis_parts.append(f"**{name}简析**：")
-        if matches:
+        if change is not None:
             analysis_parts.append("关注近期走势和资金流向。")
     
+    # 成交量特征
+    volume = status.get("volume_analysis")
+    if volume and "error" not in volume and volume.get("成交量状态") != "正常":
+        analysis_parts.append(f"成交量{volume['成交量状态']}（{volume['量价关系类型']}）。")
+    
     # 添加风险提示
     analysis_parts.append("\n*注：此分析基于规则模板生成，仅供参考，投资需谨慎。*")
     
     return "".join(analysis_parts)
 
 
-def ai_analyze_target(name, data):
-    """为单个标的调用 AI 进行分析"""
-    prompt = f"""你是我的资本市场分析助手，拥有丰富的炒股实战经验，尤其对A股市场风格有深刻的理解。请基于以下 {name} 的市场数据，给出专业的投资分析和可落地的实施方案建议：
+def target_prompt(name, data):
+    """单个标的的分析提示词（data 为 build_target_digest() 的数据要点）"""
+    return f"""你是我的资本市场分析助手，拥有丰富的炒股实战经验，尤其对A股市场风格有深刻的理解。请基于以下 {name} 的市场数据，给出专业的投资分析和可落地的实施方案建议：
 
 {data}
 
@@ -128,42 +178,169 @@ def ai_analyze_target(name, data):
 3. 结合A股市场特点，给出具体可操作的实施方案建议
 
 请用中文回答，保持客观专业，控制在200字以内。"""
-    result = call_ai(prompt)
+
+
+def ai_analyze_target(name, status):
+    """为单个标的调用 AI 进行分析（status 为 generate_target_report 返回的结构化数据）"""
+    result = call_ai(target_prompt(name, build_target_digest(name, status)), kind="target")
     # 如果AI返回None（拒绝回答），使用规则模板
     if result is None:
-        return generate_rule_based_analysis(name, data)
+        return generate_rule_based_analysis(name, status)
     return result
 
 
-def ai_analyze_summary(full_content):
-    """为全市场和多标的关联调用 AI 进行综合总结"""
+# 分隔行允许被 Markdown 加粗（**<<<标的1：名称>>>**）
+_BATCH_HEADER = re.compile(r"^\s*(?:\*\*)?\s*<<<\s*标的\s*(\d+)\s*[:：][^>]*>>>\s*(?:\*\*)?\s*$", re.MULTILINE)
+_BATCH_END = re.compile(r"^\s*(?:\*\*)?\s*<<<\s*结束\s*>>>\s*(?:\*\*)?\s*$", re.MULTILINE)
+
+
+def parse_batch_response(response, count):
+    """按 <<<标的N：名称>>> 分隔符拆分批量回答
+
+    Returns:
+        {序号(从 1 开始): 分析内容}，只包含内容非空的标的
+    """
+    response = _BATCH_END.split(response)[0]
+    headers = list(_BATCH_HEADER.finditer(response))
+    sections = {}
+    for i, header in enumerate(headers):
+        index = int(header.group(1))
+        end = headers[i + 1].start() if i + 1 < len(headers) else len(response)
+        text = response[header.end():end].strip()
+        if 1 <= index <= count and text and index not in sections:
+            sections[index] = text
+    return sections
+
+
+def ai_analyze_target_batch(items):
+    """在一个提示词中分析多个标的
+
+    Args:
+        items: [(名称, 结构化数据)]
+    Returns:
+        {名称: 分析}，只包含成功解析出的标的（其余由调用方逐个分析）；
+        AI 拒绝回答时全部使用规则模板
+
+    解析出的每个标的按其单标的提示词写入缓存，之后逐个分析或换批组合时直接命中；
+    回答完全不符合分隔格式时记录该后端，之后的运行不再批量（见 submit_target_analyses）。
+    """
+    if len(items) == 1:
+        name, status = items[0]
+        return {name: ai_analyze_target(name, status)}
+    identity = get_backend().identity
+    if llm_cache.batch_unsupported(identity):
+        # 同一次运行中其他批次已发现格式不符
+        return {}
+
+    digests = [build_target_digest(name, status) for name, status in items]
+    blocks = "\n\n".join(
+        f"<<<标的{i}：{name}>>>\n{digest}"
+        for i, ((name, _), digest) in enumerate(zip(items, digests), 1)
+    )
+    prompt = f"""你是我的资本市场分析助手，拥有丰富的炒股实战经验，尤其对A股市场风格有深刻的理解。请基于以下 {len(items)} 个标的的市场数据，分别给出专业的投资分析和可落地的实施方案建议：
+
+{blocks}
+
+每个标的的分析要求：
+1. 简述近期走势（根据3天行情判断）
+2. 解读主力资金动向
+3. 结合A股市场特点，给出具体可操作的实施方案建议
+
+请用中文回答，保持客观专业，每个标的控制在200字以内。
+必须严格按以下格式输出，每个标的以与上面完全相同的分隔行开头，全部标的之后输出 <<<结束>>>，不要有其他多余文字：
+<<<标的1：名称>>>
+分析内容
+<<<标的2：名称>>>
+分析内容
+<<<结束>>>"""
+    # accept 只对后端实际给出的回答调用（超时、出错的说明文字不算格式不符）
+    answered = []
+
+    def accept(response):
+        answered.append(response)
+        return len(parse_batch_response(response, len(items))) == len(items)
+
+    result = call_ai(prompt, kind="target", accept=accept)
+    if result is None:
+        return {name: generate_rule_based_analysis(name, status) for name, status in items}
+    sections = parse_batch_response(result, len(items))
+    if not sections and answered:
+        print("批量 AI 分析的回答不符合分隔格式，改为逐个分析，本后端暂不再批量")
+        llm_cache.mark_batch_unsupported(identity)
+    elif len(sections) < len(items):
+        print(f"批量 AI 分析的回答中缺少 {len(items) - len(sections)} 个标的，改为逐个分析")
+    for i, text in sections.items():
+        llm_cache.put(target_prompt(items[i - 1][0], digests[i - 1]), "target", identity, text)
+    return {items[i - 1][0]: text for i, text in sections.items()}
+
+
+def submit_target_analyses(items):
+    """按 AI_BATCH_SIZE 和 token 预算把标的分批，提交到 AI 执行池
+
+    Args:
+        items: [(名称, 结构化数据)]
+    Returns:
+        [(该批标的, Future)]，用 collect_target_analyses() 取回结果
+    """
+    if config.ai_batch_size > 1 and llm_cache.batch_unsupported(get_backend().identity):
+        print("当前 AI 后端的批量回答不符合分隔格式，逐个分析")
+        return [([item], ai_pool.submit(ai_analyze_target_batch, [item])) for item in items]
+    digests = [build_target_digest(name, status) for name, status in items]
+    batches = pack_batches(items, digests, config.ai_batch_size)
+    if len(batches) < len(items):
+        print(f"{len(items)} 个标的分为 {len(batches)} 批进行 AI 分析")
+    return [(batch, ai_pool.submit(ai_analyze_target_batch, batch)) for batch in batches]
+
+
+def collect_target_analyses(pending):
+    """取回 submit_target_analyses() 的结果，批量回答中解析失败的标的改为逐个调用
+
+    Returns:
+        {名称: 分析}，截止时间到达时仍未完成的使用规则模板
+    """
+    results, retry = {}, []
+    for batch, future in pending:
+        parsed = ai_pool.result(future, lambda: {})
+        results.update(parsed)
+        retry.extend(item for item in batch if item[0] not in parsed)
+    futures = [(name, status, ai_pool.submit(ai_analyze_target, name, status)) for name, status in retry]
+    for name, status, future in futures:
+        results[name] = ai_pool.result(future, lambda: generate_rule_based_analysis(name, status))
+    return results
+
+
+def ai_analyze_summary(statuses, sections=()):
+    """为全市场和多标的关联调用 AI 进行综合总结
+
+    Args:
+        statuses: 各标的的结构化数据
+        sections: 其他报告段落（热门板块、周期性行业），去掉图片和表格分隔行后附在提示词中
+    """
+    data = build_summary_digest(statuses, sections)
     prompt = f"""请基于以下多标的分析数据，进行一个简短的市场综合总结：
     
-{full_content}
+{data}
 
 总结要求：
 1. 概括当前整体市场情绪（结合各标的表现）
 2. 提醒潜在的系统性风险或机会
 
 请用中文回答，专业干练，控制在150字以内。"""
-    result = call_ai(prompt)
+    result = call_ai(prompt, kind="summary")
     # 如果AI返回None（拒绝回答），使用规则模板生成简单总结
     if result is None:
-        return generate_summary_from_content(full_content)
+        return generate_summary_from_status(statuses)
     return result
 
 
-def generate_summary_from_content(content):
-    """基于内容生成简单总结（当AI不可用时使用）"""
+def generate_summary_from_status(statuses):
+    """基于各标的的结构化数据生成简单总结（当AI不可用时使用）"""
     summary_parts = []
     
-    # 提取涨跌幅信息
-    change_pattern = r'涨跌幅[:：]\s*([-\d.]+)%'
-    changes = re.findall(change_pattern, content)
-    
     # 统计涨跌
-    up_count = sum(1 for c in changes if float(c) > 0)
-    down_count = sum(1 for c in changes if float(c) < 0)
+    changes = [c for c in (latest_change(status) for status in statuses) if c is not None]
+    up_count = sum(1 for c in changes if c > 0)
+    down_count = sum(1 for c in changes if c < 0)
     
     if up_count > down_count:
         summary_parts.append("今日市场整体偏暖，")
@@ -172,18 +349,14 @@ def generate_summary_from_content(content):
     else:
         summary_parts.append("今日市场表现分化，")
     
-    # 提取资金流向
-    flow_pattern = r'主力净流入[:：]\s*([-\d.]+)'
-    flows = re.findall(flow_pattern, content)
+    # 各标的最近一天的主力资金净流入合计
+    flows = [f for f in (main_flow_total(status, days=1) for status in statuses) if f is not None]
     if flows:
-        try:
-            total = sum(float(f) for f in flows[:5]) / 100000000
-            if total < 0:
-                summary_parts.append(f"主力资金净流出约{abs(total):.0f}亿元。")
-            else:
-                summary_parts.append(f"主力资金呈净流入状态。")
-        except:
-            pass
+        total = sum(flows) / 100000000
+        if total < 0:
+            summary_parts.append(f"主力资金净流出约{abs(total):.0f}亿元。")
+        else:
+            summary_parts.append(f"主力资金呈净流入状态。")
     
     # 添加风险提示
     summary_parts.append("建议关注政策面和资金面变化，控制仓位，谨慎操作。")
@@ -211,4 +384,19 @@ def ai_analyze_cyclical_industry(industry_name, industry_data=None):
 周期位置: [内容]
 持续时间: [内容]
 分析: [内容]"""
-    return call_ai(prompt)
+    result = call_ai(prompt, kind="cyclical")
+    # 如果AI返回None（拒绝回答或已到截止时间），使用规则模板
+    if result is None:
+        return generate_cyclical_rule_analysis(industry_name, industry_data)
+    return result
+
+
+def generate_cyclical_rule_analysis(industry_name, industry_data=None):
+    """基于规则生成周期性行业简析（当AI不可用时使用，不含周期阶段判断）"""
+    parts = [f"{industry_name}行业"]
+    if industry_data and industry_data.get("涨跌幅") is not None:
+        change = industry_data["涨跌幅"]
+        parts.append(f"今日板块{'上涨' if change >= 0 else '下跌'}{abs(change):.2f}%，")
+    parts.append("AI 周期分析暂不可用，周期阶段请结合行业景气度和政策面自行判断。")
+    parts.append("\n*注：此分析基于规则模板生成，仅供参考。*")
+    return "".join(parts)
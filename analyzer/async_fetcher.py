@@ -0,0 +1,260 @@
+# -*- coding: utf-8 -*-
+"""
+异步数据获取模块
+
+基于 aiohttp 的 data_fetcher 异步版本：
+1. 单个标的的实时行情、K线、资金流向、筹码分布并发获取
+2. 多个标的之间同时进行
+3. 通过信号量限制同时在途的请求数，避免对东方财富造成压力
+4. fetch_targets() 为同步入口，现有调用方无需改成 async
+
+接口地址拼接与返回值解析与 data_fetcher 共用，K线同样经过本地K线存储增量更新。
+结果写入运行级缓存（fetch_cache），与 data_fetcher 的同步调用共用缓存和在途请求，
+两边同时请求同一个键时只请求一次。
+"""
+
+import asyncio
+import json
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from config_manager import config
+from http_client import ENDPOINT_TIMEOUTS, MAX_RETRIES, RETRY_STATUS, backoff_delay, client as http_client
+from kline_store import store as kline_store
+from fetch_cache import run_cache
+from kline_frame import KlineFrame
+from chip_engine import CHIP_LOOKBACK, chip_image_and_data
+from resampler import DAILY_KLT, resample, source_count, source_klt
+from data_fetcher import (
+    INDEX_KLINE_DAYS, kline_cache_kind, realtime_quotes_url, parse_realtime_quotes, quote_batches,
+    money_flow_url, parse_money_flow,
+    chip_secid, scrape_stock_chip_image_and_data,
+)
+
+# 同时在途的最大请求数
+MAX_CONCURRENCY = 6
+# 网页截图获取筹码分布（回退方案）需要启动浏览器，单独限制并发
+CHIP_CONCURRENCY = 2
+
+
+def _loads(text: str) -> Dict:
+    """解析 JSON（兼容 JSONP 回调包裹的响应）"""
+    text = text.strip()
+    if text and text[0] not in "{[":
+        text = text[text.find("{"):text.rfind("}") + 1]
+    return json.loads(text)
+
+
+class AsyncEastMoneyClient:
+    """东方财富异步客户端（需在 async with 中使用）"""
+
+    def __init__(self, max_concurrency: int = MAX_CONCURRENCY):
+        self.max_concurrency = max_concurrency
+        self.session: Optional[aiohttp.ClientSession] = None
+
+    async def __aenter__(self):
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._chip_semaphore = asyncio.Semaphore(CHIP_CONCURRENCY)
+
+        # 将请求数和新建连接数上报给共享 HTTP 客户端，统一输出连接复用统计
+        trace = aiohttp.TraceConfig()
+
+        async def on_request_start(session, ctx, params):
+            ctx.host = f"{params.url.scheme}://{params.url.host}"
+
+        async def on_request_end(session, ctx, params):
+            http_client.record_external(ctx.host, num_requests=1)
+
+        async def on_connection_create_end(session, ctx, params):
+            http_client.record_external(ctx.host, num_connections=1)
+
+        trace.on_request_start.append(on_request_start)
+        trace.on_request_end.append(on_request_end)
+        trace.on_connection_create_end.append(on_connection_create_end)
+
+        self.session = aiohttp.ClientSession(
+            headers=config.headers,
+            connector=aiohttp.TCPConnector(limit=self.max_concurrency, ttl_dns_cache=300),
+            trace_configs=[trace],
+        )
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.session.close()
+
+    async def get_json(self, url: str, endpoint: str = "default") -> Dict:
+        """发送 GET 请求并解析 JSON，失败时按退避策略重试"""
+        connect_timeout, read_timeout = ENDPOINT_TIMEOUTS.get(endpoint, ENDPOINT_TIMEOUTS["default"])
+        timeout = aiohttp.ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout)
+        parts = urlsplit(url)
+        host = f"{parts.scheme}://{parts.hostname}"
+
+        last_error = None
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                async with self._semaphore:
+                    async with self.session.get(url, timeout=timeout) as resp:
+                        if resp.status in RETRY_STATUS:
+                            raise aiohttp.ClientResponseError(
+                                resp.request_info, resp.history, status=resp.status, message=url
+                            )
+                        text = await resp.text()
+                return _loads(text)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                last_error = e
+                if attempt >= MAX_RETRIES:
+                    break
+                http_client.record_external(host, retries=1)
+                await asyncio.sleep(backoff_delay(attempt))
+
+        http_client.record_external(host, failures=1)
+        raise last_error
+
+    # ========== 与 data_fetcher 对应的异步接口 ==========
+
+    async def get_kline_frame(self, secid: str, days: int = 3, klt: int = DAILY_KLT) -> Optional[KlineFrame]:
+        """获取最近N根K线数据（经本地K线存储增量更新，非 1 分钟/日线的周期在本地合成）"""
+        base = source_klt(klt)
+        if base != klt:
+            frame = await self.get_kline_frame(secid, source_count(days, klt), base)
+            return resample(frame, klt, secid).tail(days) if frame else None
+        return await run_cache.aget_window(
+            kline_cache_kind(klt), secid, days, lambda n: self._fetch_kline_frame(secid, n, klt)
+        )
+
+    async def get_kline_data(self, secid: str, days: int = 3, klt: int = DAILY_KLT) -> Optional[List[Dict]]:
+        """获取最近N根K线数据（字典列表）"""
+        frame = await self.get_kline_frame(secid, days, klt)
+        return frame.to_records() if frame is not None else None
+
+    async def update_kline_store(self, secid: str, days: int, klt: int = DAILY_KLT) -> bool:
+        """增量更新本地K线存储（不读取数据），失败时返回 False"""
+        steps = kline_store.update_steps(secid, days, klt)
+        try:
+            params = next(steps)
+            while True:
+                data = await self.get_json(kline_store.kline_url(secid, klt, 1, **params), endpoint="kline")
+                params = steps.send(kline_store.parse_response(data))
+        except StopIteration:
+            pass
+        except Exception as e:
+            steps.close()
+            print(f"K线增量更新失败，使用本地数据: {e}")
+            return False
+        return True
+
+    async def _fetch_kline_frame(self, secid: str, days: int, klt: int = DAILY_KLT) -> Optional[KlineFrame]:
+        await self.update_kline_store(secid, days, klt)
+        lines = kline_store.read(secid, klt, limit=days)
+        return KlineFrame.from_lines(lines) if lines else None
+
+    async def get_realtime_quotes(self, secids: List[str]) -> Dict[str, Dict]:
+        """批量获取实时行情，各批次并发请求"""
+        return await run_cache.aget_many("quote", secids, self._fetch_realtime_quotes)
+
+    async def _fetch_realtime_quotes(self, secids: List[str]) -> Dict[str, Dict]:
+        requested, batches = quote_batches(secids)
+        results = await asyncio.gather(
+            *(self.get_json(realtime_quotes_url(chunk), endpoint="quote") for chunk in batches),
+            return_exceptions=True,
+        )
+        quotes = {}
+        for data in results:
+            if isinstance(data, Exception):
+                print(f"批量获取实时行情失败: {data}")
+                continue
+            quotes.update(parse_realtime_quotes(data, requested))
+        return quotes
+
+    async def get_money_flow(self, secid: str, days: int = 3) -> Optional[List[Dict]]:
+        """获取资金流向数据"""
+        return await run_cache.aget_window("money_flow", secid, days, lambda n: self._fetch_money_flow(secid, n))
+
+    async def _fetch_money_flow(self, secid: str, days: int) -> Optional[List[Dict]]:
+        try:
+            data = await self.get_json(money_flow_url(secid, days), endpoint="money_flow")
+            return parse_money_flow(data, days)
+        except Exception as e:
+            print(f"获取资金流向失败: {e}")
+            return None
+
+    async def get_stock_chip_image_and_data(self, code: str, frame: Optional[KlineFrame] = None):
+        """获取个股筹码分布图和数据
+
+        由日K线计算（frame 为空时单独获取），K线数据不足时在线程中回退到网页截图。
+        """
+        if frame is None:
+            frame = await self.get_kline_frame(chip_secid(code), CHIP_LOOKBACK)
+        img_base64, chip_data = await asyncio.to_thread(chip_image_and_data, frame)
+        if chip_data:
+            return img_base64, chip_data
+        print(f"{code} K线数据不足，改为从网页获取筹码分布")
+        async with self._chip_semaphore:
+            return await asyncio.to_thread(scrape_stock_chip_image_and_data, code)
+
+    async def fetch_target_data(self, target: Dict, history_days: int = 3, volume_days: int = 20) -> Dict:
+        """并发获取单个标的生成报告所需的全部数据
+
+        K线只请求一次（取行情表、成交量分析、筹码计算和指数分析所需天数的最大值），行情表和成交量分析
+        从中截取最近几天，个股的筹码分布也由这份K线计算，指数分析直接命中运行级缓存。
+
+        Returns:
+            {"history", "volume_history", "money_flow", "chip_image", "chip_detail"}
+        """
+        secid = target["secid"]
+        is_stock = target.get("type") == "stock"
+        is_index = target.get("type") == "index"
+        kline_days = max(history_days, volume_days, CHIP_LOOKBACK if is_stock else 0, INDEX_KLINE_DAYS if is_index else 0)
+        tasks = {
+            "klines": self.get_kline_frame(secid, kline_days),
+            "money_flow": self.get_money_flow(secid, history_days),
+        }
+
+        results = await asyncio.gather(*tasks.values(), return_exceptions=True)
+        data = {}
+        for key, value in zip(tasks, results):
+            if isinstance(value, Exception):
+                print(f"获取 {target['name']} 数据失败 ({key}): {value}")
+                value = None
+            data[key] = value
+
+        klines = data.get("klines")
+        chip_image, chip_detail = None, None
+        if is_stock:
+            try:
+                chip_image, chip_detail = await self.get_stock_chip_image_and_data(target["code"], klines)
+            except Exception as e:
+                print(f"获取 {target['name']} 数据失败 (chip): {e}")
+        return {
+            "history": klines.tail(history_days).to_records() if klines else None,
+            "volume_history": klines.tail(volume_days) if klines else None,
+            "money_flow": data.get("money_flow"),
+            "chip_image": chip_image,
+            "chip_detail": chip_detail,
+        }
+
+
+async def fetch_targets_async(targets: List[Dict], max_concurrency: int = MAX_CONCURRENCY) -> Dict[str, Dict]:
+    """并发获取多个标的的数据（行情批量请求与各标的数据同时进行）
+
+    Returns:
+        {secid: fetch_target_data() 的结果 + "realtime"}
+    """
+    async with AsyncEastMoneyClient(max_concurrency) as em:
+        quotes, *results = await asyncio.gather(
+            em.get_realtime_quotes([t["secid"] for t in targets]),
+            *(em.fetch_target_data(t) for t in targets),
+        )
+
+    bundles = {}
+    for target, data in zip(targets, results):
+        data["realtime"] = quotes.get(target["secid"])
+        bundles[target["secid"]] = data
+    return bundles
+
+
+def fetch_targets(targets: List[Dict], max_concurrency: int = MAX_CONCURRENCY) -> Dict[str, Dict]:
+    """fetch_targets_async 的同步入口"""
+    return asyncio.run(fetch_targets_async(targets, max_concurrency))
@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+"""
+无头浏览器池
+
+仍需要浏览器的页面（如筹码分布截图的回退方案）共用一个 Chrome：
+1. 整个运行期间只启动一次浏览器，chromedriver 路径只解析一次
+2. 每个页面在独立的标签页中打开，同时打开的标签页数量有上限
+3. 用 document.readyState + 网络空闲（资源请求数不再增长）判断页面加载完成，代替固定 sleep
+4. 使用中出错的标签页自动关闭并换新，浏览器本身失效时自动重启
+
+WebDriver 同一时间只能操作一个标签页，因此对浏览器的操作通过锁串行执行，
+页面加载在各标签页中同时进行。
+"""
+
+import atexit
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, List
+
+from config_manager import config
+
+# 同时打开的最大标签页数
+MAX_TABS = 3
+# 页面加载超时（秒）
+PAGE_TIMEOUT = 20
+# 资源请求数在该时长内不再增长即视为网络空闲（秒）
+NETWORK_IDLE = 0.5
+# 轮询间隔（秒）
+POLL_INTERVAL = 0.1
+
+_chromedriver_path = None
+_chromedriver_lock = threading.Lock()
+
+
+def chromedriver_path() -> str:
+    """解析 chromedriver 路径（进程内只解析一次）"""
+    global _chromedriver_path
+    with _chromedriver_lock:
+        if _chromedriver_path is None:
+            from webdriver_manager.chrome import ChromeDriverManager
+            _chromedriver_path = ChromeDriverManager().install()
+        return _chromedriver_path
+
+
+class BrowserTab:
+    """浏览器池中的一个标签页"""
+
+    def __init__(self, pool: "BrowserPool", handle: str):
+        self.pool = pool
+        self.handle = handle
+
+    @contextmanager
+    def session(self):
+        """切换到本标签页并独占浏览器，with 块内可直接使用 driver"""
+        with self.pool._lock:
+            driver = self.pool._driver
+            driver.switch_to.window(self.handle)
+            yield driver
+
+    def open(self, url: str):
+        """在本标签页中打开页面（不等待加载完成，其他标签页可同时加载）"""
+        with self.session() as driver:
+            driver.execute_script("window.location.href = arguments[0];", url)
+
+    def wait_until(self, condition: Callable, timeout: float = PAGE_TIMEOUT, message: str = ""):
+        """轮询 condition(driver) 直到返回真值，每次轮询只短暂占用浏览器"""
+        deadline = time.monotonic() + timeout
+        while True:
+            with self.session() as driver:
+                try:
+                    result = condition(driver)
+                except Exception:
+                    result = None
+            if result:
+                return result
+            if time.monotonic() >= deadline:
+                raise TimeoutError(message or f"等待页面条件超时（{timeout} 秒）")
+            time.sleep(POLL_INTERVAL)
+
+    def wait_idle(self, timeout: float = PAGE_TIMEOUT, idle: float = NETWORK_IDLE):
+        """等待页面加载完成且网络空闲"""
+        deadline = time.monotonic() + timeout
+        last_count, stable_since = -1, time.monotonic()
+        while True:
+            with self.session() as driver:
+                state, count = driver.execute_script(
+                    "return [document.readyState, performance.getEntriesByType('resource').length];"
+                )
+            now = time.monotonic()
+            if state != "complete" or count != last_count:
+                last_count, stable_since = count, now
+            elif now - stable_since >= idle:
+                return
+            if now >= deadline:
+                raise TimeoutError(f"页面加载超时（{timeout} 秒）")
+            time.sleep(POLL_INTERVAL)
+
+    def find(self, by: str, value: str, timeout: float = PAGE_TIMEOUT):
+        """等待元素出现并返回"""
+        return self.wait_until(
+            lambda driver: (driver.find_elements(by, value) or [None])[0],
+            timeout,
+            f"未找到元素: {value}",
+        )
+
+
+class BrowserPool:
+    """长期存活的无头 Chrome 和有限数量的标签页"""
+
+    def __init__(self, max_tabs: int = MAX_TABS):
+        self.max_tabs = max_tabs
+        self._driver = None
+        self._lock = threading.RLock()
+        self._slots = threading.BoundedSemaphore(max_tabs)
+        self._idle: List[str] = []
+        self.launches = 0
+
+    def _options(self):
+        from selenium import webdriver
+
+        options = webdriver.ChromeOptions()
+        options.add_argument('--headless=new')
+        options.add_argument('--no-sandbox')
+        options.add_argument('--disable-dev-shm-usage')
+        options.add_argument('--disable-gpu')
+        options.add_argument('--window-size=1920,1080')
+        options.add_argument(f'user-agent={config.headers["User-Agent"]}')
+        options.add_experimental_option("prefs", {"profile.managed_default_content_settings.images": 1})
+        # 导航后立即返回，由 wait_idle() 判断加载完成
+        options.page_load_strategy = "none"
+        return options
+
+    def _ensure_driver(self):
+        """启动浏览器，已启动但失效时重启（需持有锁）"""
+        if self._driver is not None:
+            try:
+                self._driver.window_handles
+                return self._driver
+            except Exception:
+                print("浏览器已失效，重新启动")
+                self._quit()
+
+        from selenium import webdriver
+        from selenium.webdriver.chrome.service import Service
+
+        print("启动 Chrome 浏览器...")
+        self._driver = webdriver.Chrome(service=Service(chromedriver_path()), options=self._options())
+        self._driver.set_page_load_timeout(PAGE_TIMEOUT)
+        # 初始标签页作为第一个空闲标签页
+        self._idle = list(self._driver.window_handles)
+        self.launches += 1
+        return self._driver
+
+    def _acquire_handle(self) -> str:
+        with self._lock:
+            driver = self._ensure_driver()
+            if self._idle:
+                return self._idle.pop()
+            driver.switch_to.new_window("tab")
+            return driver.current_window_handle
+
+    def _discard_handle(self, handle: str):
+        """关闭出错的标签页；保证浏览器至少保留一个标签页"""
+        with self._lock:
+            try:
+                driver = self._driver
+                if driver is None:
+                    return
+                if len(driver.window_handles) > 1:
+                    driver.switch_to.window(handle)
+                    driver.close()
+                else:
+                    driver.switch_to.window(handle)
+                    driver.get("about:blank")
+                    self._idle.append(handle)
+            except Exception:
+                # 浏览器本身已失效，下次使用时重启
+                self._quit()
+
+    @contextmanager
+    def tab(self):
+        """借用一个标签页，超过 max_tabs 时等待；出错的标签页自动关闭换新"""
+        with self._slots:
+            handle = self._acquire_handle()
+            try:
+                yield BrowserTab(self, handle)
+            except Exception:
+                self._discard_handle(handle)
+                raise
+            else:
+                with self._lock:
+                    if self._driver is not None:
+                        self._idle.append(handle)
+
+    def _quit(self):
+        if self._driver is not None:
+            try:
+                self._driver.quit()
+            except Exception:
+                pass
+        self._driver = None
+        self._idle = []
+
+    def close(self):
+        """关闭浏览器（运行结束时调用，未启动过浏览器时无操作）"""
+        with self._lock:
+            self._quit()
+
+
+# 全局实例（首次借用标签页时才启动浏览器）
+browser_pool = BrowserPool()
+atexit.register(browser_pool.close)
@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+"""
+图表渲染服务
+
+1. 使用 Agg 画布和面向对象的 Figure 接口，不依赖 pyplot 的全局状态，可在线程或进程中并行绘制
+2. 每张图只栅格化一次，同一份 PNG 字节同时用于写入文件和 Base64（邮件内嵌）
+3. 输出按输入数据的哈希缓存（内存 + data_dir/charts/），数据未变化时不再绘制
+4. render_many() 在进程池中绘制多张缓存未命中的图（多标的报告使用）
+
+图表的输入为只含基本类型和 numpy 数组的字典（spec），可直接传给子进程。
+"""
+
+import base64
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from config_manager import config
+
+CACHE_DIR = config.data_dir / "charts"
+# 缓存文件的保留天数
+CACHE_MAX_AGE_DAYS = 7
+DPI = 150
+FONT_FAMILY = ['Arial Unicode MS', 'SimHei', 'DejaVu Sans']
+
+
+def chart_key(spec: Dict) -> str:
+    """输入数据的哈希（数组按字节，其余字段按 JSON）"""
+    digest = hashlib.sha1()
+    for name in sorted(spec):
+        value = spec[name]
+        digest.update(name.encode("utf-8"))
+        if isinstance(value, np.ndarray):
+            digest.update(str(value.dtype).encode("ascii"))
+            digest.update(np.ascontiguousarray(value).tobytes())
+        else:
+            digest.update(json.dumps(value, ensure_ascii=False, sort_keys=True, default=str).encode("utf-8"))
+    return digest.hexdigest()[:20]
+
+
+def _new_figure(figsize):
+    import matplotlib
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    matplotlib.rcParams['font.sans-serif'] = FONT_FAMILY
+    matplotlib.rcParams['axes.unicode_minus'] = False
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    return fig
+
+
+def _to_png(fig) -> bytes:
+    buf = BytesIO()
+    fig.savefig(buf, format="png", dpi=DPI, bbox_inches="tight")
+    return buf.getvalue()
+
+
+def render_index_chart(spec: Dict) -> bytes:
+    """指数技术分析图（收盘价、250 日均线、支撑/压力位和入场点位），返回 PNG 字节
+
+    spec 字段：name, code, as_of, dates (datetime64), close, ma250, latest_close, recent_high,
+    recent_low, aggressive_entry_low, aggressive_entry_high, steady_entry, stop_loss
+    """
+    fig = _new_figure((16, 8))
+    ax1 = fig.add_subplot()
+    dates = spec["dates"]
+    recent_low, recent_high = spec["recent_low"], spec["recent_high"]
+    aggressive_entry_low, aggressive_entry_high = spec["aggressive_entry_low"], spec["aggressive_entry_high"]
+    steady_entry, stop_loss = spec["steady_entry"], spec["stop_loss"]
+    latest_close = spec["latest_close"]
+
+    # ===== K 线图和技术指标 =====
+    ax1.plot(dates, spec["close"], label="收盘价", color="blue", linewidth=1.5)
+    ax1.plot(dates, spec["ma250"], label="250 日均线", color="orange", linewidth=1.5, alpha=0.7)
+
+    # 标记关键位置
+    ax1.axhline(y=recent_low, color="green", linestyle="--", linewidth=2, label=f"支撑位：{recent_low:.0f}点")
+    ax1.axhline(y=recent_high, color="red", linestyle="--", linewidth=2, label=f"压力位：{recent_high:.0f}点")
+
+    # 填充交易区间
+    ax1.fill_between(dates, recent_low, recent_high, alpha=0.15, color="gray", label="近 20 日交易区间")
+
+    # 标记入场点位
+    ax1.axhline(y=aggressive_entry_low, color="purple", linestyle=":", linewidth=1.5, label=f"激进入场下限：{aggressive_entry_low}")
+    ax1.axhline(y=aggressive_entry_high, color="purple", linestyle=":", linewidth=1.5, label=f"激进入场上限：{aggressive_entry_high}")
+    ax1.axhline(y=steady_entry, color="cyan", linestyle="-.", linewidth=1.5, label=f"稳健入场位：{steady_entry}")
+    ax1.axhline(y=stop_loss, color="black", linestyle=":", linewidth=1, label=f"止损位：{stop_loss}")
+
+    # 填充激进入场区间
+    ax1.fill_between(dates, aggressive_entry_low, aggressive_entry_high, alpha=0.15, color="purple", label="激进入场区间")
+
+    # 当前价位标记
+    ax1.axhspan(latest_close - 10, latest_close + 10, alpha=0.2, color="blue", label=f"当前价位：{latest_close:.0f}")
+
+    ax1.set_title(f"{spec['name']} ({spec['code']}) - 技术分析图", fontsize=16, fontweight='bold')
+    ax1.set_xlabel("日期", fontsize=12)
+    ax1.set_ylabel("指数点位", fontsize=12)
+    ax1.legend(loc="upper left", bbox_to_anchor=(0.98, 0.98), ncol=1, fontsize=9)
+    ax1.grid(True, alpha=0.3)
+
+    fig.suptitle(f"{spec['name']}智能分析报告 - 数据截至 {spec['as_of']}", fontsize=18, fontweight='bold', y=0.995)
+    fig.tight_layout(rect=[0, 0, 1, 0.96])
+    return _to_png(fig)
+
+
+# 图表类型 -> 绘制函数（需为模块级函数，进程池中按名称调用）
+RENDERERS = {
+    "index": render_index_chart,
+}
+
+
+def _render(args) -> bytes:
+    kind, spec = args
+    return RENDERERS[kind](spec)
+
+
+class ChartRenderer:
+    """图表渲染与缓存"""
+
+    def __init__(self, cache_dir: Optional[Path] = None):
+        self.cache_dir = Path(cache_dir or CACHE_DIR)
+        self._memory: Dict[str, bytes] = {}
+        self.hits = 0
+        self.misses = 0
+        self._pruned = False
+
+    def _cache_path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.png"
+
+    def _lookup(self, key: str) -> Optional[bytes]:
+        png = self._memory.get(key)
+        if png is None:
+            try:
+                png = self._memory[key] = self._cache_path(key).read_bytes()
+            except OSError:
+                return None
+        return png
+
+    def _store(self, key: str, png: bytes):
+        self._memory[key] = png
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp = self._cache_path(key).with_suffix(".tmp")
+            tmp.write_bytes(png)
+            tmp.replace(self._cache_path(key))
+            self._prune()
+        except OSError as e:
+            print(f"写入图表缓存失败: {e}")
+
+    def _prune(self):
+        """每次运行清理一次过期的缓存文件"""
+        if self._pruned:
+            return
+        self._pruned = True
+        cutoff = time.time() - CACHE_MAX_AGE_DAYS * 86400
+        for path in self.cache_dir.glob("*.png"):
+            if path.stat().st_mtime < cutoff:
+                path.unlink(missing_ok=True)
+
+    def render(self, kind: str, spec: Dict) -> bytes:
+        """绘制一张图（缓存命中时直接返回），返回 PNG 字节"""
+        return self.render_many(kind, [spec], workers=1)[0]
+
+    def render_many(self, kind: str, specs: Sequence[Dict], workers: Optional[int] = None) -> List[bytes]:
+        """绘制多张图，缓存未命中的在进程池中并行绘制（workers=1 或只有一张时在当前进程绘制）"""
+        keys = [f"{kind}-{chart_key(spec)}" for spec in specs]
+        results = [self._lookup(key) for key in keys]
+        missing = [i for i, png in enumerate(results) if png is None]
+        self.hits += len(specs) - len(missing)
+        self.misses += len(missing)
+        if not missing:
+            return results
+
+        tasks = [(kind, specs[i]) for i in missing]
+        if workers == 1 or len(tasks) == 1:
+            rendered = [_render(task) for task in tasks]
+        else:
+            with ProcessPoolExecutor(max_workers=min(workers or os.cpu_count() or 1, len(tasks))) as pool:
+                rendered = list(pool.map(_render, tasks))
+        for i, png in zip(missing, rendered):
+            self._store(keys[i], png)
+            results[i] = png
+        return results
+
+    @staticmethod
+    def save(png: bytes, output_path: Optional[str] = None, return_base64: bool = True):
+        """把同一份 PNG 字节写入文件并转为 Base64
+
+        Returns:
+            (file_path, base64_data)
+        """
+        file_path = None
+        if output_path:
+            Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+            Path(output_path).write_bytes(png)
+            file_path = output_path
+        base64_data = base64.b64encode(png).decode("utf-8") if return_base64 else None
+        return file_path, base64_data
+
+    def print_stats(self):
+        total = self.hits + self.misses
+        if total:
+            print(f"[图表] 共 {total} 张，缓存命中 {self.hits} 张，绘制 {self.misses} 张")
+
+
+# 全局实例
+chart_renderer = ChartRenderer()
@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+"""
+筹码分布（CYQ）计算
+
+根据本地K线存储中的日线 OHLC 和换手率计算筹码分布，代替打开东方财富网页截图：
+1. 价格区间按最近 CHIP_LOOKBACK 根K线的最低/最高价等分为 PRICE_BUCKETS 档
+2. 逐日衰减：当日换手的筹码从原有分布中按比例移出（chips *= 1 - 换手率）
+3. 逐日新增：当日换手的筹码按三角分布落在 [最低, 最高] 区间，峰值在当日均价
+   （2、3 的递推展开为矩阵乘法，一次计算所有交易日）
+4. 由最终分布计算获利比例、平均成本、90%/70% 成本区间和集中度
+5. 使用 matplotlib 的 Agg 后端直接绘制筹码分布图，不需要浏览器
+
+单只股票的计算在毫秒级，绘图约几十毫秒。
+"""
+
+import base64
+from io import BytesIO
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from kline_frame import KlineFrame
+
+# 参与计算的K线数量（约半年）
+CHIP_LOOKBACK = 120
+# 价格分档数
+PRICE_BUCKETS = 150
+
+# 图片尺寸（像素），与东方财富页面中的筹码分布 canvas 接近
+IMAGE_WIDTH = 280
+IMAGE_HEIGHT = 420
+
+
+def compute_chips(frame: KlineFrame, buckets: int = PRICE_BUCKETS) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """计算筹码分布
+
+    Args:
+        frame: 按日期正序的日K线（需要最高、最低、开盘、收盘和换手率）
+        buckets: 价格分档数
+
+    Returns:
+        (prices, chips)：各档价格和该价格上的筹码占比（合计为 1）；
+        数据不足或没有换手率数据时返回 None
+    """
+    valid = (
+        np.isfinite(frame.high) & np.isfinite(frame.low) & np.isfinite(frame.close)
+        & (frame.high > 0) & (frame.turnover > 0)
+    )
+    if not valid.any():
+        return None
+
+    highs, lows = frame.high[valid], frame.low[valid]
+    opens = np.where(np.isfinite(frame.open[valid]), frame.open[valid], frame.close[valid])
+    # 当日均价取四价均值，限制在当日最高/最低之间
+    avgs = np.clip((opens + frame.close[valid] + highs + lows) / 4, lows, highs)
+    rates = np.minimum(frame.turnover[valid] / 100, 1.0)
+
+    prices = np.linspace(lows.min(), highs.max(), buckets)
+
+    # 每日新增筹码的三角分布 (D, buckets)，一字板全部落在最接近均价的一档
+    grid = prices[None, :]
+    rising = (grid - lows[:, None]) / np.maximum(avgs - lows, 1e-9)[:, None]
+    falling = (highs[:, None] - grid) / np.maximum(highs - avgs, 1e-9)[:, None]
+    today = np.clip(np.where(grid <= avgs[:, None], rising, falling), 0, None)
+    nearest = np.abs(grid - avgs[:, None]).argmin(axis=1)
+    flat = (highs - lows < 1e-9) | (today.sum(axis=1) <= 0)
+    today[flat] = 0
+    today[flat, nearest[flat]] = 1.0
+    today /= today.sum(axis=1, keepdims=True)
+
+    # 逐日递推 chips = chips * (1 - r_i) + r_i * today_i 展开后，
+    # 第 i 日的筹码最终保留 r_i * prod(1 - r_j, j > i)
+    survive = np.append(np.cumprod((1 - rates)[::-1])[::-1][1:], 1.0)
+    chips = (rates * survive) @ today
+
+    total = chips.sum()
+    if total <= 0:
+        return None
+    return prices, chips / total
+
+
+def _cost_range(prices: np.ndarray, cumulative: np.ndarray, percent: float) -> Tuple[float, float]:
+    """包含 percent 比例筹码的价格区间（两端各去掉 (1 - percent) / 2）"""
+    tail = (1 - percent) / 2
+    low = prices[min(np.searchsorted(cumulative, tail), len(prices) - 1)]
+    high = prices[min(np.searchsorted(cumulative, 1 - tail), len(prices) - 1)]
+    return float(low), float(high)
+
+
+def summarize_chips(prices: np.ndarray, chips: np.ndarray, close: float) -> Dict[str, float]:
+    """计算筹码分布指标（数值）"""
+    cumulative = np.cumsum(chips)
+    low_90, high_90 = _cost_range(prices, cumulative, 0.9)
+    low_70, high_70 = _cost_range(prices, cumulative, 0.7)
+    return {
+        "profit_ratio": float(chips[prices <= close].sum()),
+        "avg_cost": float((prices * chips).sum()),
+        "cost_90": (low_90, high_90),
+        "concentration_90": (high_90 - low_90) / (high_90 + low_90) if high_90 + low_90 else 0.0,
+        "cost_70": (low_70, high_70),
+        "concentration_70": (high_70 - low_70) / (high_70 + low_70) if high_70 + low_70 else 0.0,
+    }
+
+
+def format_chip_data(summary: Dict[str, float], date: str) -> Dict[str, str]:
+    """转换为与东方财富页面相同的字段和格式"""
+    return {
+        "日期": date,
+        "获利比例": f"{summary['profit_ratio'] * 100:.2f}%",
+        "平均成本": f"{summary['avg_cost']:.2f}",
+        "90%成本": f"{summary['cost_90'][0]:.2f}-{summary['cost_90'][1]:.2f}",
+        "90%集中度": f"{summary['concentration_90'] * 100:.2f}%",
+        "70%成本": f"{summary['cost_70'][0]:.2f}-{summary['cost_70'][1]:.2f}",
+        "70%集中度": f"{summary['concentration_70'] * 100:.2f}%",
+    }
+
+
+def render_chip_image(prices: np.ndarray, chips: np.ndarray, close: float, avg_cost: float) -> str:
+    """绘制筹码分布图，返回 PNG 的 base64 编码
+
+    获利筹码（成本低于现价）为红色，套牢筹码为蓝色，实线为现价，虚线为平均成本。
+    """
+    # 使用面向对象接口和 Agg 画布，不依赖 pyplot 的全局状态，可在线程中调用
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    dpi = 100
+    fig = Figure(figsize=(IMAGE_WIDTH / dpi, IMAGE_HEIGHT / dpi), dpi=dpi)
+    FigureCanvasAgg(fig)
+    ax = fig.add_axes((0.02, 0.04, 0.78, 0.92))
+
+    step = prices[1] - prices[0] if len(prices) > 1 else 1.0
+    # 获利/套牢两部分各画成一个阶梯多边形（比逐档 barh 快一个数量级）
+    profit = prices <= close
+    ax.fill_betweenx(prices, 0, chips, where=profit, step="mid", color="#e74c3c", linewidth=0)
+    ax.fill_betweenx(prices, 0, chips, where=~profit, step="mid", color="#3498db", linewidth=0)
+    ax.axhline(close, color="#333333", linewidth=0.8)
+    ax.axhline(avg_cost, color="#f39c12", linewidth=0.8, linestyle="--")
+
+    ax.set_ylim(prices[0] - step, prices[-1] + step)
+    ax.set_xlim(0, chips.max() * 1.05)
+    ax.xaxis.set_visible(False)
+    ax.yaxis.tick_right()
+    ax.tick_params(axis="y", labelsize=7)
+    for spine in ("top", "left", "bottom"):
+        ax.spines[spine].set_visible(False)
+
+    buf = BytesIO()
+    fig.savefig(buf, format="png")
+    return base64.b64encode(buf.getvalue()).decode("utf-8")
+
+
+def chip_image_and_data(frame: Optional[KlineFrame], render: bool = True) -> Tuple[Optional[str], Optional[Dict]]:
+    """由日K线计算筹码分布图（base64）和详细数据
+
+    Returns:
+        (img_base64, chip_data_dict)，字段与 data_fetcher.get_stock_chip_image_and_data 相同；
+        无法计算时返回 (None, None)
+    """
+    if not frame:
+        return None, None
+    frame = frame.tail(CHIP_LOOKBACK)
+    result = compute_chips(frame)
+    if result is None:
+        return None, None
+
+    prices, chips = result
+    close = float(frame.close[-1])
+    summary = summarize_chips(prices, chips, close)
+    chip_data = format_chip_data(summary, frame.date_str(-1))
+    img_base64 = render_chip_image(prices, chips, close, summary["avg_cost"]) if render else None
+    return img_base64, chip_data
+
+
+if __name__ == "__main__":
+    # 计算耗时测试（随机游走生成 50 只股票的K线）
+    import time
+
+    rng = np.random.default_rng(0)
+    frames = []
+    for _ in range(50):
+        close = 10 * np.exp(np.cumsum(rng.normal(0, 0.02, CHIP_LOOKBACK)))
+        spread = close * rng.uniform(0.005, 0.04, CHIP_LOOKBACK)
+        frames.append(KlineFrame(
+            np.arange(20240101, 20240101 + CHIP_LOOKBACK, dtype=np.int32),
+            open=close, close=close, high=close + spread, low=close - spread,
+            turnover=rng.uniform(0.3, 5, CHIP_LOOKBACK),
+        ))
+
+    start = time.perf_counter()
+    results = [chip_image_and_data(f, render=False) for f in frames]
+    compute_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    image, _ = chip_image_and_data(frames[0])
+    first_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    for f in frames[1:11]:
+        chip_image_and_data(f)
+    render_ms = (time.perf_counter() - start) * 100
+
+    print(f"50 只股票筹码计算：{compute_ms:.1f} ms")
+    print(f"绘图（含计算）：首张 {first_ms:.0f} ms（含 matplotlib 导入），之后每张 {render_ms:.0f} ms，"
+          f"{len(image) * 3 // 4} 字节")
+    print(results[0][1])
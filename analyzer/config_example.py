@@ -18,4 +18,27 @@ HEADERS = {
 
 # 其他配置
 REPORTS_DIR = "/path/to/your/reports"  # 报告目录路径，留空则使用默认值 (~/.stock-reports/reports)
-CYCLICAL_INDUSTRIES = ["军工"]  # 周期性行业列表，目前仅支持 军工，后续可扩展
\ No newline at end of file
+DATA_DIR = ""  # 本地数据目录（K线存储等），留空则使用默认值 (~/stock-reports/data)
+CYCLICAL_INDUSTRIES = ["军工"]  # 周期性行业列表，目前仅支持 军工，后续可扩展
+
+# AI 分析并发配置
+AI_MAX_WORKERS = 4  # 同时进行的 AI 调用数
+AI_CALL_TIMEOUT = 180  # 单次 AI 调用的超时（秒）
+AI_RUN_DEADLINE = 600  # 一次运行中全部 AI 调用的截止时间（秒），到期未完成的使用规则模板生成
+AI_BATCH_SIZE = 8  # 每个 AI 提示词最多分析的标的数（按格式拆分回答，解析失败的标的逐个调用；回答完全不符合格式的后端当天不再批量），1 为每个标的单独调用
+
+# AI 后端："cli" 为命令行（每个提示词启动一次进程），"http" 为常驻的 OpenAI 兼容服务（keep-alive + 流式读取）
+LLM_BACKEND = "cli"
+LLM_CLI_PATH = ""  # 命令行路径，留空则使用 PATH 中的 qodercli
+LLM_BASE_URL = "http://127.0.0.1:8000/v1"  # http 后端的服务地址
+LLM_MODEL = ""  # http 后端的模型名
+LLM_API_KEY = ""  # http 后端的密钥（本地服务通常不需要）
+
+# AI 分析结果缓存：提示词完全相同时复用上次的回答
+# 有效期："session" 到当前交易时段结束，"day" 到当天结束，整数为秒数，0 为不缓存
+LLM_CACHE_TTL = {
+    "target": "session",  # 单标的分析
+    "summary": "session",  # 市场综合总结
+    "index": "session",  # 指数支撑位/压力位分析
+    "cyclical": "day",  # 周期性行业分析
+}
@@ -5,8 +5,47 @@
 """
 
 import os
+import shutil
 from pathlib import Path
 
+# 命令行后端的默认路径：PATH 中的 qodercli，找不到时使用 macOS 上 Qoder.app 自带的版本
+DEFAULT_LLM_CLI_PATH = shutil.which("qodercli") or \
+    "/Applications/Qoder.app/Contents/Resources/app/resources/bin/aarch64_darwin/qodercli"
+
+# 各类 AI 提示词的缓存有效期："session" 到当前交易时段结束，"day" 到当天结束，整数为秒数，0 为不缓存
+DEFAULT_LLM_CACHE_TTL = {
+    "target": "session",
+    "summary": "session",
+    "index": "session",
+    "cyclical": "day",
+}
+
+
+def _check_ttl(ttl: dict) -> dict:
+    """校验各类型的缓存有效期，无效的值（如 "1h"）打印警告后使用默认值（未知类型为 0，不缓存）"""
+    checked = {}
+    for kind, policy in ttl.items():
+        if isinstance(policy, str):
+            policy = int(policy) if policy.strip().isdigit() else policy.strip()
+        valid = policy in ("session", "day") or (
+            isinstance(policy, (int, float)) and not isinstance(policy, bool) and policy >= 0
+        )
+        if not valid:
+            default = DEFAULT_LLM_CACHE_TTL.get(kind, 0)
+            print(f"LLM_CACHE_TTL 中 {kind} 的有效期无效: {policy!r}，使用默认值 {default!r}")
+            policy = default
+        checked[kind] = policy
+    return checked
+
+
+def _parse_ttl(value: str) -> dict:
+    """解析环境变量 LLM_CACHE_TTL（如 "cyclical=day,target=0"），未列出的类型使用默认值"""
+    ttl = dict(DEFAULT_LLM_CACHE_TTL)
+    for item in filter(None, (part.strip() for part in value.split(','))):
+        kind, _, policy = item.partition('=')
+        ttl[kind.strip()] = policy
+    return _check_ttl(ttl)
+
 class ConfigManager:
     def __init__(self):
         # 尝试导入配置文件
@@ -29,7 +68,18 @@ class ConfigManager:
                     "Referer": "https://quote.eastmoney.com/",
                 })
                 self.config['REPORTS_DIR'] = getattr(config_module, 'REPORTS_DIR', '')
+                self.config['DATA_DIR'] = getattr(config_module, 'DATA_DIR', '')
                 self.config['CYCLICAL_INDUSTRIES'] = getattr(config_module, 'CYCLICAL_INDUSTRIES', ['军工'])
+                self.config['AI_MAX_WORKERS'] = getattr(config_module, 'AI_MAX_WORKERS', 4)
+                self.config['AI_CALL_TIMEOUT'] = getattr(config_module, 'AI_CALL_TIMEOUT', 180)
+                self.config['AI_RUN_DEADLINE'] = getattr(config_module, 'AI_RUN_DEADLINE', 600)
+                self.config['AI_BATCH_SIZE'] = getattr(config_module, 'AI_BATCH_SIZE', 8)
+                self.config['LLM_CACHE_TTL'] = _check_ttl({**DEFAULT_LLM_CACHE_TTL, **getattr(config_module, 'LLM_CACHE_TTL', {})})
+                self.config['LLM_BACKEND'] = getattr(config_module, 'LLM_BACKEND', 'cli')
+                self.config['LLM_CLI_PATH'] = getattr(config_module, 'LLM_CLI_PATH', DEFAULT_LLM_CLI_PATH)
+                self.config['LLM_BASE_URL'] = getattr(config_module, 'LLM_BASE_URL', 'http://127.0.0.1:8000/v1')
+                self.config['LLM_MODEL'] = getattr(config_module, 'LLM_MODEL', '')
+                self.config['LLM_API_KEY'] = getattr(config_module, 'LLM_API_KEY', '')
             except Exception as e:
                 print(f"加载配置文件失败: {e}")
                 # 如果加载失败，使用默认值
@@ -48,7 +98,18 @@ class ConfigManager:
             "Referer": os.getenv('REFERER', "https://quote.eastmoney.com/"),
         }
         self.config['REPORTS_DIR'] = os.getenv('REPORTS_DIR', '')
+        self.config['DATA_DIR'] = os.getenv('DATA_DIR', '')
         self.config['CYCLICAL_INDUSTRIES'] = os.getenv('CYCLICAL_INDUSTRIES', '军工').split(',')
+        self.config['AI_MAX_WORKERS'] = int(os.getenv('AI_MAX_WORKERS', '4'))
+        self.config['AI_CALL_TIMEOUT'] = float(os.getenv('AI_CALL_TIMEOUT', '180'))
+        self.config['AI_RUN_DEADLINE'] = float(os.getenv('AI_RUN_DEADLINE', '600'))
+        self.config['AI_BATCH_SIZE'] = int(os.getenv('AI_BATCH_SIZE', '8'))
+        self.config['LLM_CACHE_TTL'] = _parse_ttl(os.getenv('LLM_CACHE_TTL', ''))
+        self.config['LLM_BACKEND'] = os.getenv('LLM_BACKEND', 'cli')
+        self.config['LLM_CLI_PATH'] = os.getenv('LLM_CLI_PATH', DEFAULT_LLM_CLI_PATH)
+        self.config['LLM_BASE_URL'] = os.getenv('LLM_BASE_URL', 'http://127.0.0.1:8000/v1')
+        self.config['LLM_MODEL'] = os.getenv('LLM_MODEL', '')
+        self.config['LLM_API_KEY'] = os.getenv('LLM_API_KEY', '')
     
     @property
     def email_sender(self):
@@ -74,9 +135,65 @@ class ConfigManager:
         else:
             return Path.home() / "stock-reports" / "reports"
     
+    @property
+    def data_dir(self):
+        # 本地数据目录（K线存储等），未配置时使用默认值
+        if self.config['DATA_DIR']:
+            return Path(self.config['DATA_DIR'])
+        else:
+            return Path.home() / "stock-reports" / "data"
+    
     @property
     def cyclical_industries(self):
         return self.config['CYCLICAL_INDUSTRIES']
+    
+    @property
+    def ai_max_workers(self):
+        # 同时进行的 AI 调用数
+        return self.config['AI_MAX_WORKERS']
+    
+    @property
+    def ai_call_timeout(self):
+        # 单次 AI 调用的超时（秒）
+        return self.config['AI_CALL_TIMEOUT']
+    
+    @property
+    def ai_run_deadline(self):
+        # 一次运行中全部 AI 调用的截止时间（秒），到期未完成的使用规则模板
+        return self.config['AI_RUN_DEADLINE']
+    
+    @property
+    def ai_batch_size(self):
+        # 每个 AI 提示词最多分析的标的数，1 为每个标的单独调用
+        return self.config['AI_BATCH_SIZE']
+    
+    @property
+    def llm_cache_ttl(self):
+        # 各类 AI 提示词的缓存有效期
+        return self.config['LLM_CACHE_TTL']
+    
+    @property
+    def llm_backend(self):
+        # AI 后端："cli"（命令行，每个提示词一个子进程）或 "http"（常驻的 OpenAI 兼容服务）
+        return self.config['LLM_BACKEND']
+    
+    @property
+    def llm_cli_path(self):
+        # 命令行后端的路径，留空时使用默认路径
+        return self.config['LLM_CLI_PATH'] or DEFAULT_LLM_CLI_PATH
+    
+    @property
+    def llm_base_url(self):
+        # OpenAI 兼容服务的地址（到 /v1 为止）
+        return self.config['LLM_BASE_URL']
+    
+    @property
+    def llm_model(self):
+        return self.config['LLM_MODEL']
+    
+    @property
+    def llm_api_key(self):
+        return self.config['LLM_API_KEY']
 
 # 创建全局配置实例
 config = ConfigManager()
\ No newline at end of file
@@ -1,8 +1,8 @@
 # -*- coding: utf-8 -*-
 import re
 from config_manager import config
-from ai_analyzer import ai_analyze_cyclical_industry
-from data_fetcher import get_realtime_quote
+from ai_analyzer import ai_analyze_cyclical_industry, ai_pool, generate_cyclical_rule_analysis
+from data_fetcher import get_realtime_quotes
 
 # 行业与代码映射 (东方财富 secid)
 INDUSTRY_MAP = {
@@ -21,17 +21,22 @@ def analyze_cyclical_industries():
         industry_names = config.cyclical_industries
         industries_data = []
         
-        for name in industry_names:
-            print(f"正在分析周期性行业: {name}...")
-            
-            # 1. 尝试获取真实数据
-            secid = INDUSTRY_MAP.get(name)
-            real_data = None
-            if secid:
-                real_data = get_realtime_quote(secid)
-            
-            # 2. 调用 AI 进行周期分析
-            ai_result = ai_analyze_cyclical_industry(name, real_data)
+        # 一次请求批量获取所有行业板块的实时行情
+        secids = [INDUSTRY_MAP[name] for name in industry_names if name in INDUSTRY_MAP]
+        quotes = get_realtime_quotes(secids) if secids else {}
+        
+        # 1. 尝试获取真实数据
+        real_data = {name: quotes.get(INDUSTRY_MAP[name]) if name in INDUSTRY_MAP else None for name in industry_names}
+        
+        # 2. 各行业的 AI 周期分析并发进行（按配置顺序返回，截止时间到达时使用规则模板）
+        print(f"正在分析周期性行业: {', '.join(industry_names)}...")
+        ai_results = ai_pool.map(
+            lambda name: ai_analyze_cyclical_industry(name, real_data[name]),
+            list(industry_names),
+            lambda name: generate_cyclical_rule_analysis(name, real_data[name]),
+        )
+        
+        for name, ai_result in zip(industry_names, ai_results):
             print(f"--- AI 周期分析结果 ({name}) ---\n{ai_result}\n")
             
             # 3. 解析 AI 结果
@@ -1,10 +1,19 @@
 # -*- coding: utf-8 -*-
-import requests
 import json
 import base64
 import os
 from pathlib import Path
 from config_manager import config
+from http_client import http_get
+from kline_store import store as kline_store
+from fetch_cache import run_cache
+from kline_frame import KlineFrame, parse_kline_columns
+from chip_engine import CHIP_LOOKBACK, chip_image_and_data
+from resampler import DAILY_KLT, resample, source_count, source_klt
+from trading_calendar import is_trading_day
+
+# 指数分析（index_analyzer）所需的日K线根数：250 日均线 + 绘图区间
+INDEX_KLINE_DAYS = 375
 
 # 东方财富 API Headers
 HEADERS = config.headers
@@ -13,120 +22,192 @@ def get_index_history(secid, days=3):
     """从东方财富获取最近N天的K线数据"""
     return get_kline_data(secid, days)
 
-def get_kline_data(secid, days=3):
-    """从东方财富获取最近N天的K线数据（通用方法）"""
+def parse_kline_lines(klines):
+    """解析东方财富 K 线数据行为字典列表"""
+    return KlineFrame.from_lines(klines).to_records()
+
+def _fetch_kline_frame(secid, days, klt=DAILY_KLT):
     try:
-        url = (
-            f"http://push2his.eastmoney.com/api/qt/stock/kline/get?"
-            f"secid={secid}&fields1=f1,f2,f3,f4,f5,f6&"
-            f"fields2=f51,f52,f53,f54,f55,f56,f57,f58,f59,f60,f61&"
-            f"klt=101&fqt=1&end=20500101&lmt={days + 5}"
-        )
-        
-        resp = requests.get(url, headers=HEADERS, timeout=10)
-        data = resp.json()
-        
-        if data.get("data") and data["data"].get("klines"):
-            klines = data["data"]["klines"][-days:]
-            result = []
-            for line in klines:
-                parts = line.split(",")
-                result.append({
-                    "日期": parts[0],
-                    "开盘": float(parts[1]),
-                    "收盘": float(parts[2]),
-                    "最高": float(parts[3]),
-                    "最低": float(parts[4]),
-                    "成交量": float(parts[5]),
-                    "成交额": float(parts[6]),
-                    "振幅": float(parts[7]) if parts[7] != "-" else 0,
-                    "涨跌幅": float(parts[8]) if parts[8] != "-" else 0,
-                    "涨跌额": float(parts[9]) if parts[9] != "-" else 0,
-                    "换手率": float(parts[10]) if parts[10] != "-" else 0,
-                })
-            return result
+        klines = kline_store.get_klines(secid, days, klt)
+        if klines:
+            return KlineFrame.from_lines(klines)
         return None
     except Exception as e:
         print(f"获取行情数据失败: {e}")
         return None
 
+def kline_cache_kind(klt):
+    """K线窗口缓存的类别（日线沿用 "kline"，分钟线为 "kline_1"）"""
+    return "kline" if klt == DAILY_KLT else f"kline_{klt}"
+
+def get_kline_frame(secid, days=3, klt=DAILY_KLT):
+    """获取最近N根K线数据（KlineFrame，经本地K线存储增量更新）
+    
+    klt 为东方财富的K线周期：1/5/15/30/60 分钟、101 日线、102 周线、103 月线。
+    只有 1 分钟线和日线从接口获取，5~60 分钟线由 1 分钟线合成，周/月线由日线合成。
+    本次运行中已获取过更多根数时直接从缓存截取（视图，不复制数据）。
+    """
+    base = source_klt(klt)
+    if base != klt:
+        frame = get_kline_frame(secid, source_count(days, klt), base)
+        return resample(frame, klt, secid).tail(days) if frame else None
+    return run_cache.get_window(kline_cache_kind(klt), secid, days, lambda n: _fetch_kline_frame(secid, n, klt))
+
+def get_kline_data(secid, days=3, klt=DAILY_KLT):
+    """从东方财富获取最近N根K线数据（通用方法，返回字典列表）"""
+    frame = get_kline_frame(secid, days, klt)
+    return frame.to_records() if frame is not None else None
+
+# 批量行情接口单次请求的最大标的数（受 URL 长度限制）
+QUOTE_BATCH_SIZE = 100
+
+def _price_divisor(secid):
+    """根据 secid 判断价格除数：基金除以1000，股票和指数除以100"""
+    # 判断市场类型：secid格式为 "0.xxxx" 表示深圳(基金/深股通)，"1.xxxx" 表示上海(指数/沪股通)
+    market_type = secid.split('.')[0]
+    stock_code = secid.split('.')[1] if '.' in secid else ''
+    
+    # 判断是否为基金：深圳市场(0.x)且代码以1-3开头通常是基金
+    is_fund = (market_type == '0' and len(stock_code) == 6 and stock_code.startswith(('1', '2', '3')))
+    
+    return 1000 if is_fund else 100
+
+def _as_number(value):
+    """停牌等情况下接口返回 "-"，统一按 0 处理"""
+    return value if isinstance(value, (int, float)) else 0
+
+def realtime_quotes_url(secids):
+    """批量行情接口地址"""
+    return (
+        f"http://push2.eastmoney.com/api/qt/ulist.np/get?"
+        f"fltt=1&invt=2&"
+        f"fields=f2,f3,f4,f5,f6,f8,f12,f13,f14,f15,f16,f17,f18&"
+        f"secids={','.join(secids)}"
+    )
+
+def parse_realtime_quotes(data, requested):
+    """解析批量行情接口返回值
+    
+    Args:
+        data: 接口返回的 JSON
+        requested: {大写 secid: 原 secid}，用于匹配回请求的 secid
+    
+    Returns:
+        dict: {secid: 行情字典}
+    """
+    result = {}
+    diff = (data.get("data") or {}).get("diff") or []
+    if isinstance(diff, dict):
+        diff = list(diff.values())
+    
+    for d in diff:
+        secid = requested.get(f"{d.get('f13')}.{d.get('f12')}".upper())
+        if secid is None:
+            continue
+        price_divisor = _price_divisor(secid)
+        result[secid] = {
+            "最新价": _as_number(d.get("f2")) / price_divisor,
+            "涨跌幅": _as_number(d.get("f3")) / 100,
+            "涨跌额": _as_number(d.get("f4")) / price_divisor,
+            "今开": _as_number(d.get("f17")) / price_divisor,
+            "最高": _as_number(d.get("f15")) / price_divisor,
+            "最低": _as_number(d.get("f16")) / price_divisor,
+            "昨收": _as_number(d.get("f18")) / price_divisor,
+            "成交量": _as_number(d.get("f5")),
+            "成交额": _as_number(d.get("f6")),
+            "换手率": _as_number(d.get("f8")) / 100,
+        }
+    return result
+
+def quote_batches(secids):
+    """去重并按 QUOTE_BATCH_SIZE 分批
+    
+    Returns:
+        (requested, batches)：requested 为 {大写 secid: 原 secid}（接口返回的代码可能与请求大小写不同）
+    """
+    requested = {}
+    for secid in secids:
+        requested.setdefault(secid.upper(), secid)
+    keys = list(requested.values())
+    return requested, [keys[i:i + QUOTE_BATCH_SIZE] for i in range(0, len(keys), QUOTE_BATCH_SIZE)]
+
+def get_realtime_quotes(secids, fresh=False):
+    """批量获取实时行情数据
+    
+    使用东方财富多标的列表接口（ulist.np），每次请求最多 QUOTE_BATCH_SIZE 个标的。
+    
+    Args:
+        secids: secid 列表（如 ["1.000300", "0.161725"]）
+        fresh: 为 True 时跳过运行级缓存（盘中监控轮询最新快照）
+    
+    Returns:
+        dict: {secid: 行情字典}，获取失败的标的不包含在结果中
+    """
+    if fresh:
+        return _fetch_realtime_quotes(secids)
+    return run_cache.get_many("quote", secids, _fetch_realtime_quotes)
+
+def _fetch_realtime_quotes(secids):
+    requested, batches = quote_batches(secids)
+    
+    result = {}
+    for chunk in batches:
+        try:
+            resp = http_get(realtime_quotes_url(chunk), endpoint="quote")
+            result.update(parse_realtime_quotes(resp.json(), requested))
+        except Exception as e:
+            print(f"批量获取实时行情失败: {e}")
+    
+    return result
+
 def get_realtime_quote(secid):
-    """获取实时行情数据"""
+    """获取实时行情数据（单标的，内部走批量接口）"""
+    quote = get_realtime_quotes([secid]).get(secid)
+    if quote is None:
+        print(f"获取实时行情失败: {secid}")
+    return quote
+
+def money_flow_url(secid, days):
+    """资金流向接口地址"""
+    return (
+        f"http://push2his.eastmoney.com/api/qt/stock/fflow/daykline/get?"
+        f"secid={secid}&"
+        f"fields1=f1,f2,f3,f7&"
+        f"fields2=f51,f52,f53,f54,f55,f56,f57,f58,f59,f60,f61,f62,f63,f64,f65&"
+        f"klt=101&lmt={days + 5}"
+    )
+
+# 资金流向各字段（"-" 按 0 处理）
+MONEY_FLOW_FIELDS = ("主力净流入", "小单净流入", "中单净流入", "大单净流入", "超大单净流入")
+
+def parse_money_flow(data, days):
+    """解析资金流向接口返回值，取最近 days 天"""
+    if data.get("data") and data["data"].get("klines"):
+        date_strs, values = parse_kline_columns(data["data"]["klines"][-days:], len(MONEY_FLOW_FIELDS))
+        columns = [values[j].tolist() for j in range(len(MONEY_FLOW_FIELDS))]
+        return [
+            {"日期": date, **{label: column[i] for label, column in zip(MONEY_FLOW_FIELDS, columns)}}
+            for i, date in enumerate(date_strs.tolist())
+        ]
+    return None
+
+def _fetch_money_flow(secid, days):
     try:
-        url = (
-            f"http://push2.eastmoney.com/api/qt/stock/get?"
-            f"secid={secid}&"
-            f"fields=f43,f44,f45,f46,f47,f48,f50,f51,f52,f55,f57,f58,f60,f170,f171"
-        )
-        
-        resp = requests.get(url, headers=HEADERS, timeout=10)
-        data = resp.json()
-        
-        if data.get("data"):
-            d = data["data"]
-            
-            # 判断市场类型：secid格式为 "0.xxxx" 表示深圳(基金/深股通)，"1.xxxx" 表示上海(指数/沪股通)
-            # 基金(secid以0.开头且为6位数)需要除以1000，股票和指数除以100
-            market_type = secid.split('.')[0]
-            stock_code = secid.split('.')[1] if '.' in secid else ''
-            
-            # 判断是否为基金：深圳市场(0.x)且代码以1-3开头通常是基金
-            is_fund = (market_type == '0' and len(stock_code) == 6 and stock_code.startswith(('1', '2', '3')))
-            
-            # 价格除数：基金除以1000，股票和指数除以100
-            price_divisor = 1000 if is_fund else 100
-            
-            return {
-                "最新价": d.get("f43", 0) / price_divisor,
-                "涨跌幅": d.get("f170", 0) / 100,
-                "涨跌额": d.get("f171", 0) / price_divisor,
-                "今开": d.get("f46", 0) / price_divisor,
-                "最高": d.get("f44", 0) / price_divisor,
-                "最低": d.get("f45", 0) / price_divisor,
-                "昨收": d.get("f60", 0) / price_divisor,
-                "成交量": d.get("f47", 0),
-                "成交额": d.get("f48", 0),
-            }
-        return None
+        resp = http_get(money_flow_url(secid, days), endpoint="money_flow")
+        return parse_money_flow(resp.json(), days)
     except Exception as e:
-        print(f"获取实时行情失败: {e}")
+        print(f"获取资金流向失败: {e}")
         return None
 
 def get_money_flow(secid, days=3):
     """获取资金流向数据"""
-    try:
-        url = (
-            f"http://push2his.eastmoney.com/api/qt/stock/fflow/daykline/get?"
-            f"secid={secid}&"
-            f"fields1=f1,f2,f3,f7&"
-            f"fields2=f51,f52,f53,f54,f55,f56,f57,f58,f59,f60,f61,f62,f63,f64,f65&"
-            f"klt=101&lmt={days + 5}"
-        )
-        
-        resp = requests.get(url, headers=HEADERS, timeout=10)
-        data = resp.json()
-        
-        if data.get("data") and data["data"].get("klines"):
-            klines = data["data"]["klines"][-days:]
-            result = []
-            for line in klines:
-                parts = line.split(",")
-                result.append({
-                    "日期": parts[0],
-                    "主力净流入": float(parts[1]) if parts[1] != "-" else 0,
-                    "小单净流入": float(parts[2]) if parts[2] != "-" else 0,
-                    "中单净流入": float(parts[3]) if parts[3] != "-" else 0,
-                    "大单净流入": float(parts[4]) if parts[4] != "-" else 0,
-                    "超大单净流入": float(parts[5]) if parts[5] != "-" else 0,
-                })
-            return result
-        return None
-    except Exception as e:
-        print(f"获取资金流向失败: {e}")
-        return None
+    return run_cache.get_window("money_flow", secid, days, lambda n: _fetch_money_flow(secid, n))
 
 def get_sector_data():
     """从东方财富获取热门板块数据"""
+    return run_cache.get_or_fetch("sector", "hot", _fetch_sector_data)
+
+def _fetch_sector_data():
     try:
         url = (
             'https://push2.eastmoney.com/api/qt/clist/get?'
@@ -137,7 +218,7 @@ def get_sector_data():
             'fields=f12,f14,f3,f184,rankType'
         )
         
-        resp = requests.get(url, headers=HEADERS, timeout=10)
+        resp = http_get(url, endpoint="sector")
         text = resp.text
         start_idx = text.find('{')
         end_idx = text.rfind('}') + 1
@@ -161,36 +242,50 @@ def get_sector_data():
         print(f"获取热门板块数据失败: {e}")
         return None
 
+def chip_distribution_url(secid):
+    """筹码分布简略数据接口地址"""
+    return (
+        f"http://push2.eastmoney.com/api/qt/stock/get?"
+        f"secid={secid}&"
+        f"fields=f43,f57,f58,f164,f165,f166,f183,f184,f185"
+    )
+
+def parse_chip_distribution(data):
+    """解析筹码分布简略数据"""
+    if data.get("data"):
+        d = data["data"]
+        return {
+            "最新价": d.get("f43", 0) / 100,
+            "筹码集中度": d.get("f164", 0) / 10,
+            "3日集中度": d.get("f165", 0) / 10,
+            "10日集中度": d.get("f166", 0) / 10,
+            "机构持股数": d.get("f184", 0) / 10000,
+            "机构持股比例": d.get("f185", 0) / 100,
+        }
+    return None
+
 def get_chip_distribution(secid):
     """获取筹码分布简略数据"""
+    return run_cache.get_or_fetch("chip", secid, lambda: _fetch_chip_distribution(secid))
+
+def _fetch_chip_distribution(secid):
     try:
-        url = (
-            f"http://push2.eastmoney.com/api/qt/stock/get?"
-            f"secid={secid}&"
-            f"fields=f43,f57,f58,f164,f165,f166,f183,f184,f185"
-        )
-        
-        resp = requests.get(url, headers=HEADERS, timeout=10)
-        data = resp.json()
-        
-        if data.get("data"):
-            d = data["data"]
-            return {
-                "最新价": d.get("f43", 0) / 100,
-                "筹码集中度": d.get("f164", 0) / 10,
-                "3日集中度": d.get("f165", 0) / 10,
-                "10日集中度": d.get("f166", 0) / 10,
-                "机构持股数": d.get("f184", 0) / 10000,
-                "机构持股比例": d.get("f185", 0) / 100,
-            }
-        return None
+        resp = http_get(chip_distribution_url(secid), endpoint="chip")
+        return parse_chip_distribution(resp.json())
     except Exception as e:
         print(f"获取筹码分布数据失败: {e}")
         return None
 
+def chip_secid(code):
+    """个股代码 -> secid（0/3 开头为深圳，其余为上海）"""
+    return f"0.{code}" if code.startswith(('0', '3')) else f"1.{code}"
+
 def get_stock_chip_image_and_data(code):
     """为个股获取筹码分布图（base64编码）和详细数据。
     
+    由本地K线存储中的日线和换手率计算（chip_engine），K线数据不足时回退到网页截图。
+    本次运行中同一个代码只获取一次。
+    
     Returns:
         tuple: (img_base64, chip_data_dict) 或 (None, None)
         chip_data_dict 包含：
@@ -202,15 +297,24 @@ def get_stock_chip_image_and_data(code):
         - 70%成本: str
         - 70%集中度: str
     """
-    driver = None
+    return run_cache.get_or_fetch("chip_image", code, lambda: _fetch_stock_chip_image_and_data(code))
+
+def _fetch_stock_chip_image_and_data(code):
+    img_base64, chip_data = chip_image_and_data(get_kline_frame(chip_secid(code), CHIP_LOOKBACK))
+    if chip_data:
+        return img_base64, chip_data
+    print(f"{code} K线数据不足，改为从网页获取筹码分布")
+    return scrape_stock_chip_image_and_data(code)
+
+def scrape_stock_chip_image_and_data(code):
+    """从东方财富网页截取筹码分布图并读取详细数据（返回值同上）
+    
+    使用 browser_pool 中长期存活的 Chrome 标签页，整个运行只启动一次浏览器；
+    以页面加载完成、网络空闲和目标元素出现作为等待条件，不再固定 sleep。
+    """
     try:
-        from selenium import webdriver
         from selenium.webdriver.common.by import By
-        from selenium.webdriver.support.ui import WebDriverWait
-        from selenium.webdriver.support import expected_conditions as EC
-        from webdriver_manager.chrome import ChromeDriverManager
-        from selenium.webdriver.chrome.service import Service
-        import time
+        from browser_pool import browser_pool
         
         if code.startswith('0'):
             url = f"https://quote.eastmoney.com/concept/sz{code}.html#chart-k-cyq"
@@ -219,120 +323,89 @@ def get_stock_chip_image_and_data(code):
         
         print(f"正在获取 {code} 的筹码分布信息...")
         
-        options = webdriver.ChromeOptions()
-        options.add_argument('--headless=new')
-        options.add_argument('--no-sandbox')
-        options.add_argument('--disable-dev-shm-usage')
-        options.add_argument('--disable-gpu')
-        options.add_argument('--window-size=1920,1080')
-        options.add_argument('--start-maximized')
-        options.add_argument(f'user-agent={HEADERS["User-Agent"]}')
-        prefs = {"profile.managed_default_content_settings.images": 1}
-        options.add_experimental_option("prefs", prefs)
-        
-        print(f"创建 Chrome 浏览器...")
-        chromedriver_path = ChromeDriverManager().install()
-        service = Service(chromedriver_path)
-        driver = webdriver.Chrome(service=service, options=options)
-        driver.set_page_load_timeout(30)
-        
-        print(f"访问URL: {url}")
-        driver.get(url)
-        
-        WebDriverWait(driver, 15).until(
-            EC.presence_of_element_located((By.TAG_NAME, "body"))
-        )
-        
-        print(f"等待页面加载...")
-        time.sleep(4)
-        
-        # 1. 获取筹码分布图
-        print(f"查找筹码分布canvas...")
-        canvas_element = None
-        chip_xpath = '/html/body/div[1]/div/div[5]/div[1]/div/div[3]/div/div[4]/canvas'
-        
-        try:
-            canvas_element = WebDriverWait(driver, 5).until(
-                EC.presence_of_element_located((By.XPATH, chip_xpath))
-            )
-            print(f"✓ 找到筹码分布canvas")
-        except Exception as e:
-            print(f"xpath定位失败: {e}")
-            # 备选方案
-            try:
-                main_chart = driver.find_element(By.ID, "main_time_chart")
-                canvases = main_chart.find_elements(By.TAG_NAME, "canvas")
-                for canvas in canvases:
-                    try:
-                        size = canvas.size
-                        parent = canvas.find_element(By.XPATH, "..")
-                        parent_class = parent.get_attribute('class') or ""
-                        if 'cyq' in parent_class and 250 <= size['width'] <= 300:
-                            canvas_element = canvas
-                            print(f"✓ 备选方案找到筹码分布canvas")
-                            break
-                    except:
-                        continue
-            except Exception as e2:
-                print(f"备选方案也失败: {e2}")
-        
-        # 截图
-        img_base64 = None
-        if canvas_element:
+        with browser_pool.tab() as tab:
+            print(f"访问URL: {url}")
+            tab.open(url)
+            tab.wait_idle()
+            
+            # 1. 获取筹码分布图
+            print(f"查找筹码分布canvas...")
+            chip_xpath = '/html/body/div[1]/div/div[5]/div[1]/div/div[3]/div/div[4]/canvas'
+            
+            def find_chip_canvas(driver):
+                canvases = driver.find_elements(By.XPATH, chip_xpath)
+                if canvases:
+                    return canvases[0]
+                # 备选方案
+                for canvas in driver.find_elements(By.CSS_SELECTOR, "#main_time_chart canvas"):
+                    parent_class = canvas.find_element(By.XPATH, "..").get_attribute('class') or ""
+                    if 'cyq' in parent_class and 250 <= canvas.size['width'] <= 300:
+                        return canvas
+                return None
+            
+            img_base64 = None
             try:
-                driver.execute_script("arguments[0].scrollIntoView(true);", canvas_element)
-                time.sleep(1)
-                screenshot = canvas_element.screenshot_as_png
+                tab.wait_until(find_chip_canvas, timeout=5, message="未找到筹码分布canvas")
+                print(f"✓ 找到筹码分布canvas")
+                with tab.session() as driver:
+                    canvas_element = find_chip_canvas(driver)
+                    driver.execute_script("arguments[0].scrollIntoView(true);", canvas_element)
+                    # 等待滚动后的下一帧绘制完成
+                    driver.execute_async_script(
+                        "const done = arguments[arguments.length - 1];"
+                        "requestAnimationFrame(() => requestAnimationFrame(done));"
+                    )
+                    screenshot = canvas_element.screenshot_as_png
                 if screenshot and len(screenshot) > 1000:
                     img_base64 = base64.b64encode(screenshot).decode('utf-8')
                     print(f"✓ {code} 筹码分布图获取成功")
             except Exception as e:
                 print(f"截图失败: {e}")
-        
-        # 2. 获取筹码分布详细数据
-        print(f"查找筹码分布数据...")
-        chip_data = {}
-        chip_data_xpath = '/html/body/div[1]/div/div[5]/div[1]/div/div[3]/div/div[4]/div'
-        
-        try:
-            chip_data_div = WebDriverWait(driver, 5).until(
-                EC.presence_of_element_located((By.XPATH, chip_data_xpath))
-            )
             
-           # 查找所有td元素，提取数据
-            tds = chip_data_div.find_elements(By.TAG_NAME, "td")
+            # 2. 获取筹码分布详细数据
+            print(f"查找筹码分布数据...")
+            chip_data = {}
+            chip_data_xpath = '/html/body/div[1]/div/div[5]/div[1]/div/div[3]/div/div[4]/div'
             
-            current_label = None
-            for td in tds:
-                td_text = td.text.strip()
-                td_class = td.get_attribute('class') or ""
-                
-                if not td_text:
-                    continue
+            try:
+                tab.find(By.XPATH, chip_data_xpath, timeout=5)
+                with tab.session() as driver:
+                    chip_data_div = driver.find_element(By.XPATH, chip_data_xpath)
+                    # 一次取回所有td的文本和class，避免逐个元素往返
+                    cells = driver.execute_script(
+                        "return Array.from(arguments[0].querySelectorAll('td'))"
+                        ".map(td => [td.innerText.trim(), td.className || '']);",
+                        chip_data_div,
+                    )
                 
-                # 如果是标签（以：结尾）
-                if td_text.endswith(':'):
-                    label = td_text[:-1]  # 去掉冒号
-                    # 处理重复的"集中度"标签，根据上下文区分
-                    if label == '集中度':
-                        if '90%成本' in chip_data and '90%集中度' not in chip_data:
-                            current_label = '90%集中度'
-                        elif '70%成本' in chip_data and '70%集中度' not in chip_data:
-                            current_label = '70%集中度'
+                current_label = None
+                for td_text, td_class in cells:
+                    if not td_text:
+                        continue
+                    
+                    # 如果是标签（以：结尾）
+                    if td_text.endswith(':'):
+                        label = td_text[:-1]  # 去掉冒号
+                        # 处理重复的"集中度"标签，根据上下文区分
+                        if label == '集中度':
+                            if '90%成本' in chip_data and '90%集中度' not in chip_data:
+                                current_label = '90%集中度'
+                            elif '70%成本' in chip_data and '70%集中度' not in chip_data:
+                                current_label = '70%集中度'
+                            else:
+                                current_label = label
                         else:
                             current_label = label
-                    else:
-                        current_label = label
-                # 如果是值（class为qcyq_t_v或bltd2）
-                elif 'qcyq_t_v' in td_class or 'bltd2' in td_class:
-                    if current_label:
-                        chip_data[current_label] = td_text
-                        current_label = None
-            
-            print(f"✓ 筹码分布数据获取成功: {list(chip_data.keys())}")
-            
-        except Exception as e:
-            print(f"获取筹码分布数据失败: {e}")
+                    # 如果是值（class为qcyq_t_v或bltd2）
+                    elif 'qcyq_t_v' in td_class or 'bltd2' in td_class:
+                        if current_label:
+                            chip_data[current_label] = td_text
+                            current_label = None
+                
+                print(f"✓ 筹码分布数据获取成功: {list(chip_data.keys())}")
+                
+            except Exception as e:
+                print(f"获取筹码分布数据失败: {e}")
         
         return img_base64, chip_data if chip_data else None
             
@@ -341,12 +414,6 @@ def get_stock_chip_image_and_data(code):
         import traceback
         traceback.print_exc()
         return None, None
-    finally:
-        if driver:
-            try:
-                driver.quit()
-            except:
-                pass
 
 def get_stock_chip_image(code):
     """为个股获取筹码分布图（base64编码）。
@@ -355,9 +422,3 @@ def get_stock_chip_image(code):
     """
     img_base64, _ = get_stock_chip_image_and_data(code)
     return img_base64
-
-def is_trading_day():
-    """检查今天是否为交易日"""
-    from datetime import datetime
-    now = datetime.now()
-    return True
@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+"""
+单次运行内的行情数据缓存
+
+data_fetcher / async_fetcher 的请求都经过这里：
+1. 同一次运行中相同的请求只发起一次（如同一标的的实时行情）
+2. K线、资金流向按"窗口"缓存：已获取过 20 天的数据后，请求 3 天直接从中截取
+3. 相同请求同时发起时共享同一个在途请求：线程和 asyncio 共用一张在途表（concurrent.futures.Future，
+   asyncio 中通过 asyncio.wrap_future 等待），同步和异步调用方同时请求同一个键时也只请求一次
+4. 运行结束时输出命中/未命中统计
+
+缓存只在一次运行内有效，每次运行开始时调用 reset()。
+"""
+
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Tuple
+
+
+def _new_future() -> Future:
+    """在途请求的 Future：创建时即标记为运行中，等待方被取消时不会连带取消共享的请求"""
+    future = Future()
+    future.set_running_or_notify_cancel()
+    return future
+
+
+def _copy(value):
+    """返回浅拷贝，避免调用方原地排序等操作污染缓存"""
+    if isinstance(value, list):
+        return list(value)
+    if isinstance(value, dict):
+        return dict(value)
+    return value
+
+
+class RunCache:
+    """运行级缓存（线程安全）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """清空缓存和统计（每次运行开始时调用）"""
+        with self._lock:
+            self._entries: Dict[Hashable, Any] = {}
+            # 窗口缓存：(kind, secid) -> (已请求天数, 数据)
+            self._windows: Dict[Tuple[str, str], Tuple[int, List]] = {}
+            # 在途请求（线程和 asyncio 共用）：(kind, key) -> Future
+            self._inflight: Dict[Hashable, Future] = {}
+            # 窗口请求的在途请求：(kind, secid, days) -> Future
+            self._window_inflight: Dict[Tuple[str, str, int], Future] = {}
+            self._stats: Dict[str, Dict[str, int]] = {}
+
+    def _count(self, kind: str, field: str):
+        entry = self._stats.setdefault(kind, {"hits": 0, "misses": 0, "joined": 0})
+        entry[field] += 1
+
+    # ========== 单键缓存 ==========
+
+    def get_or_fetch(self, kind: str, key: Hashable, fetch: Callable[[], Any]) -> Any:
+        """按键缓存，失败（返回 None 或抛异常）的结果不缓存"""
+        full_key = (kind, key)
+        with self._lock:
+            if full_key in self._entries:
+                self._count(kind, "hits")
+                return _copy(self._entries[full_key])
+            future = self._inflight.get(full_key)
+            if future is None:
+                future = self._inflight[full_key] = _new_future()
+                owner = True
+                self._count(kind, "misses")
+            else:
+                owner = False
+                self._count(kind, "joined")
+
+        if not owner:
+            return _copy(future.result())
+
+        value = None
+        try:
+            value = fetch()
+            return _copy(value)
+        finally:
+            with self._lock:
+                if value is not None:
+                    self._entries[full_key] = value
+                self._inflight.pop(full_key, None)
+            future.set_result(value)
+
+    def get_many(self, kind: str, keys: Iterable[Hashable],
+                 fetch_many: Callable[[List[Hashable]], Dict[Hashable, Any]]) -> Dict[Hashable, Any]:
+        """批量版本：只对未缓存且不在途的键调用 fetch_many"""
+        result, waiting, missing, futures = {}, {}, [], {}
+        with self._lock:
+            for key in dict.fromkeys(keys):
+                full_key = (kind, key)
+                if full_key in self._entries:
+                    self._count(kind, "hits")
+                    result[key] = _copy(self._entries[full_key])
+                elif full_key in self._inflight:
+                    self._count(kind, "joined")
+                    waiting[key] = self._inflight[full_key]
+                else:
+                    self._count(kind, "misses")
+                    futures[key] = self._inflight[full_key] = _new_future()
+                    missing.append(key)
+
+        fetched = {}
+        try:
+            if missing:
+                fetched = fetch_many(missing) or {}
+        finally:
+            with self._lock:
+                for key in missing:
+                    if fetched.get(key) is not None:
+                        self._entries[(kind, key)] = fetched[key]
+                    self._inflight.pop((kind, key), None)
+            for key in missing:
+                futures[key].set_result(fetched.get(key))
+
+        for key in missing:
+            if fetched.get(key) is not None:
+                result[key] = _copy(fetched[key])
+        for key, future in waiting.items():
+            value = future.result()
+            if value is not None:
+                result[key] = _copy(value)
+        return result
+
+    async def aget_many(self, kind: str, keys: Iterable[Hashable], fetch_many) -> Dict[Hashable, Any]:
+        """get_many 的 asyncio 版本，fetch_many 为协程函数"""
+        result, waiting, missing, futures = {}, {}, [], {}
+        with self._lock:
+            for key in dict.fromkeys(keys):
+                full_key = (kind, key)
+                if full_key in self._entries:
+                    self._count(kind, "hits")
+                    result[key] = _copy(self._entries[full_key])
+                elif full_key in self._inflight:
+                    self._count(kind, "joined")
+                    waiting[key] = self._inflight[full_key]
+                else:
+                    self._count(kind, "misses")
+                    futures[key] = self._inflight[full_key] = _new_future()
+                    missing.append(key)
+
+        fetched = {}
+        try:
+            if missing:
+                fetched = await fetch_many(missing) or {}
+        finally:
+            with self._lock:
+                for key in missing:
+                    if fetched.get(key) is not None:
+                        self._entries[(kind, key)] = fetched[key]
+                    self._inflight.pop((kind, key), None)
+            for key in missing:
+                futures[key].set_result(fetched.get(key))
+
+        for key in missing:
+            if fetched.get(key) is not None:
+                result[key] = _copy(fetched[key])
+        for key, future in waiting.items():
+            value = await asyncio.wrap_future(future)
+            if value is not None:
+                result[key] = _copy(value)
+        return result
+
+    # ========== 窗口缓存（K线、资金流向） ==========
+
+    def _window_hit(self, kind: str, secid: str, days: int):
+        """已缓存窗口覆盖所需天数时返回最近 days 条，否则返回 None（需持有锁）
+
+        列表切片得到副本，KlineFrame 切片得到视图，调用方都不会改动缓存的数据。
+        """
+        window = self._windows.get((kind, secid))
+        if window and window[0] >= days:
+            return window[1][-days:]
+        return None
+
+    def _window_store(self, kind: str, secid: str, days: int, value):
+        if value is None:
+            return
+        window = self._windows.get((kind, secid))
+        if window is None or window[0] < days:
+            self._windows[(kind, secid)] = (days, value)
+
+    def get_window(self, kind: str, secid: str, days: int, fetch: Callable[[int], List]) -> List:
+        """获取最近 days 条数据，已缓存更大窗口时直接截取
+
+        同一 secid 有覆盖所需天数的在途请求时等待其结果，不再重复请求。
+        """
+        with self._lock:
+            hit = self._window_hit(kind, secid, days)
+            if hit is not None:
+                self._count(kind, "hits")
+                return hit
+            joined = [(n, f) for (k, s, n), f in self._window_inflight.items()
+                      if k == kind and s == secid and n >= days]
+            if joined:
+                self._count(kind, "joined")
+                future = joined[0][1]
+                owner = False
+            else:
+                future = self._window_inflight[(kind, secid, days)] = _new_future()
+                owner = True
+                self._count(kind, "misses")
+
+        if not owner:
+            value = future.result()
+            return value[-days:] if value is not None else None
+
+        value = None
+        try:
+            value = fetch(days)
+            return value[-days:] if value is not None else None
+        finally:
+            with self._lock:
+                self._window_store(kind, secid, days, value)
+                self._window_inflight.pop((kind, secid, days), None)
+            future.set_result(value)
+
+    async def aget_window(self, kind: str, secid: str, days: int, fetch) -> List:
+        """get_window 的 asyncio 版本，fetch 为接收天数的协程函数"""
+        with self._lock:
+            hit = self._window_hit(kind, secid, days)
+            if hit is not None:
+                self._count(kind, "hits")
+                return hit
+            joined = [f for (k, s, n), f in self._window_inflight.items()
+                      if k == kind and s == secid and n >= days]
+            if joined:
+                self._count(kind, "joined")
+                future = joined[0]
+                owner = False
+            else:
+                future = self._window_inflight[(kind, secid, days)] = _new_future()
+                owner = True
+                self._count(kind, "misses")
+
+        if not owner:
+            value = await asyncio.wrap_future(future)
+            return value[-days:] if value is not None else None
+
+        value = None
+        try:
+            value = await fetch(days)
+            return value[-days:] if value is not None else None
+        finally:
+            with self._lock:
+                self._window_store(kind, secid, days, value)
+                self._window_inflight.pop((kind, secid, days), None)
+            future.set_result(value)
+
+    # ========== 统计 ==========
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {kind: dict(entry) for kind, entry in self._stats.items()}
+
+    def print_stats(self):
+        """打印本次运行的缓存命中情况"""
+        stats = self.stats()
+        if not stats:
+            return
+        print("[缓存] 行情数据缓存统计：")
+        for kind, s in sorted(stats.items()):
+            total = s["hits"] + s["misses"] + s["joined"]
+            rate = (s["hits"] + s["joined"]) / total * 100 if total else 0
+            print(
+                f"  - {kind}: 命中 {s['hits']} 次，未命中 {s['misses']} 次，"
+                f"合并在途请求 {s['joined']} 次，命中率 {rate:.0f}%"
+            )
+
+
+# 全局实例
+run_cache = RunCache()
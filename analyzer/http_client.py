@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+"""
+共享 HTTP 客户端
+
+功能：
+1. 按主机维护 keep-alive 连接池（push2 / push2his 等），避免每次请求重新握手
+2. 统一的重试策略：连接错误、超时、429/5xx 时按指数退避 + 随机抖动重试
+3. 按接口类型区分超时时间
+4. 统计每次运行的请求数、新建连接数和连接复用次数
+"""
+
+import json
+import random
+import threading
+import time
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config_manager import config
+
+# 各类接口的超时时间：(连接超时, 读取超时)，单位秒
+ENDPOINT_TIMEOUTS = {
+    "kline": (3.05, 10),
+    "quote": (3.05, 6),
+    "money_flow": (3.05, 10),
+    "sector": (3.05, 10),
+    "clist": (3.05, 10),
+    "chip": (3.05, 6),
+    "default": (3.05, 10),
+}
+
+# 重试配置
+MAX_RETRIES = 3
+BACKOFF_BASE = 0.5  # 首次重试的退避上限（秒）
+BACKOFF_CAP = 8.0  # 单次退避的最大时长（秒）
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+# 连接池配置：pool_connections 为缓存的主机数，pool_maxsize 为每个主机保持的连接数
+POOL_CONNECTIONS = 8
+POOL_MAXSIZE = 10
+
+
+def backoff_delay(attempt: int) -> float:
+    """full jitter 退避：在 [0, min(cap, base * 2^attempt)] 之间随机取值"""
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * (2 ** attempt)))
+
+
+class RetryableStatusError(requests.RequestException):
+    """服务端返回可重试的状态码"""
+
+
+class HttpClient:
+    """带连接池和重试的 HTTP 客户端（线程安全）"""
+
+    def __init__(self, headers: Optional[Dict] = None, max_retries: int = MAX_RETRIES):
+        self.max_retries = max_retries
+        self.session = requests.Session()
+        self.session.headers.update(headers or config.headers)
+
+        # 关闭 urllib3 自带重试，由 get() 统一处理
+        self._adapter = HTTPAdapter(
+            pool_connections=POOL_CONNECTIONS,
+            pool_maxsize=POOL_MAXSIZE,
+            max_retries=0,
+        )
+        self.session.mount("http://", self._adapter)
+        self.session.mount("https://", self._adapter)
+
+        self._lock = threading.Lock()
+        self._retries: Dict[str, int] = {}
+        self._failures: Dict[str, int] = {}
+        # reset_stats() 时记录的计数偏移量，用于只统计本次运行
+        self._baseline: Dict[str, Tuple[int, int]] = {}
+        # 异步客户端（async_fetcher）上报的请求数/新建连接数
+        self._external: Dict[str, Tuple[int, int]] = {}
+
+    def _count(self, counter: Dict[str, int], host: str):
+        with self._lock:
+            counter[host] = counter.get(host, 0) + 1
+
+    def record_external(self, host: str, num_requests: int = 0, num_connections: int = 0,
+                        retries: int = 0, failures: int = 0):
+        """记录其他客户端（如 aiohttp）的请求统计，合并到 connection_stats() 中"""
+        with self._lock:
+            r, c = self._external.get(host, (0, 0))
+            self._external[host] = (r + num_requests, c + num_connections)
+            if retries:
+                self._retries[host] = self._retries.get(host, 0) + retries
+            if failures:
+                self._failures[host] = self._failures.get(host, 0) + failures
+
+    def get(
+        self,
+        url: str,
+        endpoint: str = "default",
+        params: Optional[Dict] = None,
+        timeout=None,
+        retries: Optional[int] = None,
+        **kwargs,
+    ) -> requests.Response:
+        """发送 GET 请求，失败时按退避策略重试
+
+        Args:
+            url: 请求地址
+            endpoint: 接口类型，用于选择超时时间（见 ENDPOINT_TIMEOUTS）
+            params: 查询参数
+            timeout: 自定义超时，覆盖 endpoint 对应的默认值
+            retries: 自定义重试次数，默认 MAX_RETRIES
+
+        Returns:
+            requests.Response
+
+        Raises:
+            requests.RequestException: 重试耗尽后仍然失败
+        """
+        if timeout is None:
+            timeout = ENDPOINT_TIMEOUTS.get(endpoint, ENDPOINT_TIMEOUTS["default"])
+        if retries is None:
+            retries = self.max_retries
+        parts = urlsplit(url)
+        host = f"{parts.scheme}://{parts.hostname}"
+
+        last_error = None
+        for attempt in range(retries + 1):
+            try:
+                resp = self.session.get(url, params=params, timeout=timeout, **kwargs)
+                if resp.status_code in RETRY_STATUS:
+                    raise RetryableStatusError(f"HTTP {resp.status_code}: {url}", response=resp)
+                return resp
+            except (requests.ConnectionError, requests.Timeout, RetryableStatusError) as e:
+                last_error = e
+                if attempt >= retries:
+                    break
+                self._count(self._retries, host)
+                time.sleep(backoff_delay(attempt))
+
+        self._count(self._failures, host)
+        raise last_error
+
+    def get_json(self, url: str, endpoint: str = "default", **kwargs) -> Dict:
+        """发送 GET 请求并解析 JSON（兼容 JSONP 回调包裹的响应）"""
+        resp = self.get(url, endpoint=endpoint, **kwargs)
+        text = resp.text.strip()
+        if text and text[0] not in "{[":
+            text = text[text.find("{"):text.rfind("}") + 1]
+        return json.loads(text)
+
+    def connection_stats(self) -> Dict[str, Dict[str, int]]:
+        """按主机（含协议）统计请求数、新建连接数和复用次数"""
+        stats = {}
+        pools = self._adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            host = f"{pool.scheme}://{pool.host}"
+            base_requests, base_connections = self._baseline.get(host, (0, 0))
+            entry = stats.setdefault(host, {"requests": base_requests, "connections": base_connections})
+            entry["requests"] += pool.num_requests
+            entry["connections"] += pool.num_connections
+
+        with self._lock:
+            for host, (ext_requests, ext_connections) in self._external.items():
+                entry = stats.setdefault(host, {"requests": 0, "connections": 0})
+                entry["requests"] += ext_requests
+                entry["connections"] += ext_connections
+            for host, entry in stats.items():
+                entry["reused"] = max(entry["requests"] - entry["connections"], 0)
+                entry["retries"] = self._retries.get(host, 0)
+                entry["failures"] = self._failures.get(host, 0)
+        return stats
+
+    def reset_stats(self):
+        """清空统计（每次运行开始时调用）"""
+        pools = self._adapter.poolmanager.pools
+        with self._lock:
+            self._retries.clear()
+            self._failures.clear()
+            self._external.clear()
+            self._baseline = {}
+            for key in list(pools.keys()):
+                pool = pools.get(key)
+                if pool is not None:
+                    self._baseline[f"{pool.scheme}://{pool.host}"] = (-pool.num_requests, -pool.num_connections)
+
+    def print_stats(self):
+        """打印本次运行的连接复用情况"""
+        stats = self.connection_stats()
+        if not stats:
+            print("[HTTP] 本次运行未发起网络请求")
+            return
+        print("[HTTP] 连接复用统计：")
+        for host, s in sorted(stats.items()):
+            print(
+                f"  - {host}: 请求 {s['requests']} 次，新建连接 {s['connections']} 个，"
+                f"复用 {s['reused']} 次，重试 {s['retries']} 次，失败 {s['failures']} 次"
+            )
+
+
+# 全局共享客户端
+client = HttpClient()
+
+
+def http_get(url: str, endpoint: str = "default", **kwargs) -> requests.Response:
+    """使用全局客户端发送 GET 请求"""
+    return client.get(url, endpoint=endpoint, **kwargs)
+
+
+def get_json(url: str, endpoint: str = "default", **kwargs) -> Dict:
+    """使用全局客户端发送 GET 请求并解析 JSON"""
+    return client.get_json(url, endpoint=endpoint, **kwargs)
+
+
+def reset_stats():
+    """清空全局客户端的统计信息"""
+    client.reset_stats()
+
+
+def print_stats():
+    """打印全局客户端的连接复用统计"""
+    client.print_stats()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+导入耗时报告
+
+在子进程中以 python -X importtime 导入指定模块，把每个模块的自身耗时按子系统汇总
+（pandas、matplotlib、numpy、网络库、项目模块、标准库等），用于检查入口脚本的启动开销。
+
+用法：python3 import_profile.py [模块名，默认 stock_analyzer] [--top 10] [--budget-ms 100]
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+ANALYZER_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 顶层包名 -> 子系统
+SUBSYSTEMS = {
+    "pandas": "pandas",
+    "matplotlib": "matplotlib",
+    "PIL": "matplotlib",
+    "kiwisolver": "matplotlib",
+    "pyparsing": "matplotlib",
+    "cycler": "matplotlib",
+    "fontTools": "matplotlib",
+    "contourpy": "matplotlib",
+    "numpy": "numpy",
+    "requests": "requests",
+    "urllib3": "requests",
+    "charset_normalizer": "requests",
+    "idna": "requests",
+    "certifi": "requests",
+    "aiohttp": "aiohttp",
+    "multidict": "aiohttp",
+    "yarl": "aiohttp",
+    "frozenlist": "aiohttp",
+    "aiosignal": "aiohttp",
+    "propcache": "aiohttp",
+    "markdown": "markdown",
+    "selenium": "selenium",
+}
+
+_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def _project_modules() -> set:
+    return {name[:-3] for name in os.listdir(ANALYZER_DIR) if name.endswith(".py")}
+
+
+def subsystem_of(module: str, project: set) -> str:
+    top = module.split(".")[0]
+    if top in project:
+        return "项目模块"
+    if top in SUBSYSTEMS:
+        return SUBSYSTEMS[top]
+    if top in getattr(sys, "stdlib_module_names", ()) or top.startswith("_"):
+        return "标准库"
+    return "其他第三方库"
+
+
+def measure(module: str = "stock_analyzer") -> Tuple[float, Dict[str, float], List[Tuple[float, str]]]:
+    """在新的解释器中导入模块
+
+    Returns:
+        (总耗时 ms, {子系统: 自身耗时 ms}, [(累计耗时 ms, 项目模块名)])
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ANALYZER_DIR, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"导入 {module} 失败：\n{result.stderr.strip().splitlines()[-1]}")
+
+    # 输出为后序：目标模块的依赖在它自己那一行之前，到上一个顶层导入为止（不含解释器启动时的导入）
+    entries, tree = [], None
+    for line in result.stderr.splitlines():
+        match = _LINE.match(line)
+        if not match:
+            continue
+        entries.append((int(match[1]), int(match[2]), match[4]))
+        if len(match[3]) <= 1:
+            if match[4] == module:
+                tree = entries
+                break
+            entries = []
+    if tree is None:
+        raise RuntimeError(f"未找到 {module} 的导入记录")
+
+    project = _project_modules()
+    by_subsystem = defaultdict(float)
+    project_cumulative = []
+    for self_us, cumulative_us, name in tree:
+        by_subsystem[subsystem_of(name, project)] += self_us / 1000
+        if name in project:
+            project_cumulative.append((cumulative_us / 1000, name))
+    total = tree[-1][1] / 1000
+    return total, dict(by_subsystem), sorted(project_cumulative, reverse=True)
+
+
+def format_report(module: str, total: float, by_subsystem: Dict[str, float],
+                  project_cumulative: List[Tuple[float, str]], top: int = 10) -> str:
+    lines = [f"导入 {module} 共 {total:.1f} ms", "", "按子系统（自身耗时）："]
+    for name, ms in sorted(by_subsystem.items(), key=lambda item: -item[1]):
+        lines.append(f"  {name:<12} {ms:8.1f} ms  {ms / total * 100 if total else 0:5.1f}%")
+    lines += ["", f"项目模块（含依赖的累计耗时，前 {top} 个）："]
+    for ms, name in project_cumulative[:top]:
+        lines.append(f"  {name:<20} {ms:8.1f} ms")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="导入耗时报告")
+    parser.add_argument("module", nargs="?", default="stock_analyzer", help="要导入的模块")
+    parser.add_argument("--top", type=int, default=10, help="列出的项目模块数")
+    parser.add_argument("--budget-ms", type=float, default=None, help="超过该耗时时返回非零退出码")
+    args = parser.parse_args()
+
+    total, by_subsystem, project_cumulative = measure(args.module)
+    print(format_report(args.module, total, by_subsystem, project_cumulative, args.top))
+    if args.budget_ms is not None and total > args.budget_ms:
+        print(f"\n超出启动耗时预算：{total:.1f} ms > {args.budget_ms:.0f} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,546 @@
+# -*- coding: utf-8 -*-
+"""
+指数智能分析模块（支撑位、压力位和入场时机）
+
+功能流程：
+1. 实时行情走批量行情接口，历史数据经本地K线存储增量更新，均写入运行级缓存
+2. 一次计算技术指标（MA250、近 20 日高低点、入场和止损点位），供分析、备用模板和图表共用
+3. 调用 LLM 进行支撑位、压力位和入场时机分析
+4. 生成包含分析结果的可视化图表
+5. 提供标准化接口供报告生成模块调用
+
+多个指数使用 analyze_indices()：行情一次批量请求、各指数K线并发获取，
+LLM 分析提交到 AI 执行池（ai_analyzer.ai_pool）后即由 chart_renderer 在进程池中并行绘制图表，两者同时进行。
+
+数据来源：东方财富
+"""
+
+import pandas as pd
+from datetime import datetime
+import sys
+import os
+import asyncio
+import logging
+import time
+from typing import Dict, List, Optional, Tuple
+from dataclasses import dataclass
+
+# 添加 analyzer 目录到路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from ai_analyzer import ai_pool, call_ai
+from chart_renderer import chart_renderer
+from data_fetcher import INDEX_KLINE_DAYS, get_kline_frame, get_realtime_quotes
+from http_client import backoff_delay
+from resampler import HK_MARKETS
+from config import LOG_LEVEL
+
+# ============= 日志配置 =============
+logger = logging.getLogger(__name__)
+logger.setLevel(LOG_LEVEL)
+
+if not logger.handlers:
+    console_handler = logging.StreamHandler()
+    console_handler.setLevel(LOG_LEVEL)
+    formatter = logging.Formatter(
+        '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S'
+    )
+    console_handler.setFormatter(formatter)
+    logger.addHandler(console_handler)
+
+# ============= 配置常量 =============
+# 历史数据天数（计算 250 日均线并留出绘图区间，实际请求多 10 天）
+HISTORY_DAYS = INDEX_KLINE_DAYS - 10
+MA_WINDOW = 250
+RANGE_DAYS = 20
+# K 线接口返回空数据时的最多请求次数
+HISTORY_RETRIES = 3
+
+
+@dataclass
+class MarketData:
+    """市场数据封装（技术指标只计算一次，供分析、备用模板和图表共用）"""
+    realtime: Optional[Dict]
+    history: Optional[pd.DataFrame]  # 含 MA250 列
+    ma250: Optional[float] = None
+    recent_high: Optional[float] = None
+    recent_low: Optional[float] = None
+    aggressive_entry_low: Optional[int] = None
+    aggressive_entry_high: Optional[int] = None
+    steady_entry: Optional[int] = None
+    stop_loss: Optional[int] = None
+
+    @property
+    def technical_indicators(self) -> Dict:
+        return {"ma250": self.ma250, "recent_high": self.recent_high, "recent_low": self.recent_low}
+
+
+class IndexDataFetcher:
+    """指数数据获取器"""
+    
+    def __init__(self, secid: str, name: str):
+        self.secid = secid
+        self.name = name
+    
+    def get_realtime_data(self) -> Optional[Dict]:
+        """获取实时行情数据（批量行情接口，analyze_indices 预取后直接命中运行级缓存）"""
+        logger.info(f"开始获取{self.name}实时行情...")
+        
+        try:
+            quote = get_realtime_quotes([self.secid]).get(self.secid)
+            if quote and quote["最新价"]:
+                realtime_data = {"名称": self.name, **quote}
+                logger.info(f"实时行情获取成功 - 最新价：{realtime_data['最新价']:.2f}点，涨跌幅：{realtime_data['涨跌幅']:+.2f}%")
+                return realtime_data
+            else:
+                logger.warning("东方财富 API 返回数据为空")
+                return None
+                
+        except Exception as e:
+            logger.error(f"实时行情获取失败：{e}")
+            return None
+    
+    def get_history_data(self, days: int = HISTORY_DAYS) -> Optional[pd.DataFrame]:
+        """获取历史 K 线数据（经本地K线存储增量更新，本次运行内只读取一次）
+        
+        HTTP 客户端只在连接错误和 429/5xx 时重试；接口返回空数据时这里按退避时间再请求，最多 HISTORY_RETRIES 次。
+        """
+        logger.info(f"开始获取{self.name}历史数据（{days}天）...")
+        
+        for attempt in range(HISTORY_RETRIES):
+            try:
+                # 运行级缓存中已有更多根数时直接截取，否则只下载缺失的尾部（空结果不缓存）
+                frame = get_kline_frame(self.secid, days + 10)
+                
+                if frame:
+                    df = pd.DataFrame(
+                        {
+                            "开盘": frame.open,
+                            "收盘": frame.close,
+                            "最高": frame.high,
+                            "最低": frame.low,
+                            "成交量": frame.volume,
+                            "成交额": frame.amount,
+                        },
+                        index=pd.to_datetime(frame.dates.astype(str), format="%Y%m%d").rename("日期"),
+                    )
+                    
+                    logger.info(f"历史数据获取成功 - 共{len(df)}条记录，时间范围：{df.index[0].strftime('%Y-%m-%d')} 至 {df.index[-1].strftime('%Y-%m-%d')}")
+                    return df
+                
+                logger.warning(f"本地K线存储和东方财富 API 均无数据 (第{attempt + 1}/{HISTORY_RETRIES}次)")
+            except Exception as e:
+                logger.error(f"历史 K 线获取失败 (尝试 {attempt + 1}/{HISTORY_RETRIES})：{e}")
+            if attempt < HISTORY_RETRIES - 1:
+                time.sleep(backoff_delay(attempt))
+        
+        logger.error("暂无法获取历史 K 线数据（东方财富 K 线接口在当前网络环境下不可用）")
+        return None
+    
+    def calculate_technical_indicators(self, df: pd.DataFrame, realtime_data: Optional[Dict] = None) -> MarketData:
+        """计算技术指标：250 日均线（同时写入 MA250 列）、近 20 日高低点、入场和止损点位
+        
+        Args:
+            df: 历史数据
+            realtime_data: 实时行情（为空时使用最新一根K线的收盘价计算入场点位）
+        """
+        logger.info("计算技术指标...")
+        
+        df["MA250"] = df["收盘"].rolling(window=MA_WINDOW).mean()
+        ma250 = df["MA250"].iloc[-1]
+        recent_high = df["最高"].tail(RANGE_DAYS).max()
+        recent_low = df["最低"].tail(RANGE_DAYS).min()
+        latest_close = realtime_data["最新价"] if realtime_data else df["收盘"].iloc[-1]
+        
+        logger.info(f"技术指标计算完成 - MA250: {ma250:.2f}点，近 20 日高点：{recent_high:.2f}点，近 20 日低点：{recent_low:.2f}点")
+        return MarketData(
+            realtime=realtime_data,
+            history=df,
+            ma250=ma250,
+            recent_high=recent_high,
+            recent_low=recent_low,
+            aggressive_entry_low=int(latest_close * 0.98),
+            aggressive_entry_high=int(latest_close * 0.99),
+            steady_entry=int(recent_low),
+            stop_loss=int(recent_low * 0.97),
+        )
+    
+    def get_market_data(self, days: int = HISTORY_DAYS) -> MarketData:
+        """获取实时行情和历史数据并计算技术指标（实时行情不可用时由最新K线代替）"""
+        realtime_data = self.get_realtime_data()
+        history_data = self.get_history_data(days=days)
+        if history_data is None or history_data.empty:
+            logger.error("历史数据获取失败")
+            raise ValueError("无法获取历史数据")
+        
+        if not realtime_data:
+            logger.warning("实时行情不可用，使用最新K线代替")
+            realtime_data = {
+                "名称": self.name,
+                "最新价": history_data["收盘"].iloc[-1],
+                "涨跌幅": 0.0,
+                "今开": history_data["开盘"].iloc[-1],
+                "最高": history_data["最高"].iloc[-1],
+                "最低": history_data["最低"].iloc[-1],
+                "昨收": history_data["收盘"].iloc[-2] if len(history_data) > 1 else history_data["收盘"].iloc[-1],
+            }
+        return self.calculate_technical_indicators(history_data, realtime_data)
+
+
+def _points(value: float, digits: int = 2) -> str:
+    """点位文本（上市不足 250 日时均线为 NaN）"""
+    return "数据不足" if pd.isna(value) else f"{value:.{digits}f} 点"
+
+
+class IndexAnalyzer:
+    """指数 LLM 分析器"""
+    
+    def __init__(self, secid: str, name: str):
+        self.secid = secid
+        self.name = name
+    
+    @property
+    def market(self) -> str:
+        return "港股" if self.secid.split(".")[0] in HK_MARKETS else "A 股"
+    
+    def analyze(self, market: MarketData) -> str:
+        """调用 LLM 对指数进行分析（使用已计算的技术指标）"""
+        logger.info("开始调用 LLM 进行智能分析...")
+        
+        try:
+            realtime_data = market.realtime
+            latest_close = realtime_data["最新价"]
+            change_pct = realtime_data["涨跌幅"]
+            recent_high, recent_low, ma250 = market.recent_high, market.recent_low, market.ma250
+            
+            # 准备分析数据摘要
+            data_summary = f"""
+{self.name} ({self.secid}) 实时数据：
+- 最新价：{latest_close:.2f} 点
+- 涨跌幅：{change_pct:+.2f}%
+- 开盘：{realtime_data['今开']:.2f} 点
+- 最高：{realtime_data['最高']:.2f} 点
+- 最低：{realtime_data['最低']:.2f} 点
+- 昨收：{realtime_data['昨收']:.2f} 点
+
+技术面数据：
+- 近 20 日最高点：{recent_high:.2f} 点
+- 近 20 日最低点：{recent_low:.2f} 点
+- 250 日均线：{_points(ma250)}
+- 当前点位：{latest_close:.2f} 点
+"""
+            
+            prompt = f"""你是专业的{self.market}市场分析师，擅长技术分析和实战策略。请基于以下{self.name} ({self.secid}) 的数据，进行支撑位和压力位分析，并给出入场时机建议：
+
+{data_summary}
+
+分析要求：
+1. **支撑位分析**：识别关键支撑位（至少 2 个），说明理由
+2. **压力位分析**：识别关键压力位（至少 2 个），说明理由
+3. **入场时机建议**：给出具体的入场点位区间和止损位
+4. **风险提示**：简要提醒主要风险因素
+
+请用中文回答，保持客观专业，控制在 300 字以内。直接给出分析结果，不需要客套话。"""
+            
+            logger.debug(f"发送提示词到 LLM，长度：{len(prompt)}字符")
+            result = call_ai(prompt, kind="index")
+            
+            if result:
+                logger.info("LLM 分析调用成功")
+                logger.debug(f"LLM 返回结果长度：{len(result)}字符")
+                return result
+            else:
+                logger.warning("LLM 返回结果为空")
+                return self._generate_fallback_analysis(market)
+                
+        except Exception as e:
+            logger.error(f"LLM 分析调用失败：{e}")
+            return self._generate_fallback_analysis(market)
+    
+    def _generate_fallback_analysis(self, market: MarketData) -> str:
+        """生成基于规则的技术分析（备用方案）"""
+        logger.info("使用技术分析模板生成备用分析结果...")
+        
+        latest_close = market.realtime["最新价"]
+        change_pct = market.realtime["涨跌幅"]
+        recent_high, recent_low, ma250 = market.recent_high, market.recent_low, market.ma250
+        aggressive_entry_low, aggressive_entry_high = market.aggressive_entry_low, market.aggressive_entry_high
+        steady_entry, stop_loss = market.steady_entry, market.stop_loss
+        
+        analysis = f"""
+**技术面分析**：
+- 当前点位：{latest_close:.2f} 点，涨跌幅 {change_pct:+.2f}%
+- 近 20 日区间：{recent_low:.2f} - {recent_high:.2f} 点
+- 长期趋势线：250 日均线 {_points(ma250)}
+
+**支撑位**：
+1. {recent_low:.0f} 点（近 20 日低点）
+2. {_points(ma250, 0)}（250 日均线）
+
+**压力位**：
+1. {recent_high:.0f} 点（近 20 日高点）
+2. {int(recent_high * 1.05):.0f} 点（前期平台）
+
+**操作建议**：
+- 激进型：可在 {aggressive_entry_low}-{aggressive_entry_high} 点区间轻仓试多
+- 稳健型：等待回踩 {steady_entry} 点附近再考虑入场
+- 止损位：{stop_loss} 点
+
+*注：此分析基于规则模板生成，仅供参考，投资需谨慎。*
+"""
+        logger.info("备用分析结果生成成功")
+        return analysis
+
+
+class IndexChartGenerator:
+    """指数图表生成器"""
+    
+    def __init__(self, secid: str, name: str):
+        self.secid = secid
+        self.name = name
+    
+    def chart_spec(self, market: MarketData) -> Dict:
+        """绘图所需的数据（可传给子进程，也是图表缓存的键）"""
+        history_data = market.history
+        return {
+            "name": self.name,
+            "code": self.secid.split(".")[-1],
+            "as_of": history_data.index[-1].strftime("%Y-%m-%d"),
+            "dates": history_data.index.values.astype("datetime64[D]"),
+            "close": history_data["收盘"].to_numpy(),
+            "ma250": history_data["MA250"].to_numpy(),
+            "latest_close": float(market.realtime["最新价"]),
+            "recent_high": float(market.recent_high),
+            "recent_low": float(market.recent_low),
+            "aggressive_entry_low": market.aggressive_entry_low,
+            "aggressive_entry_high": market.aggressive_entry_high,
+            "steady_entry": market.steady_entry,
+            "stop_loss": market.stop_loss,
+        }
+    
+    def default_output_path(self) -> str:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        return os.path.join(
+            os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            "reports",
+            f"{self.secid.split('.')[-1].lower()}_chart_{timestamp}.png"
+        )
+    
+    def generate_analysis_chart(
+        self,
+        market: MarketData,
+        llm_analysis: str,
+        output_path: Optional[str] = None,
+        return_base64: bool = True,
+        png: Optional[bytes] = None
+    ) -> Tuple[Optional[str], Optional[str]]:
+        """生成技术分析图表（仅 K 线图和技术指标）
+        
+        Args:
+            market: 市场数据（含 MA250 列的历史数据和已计算的技术指标）
+            llm_analysis: LLM 分析结果
+            output_path: 输出文件路径（None 则自动生成）
+            return_base64: 是否返回 Base64 编码（默认 True）
+            png: 已绘制的图片（analyze_indices 批量绘制），为 None 时在此绘制
+            
+        Returns:
+            (file_path, base64_data) 元组
+        """
+        logger.info("开始生成技术分析图表...")
+        
+        try:
+            # 只栅格化一次，同一份 PNG 同时写入文件和转为 Base64
+            if png is None:
+                png = chart_renderer.render("index", self.chart_spec(market))
+            file_path, base64_data = chart_renderer.save(png, output_path or self.default_output_path(), return_base64)
+            logger.info(f"技术分析图表保存成功：{file_path}")
+            return file_path, base64_data
+            
+        except Exception as e:
+            logger.error(f"图表生成失败：{e}")
+            raise
+
+
+class IndexAnalyzerFacade:
+    """指数分析外观类 - 提供统一的对外接口"""
+    
+    def __init__(self, secid: str, name: str):
+        self.secid = secid
+        self.name = name
+        self.data_fetcher = IndexDataFetcher(secid, name)
+        self.analyzer = IndexAnalyzer(secid, name)
+        self.chart_generator = IndexChartGenerator(secid, name)
+    
+    def prepare_market_data(self) -> MarketData:
+        """获取实时行情和历史数据并计算技术指标（完整报告要求实时行情可用）"""
+        # Step 1: 获取实时行情数据
+        realtime_data = self.data_fetcher.get_realtime_data()
+        if not realtime_data:
+            logger.error("实时行情数据获取失败")
+            raise ValueError("无法获取实时行情数据")
+        
+        # Step 2: 获取历史数据（本地K线存储增量更新）
+        history_data = self.data_fetcher.get_history_data(days=HISTORY_DAYS)
+        if history_data is None or history_data.empty:
+            logger.error("历史数据获取失败")
+            raise ValueError("无法获取历史数据")
+        
+        # Step 3: 一次计算技术指标，之后各步骤共用
+        return self.data_fetcher.calculate_technical_indicators(history_data, realtime_data)
+    
+    def build_report(self, market: MarketData, llm_analysis: str, save_chart: bool = True,
+                     png: Optional[bytes] = None) -> Dict:
+        """生成分析图表并组装完整报告（png 为已绘制的图片）"""
+        chart_path = None
+        chart_base64 = None
+        if save_chart:
+            chart_path, chart_base64 = self.chart_generator.generate_analysis_chart(
+                market=market,
+                llm_analysis=llm_analysis,
+                return_base64=True,
+                png=png
+            )
+        
+        return {
+            "realtime_data": market.realtime,
+            "history_data": market.history,
+            "technical_indicators": market.technical_indicators,
+            "llm_analysis": llm_analysis,
+            "chart_path": chart_path,  # 文件路径（用于存档）
+            "chart_base64": chart_base64,  # Base64 编码（用于邮件）
+            "timestamp": datetime.now().isoformat(),
+        }
+    
+    def generate_full_report(self, save_chart: bool = True, verbose: bool = False) -> Dict:
+        """
+        生成完整的指数分析报告
+        
+        Args:
+            save_chart: 是否保存分析图表
+            verbose: 是否输出详细日志（默认 False，只在系统调用时输出关键信息）
+            
+        Returns:
+            包含所有分析结果的字典
+        """
+        if verbose:
+            logger.info("=" * 60)
+            logger.info(f"开始生成{self.name}完整分析报告")
+            logger.info("=" * 60)
+        else:
+            logger.info(f"正在生成{self.name}分析报告...")
+        
+        try:
+            market = self.prepare_market_data()
+            
+            # Step 4: 调用 LLM 进行分析
+            llm_analysis = self.analyzer.analyze(market)
+            
+            # Step 5: 生成分析图表（同时获取文件路径和 Base64）并组装报告
+            report = self.build_report(market, llm_analysis, save_chart)
+            
+            if verbose:
+                logger.info(f"{self.name}完整分析报告生成成功")
+                logger.info("=" * 60)
+            else:
+                logger.info(f"报告生成完成 - 图表：{report['chart_path']}")
+            
+            return report
+            
+        except Exception as e:
+            logger.error(f"生成完整报告失败：{e}")
+            raise
+    
+    def get_quick_analysis(self) -> str:
+        """
+        快速获取分析结果（仅文字分析，不生成图表）
+        
+        Returns:
+            LLM 分析结果字符串
+        """
+        logger.info("开始快速获取分析结果...")
+        
+        try:
+            # 获取数据（历史数据只读取一次，实时行情不可用时使用最新K线）
+            market = self.data_fetcher.get_market_data(days=HISTORY_DAYS)
+            
+            # 调用 LLM 分析
+            analysis = self.analyzer.analyze(market)
+            
+            logger.info("快速获取分析结果完成")
+            return analysis
+            
+        except Exception as e:
+            logger.error(f"快速获取分析失败：{e}")
+            raise
+
+
+async def _prefetch_async(secids: List[str]):
+    # aiohttp 只在批量分析时导入
+    from async_fetcher import AsyncEastMoneyClient
+
+    async with AsyncEastMoneyClient() as em:
+        await asyncio.gather(
+            em.get_realtime_quotes(secids),
+            *(em.get_kline_frame(secid, INDEX_KLINE_DAYS) for secid in secids),
+            return_exceptions=True,
+        )
+
+
+def prefetch_indices(secids: List[str]):
+    """行情一次批量请求、各指数K线并发获取，结果写入运行级缓存（已缓存的不再请求）"""
+    if len(set(secids)) < 2:
+        return
+    try:
+        asyncio.run(_prefetch_async(list(dict.fromkeys(secids))))
+    except Exception as e:
+        logger.warning(f"并发预取指数数据失败，改为逐个获取：{e}")
+
+
+def analyze_indices(targets: List[Dict], save_chart: bool = True) -> Dict[str, Dict]:
+    """批量生成多个指数的完整分析报告
+    
+    Args:
+        targets: [{"secid", "name", ...}]
+        save_chart: 是否生成分析图表
+        
+    Returns:
+        {secid: generate_full_report() 的结果}，失败的指数不包含在结果中
+    """
+    if not targets:
+        return {}
+    facades = [IndexAnalyzerFacade(t["secid"], t["name"]) for t in targets]
+    prefetch_indices([f.secid for f in facades])
+    
+    markets = {}
+    for facade in facades:
+        try:
+            markets[facade.secid] = facade.prepare_market_data()
+        except Exception as e:
+            logger.error(f"{facade.name}数据准备失败：{e}")
+    
+    # LLM 分析耗时最长，各指数先提交到 AI 执行池并发进行，绘图期间不等待
+    ready = [f for f in facades if f.secid in markets]
+    futures = [ai_pool.submit(f.analyzer.analyze, markets[f.secid]) for f in ready]
+    
+    # 图表在进程池中并行绘制（缓存命中的直接使用）
+    pngs = [None] * len(ready)
+    if save_chart and ready:
+        try:
+            pngs = chart_renderer.render_many("index", [f.chart_generator.chart_spec(markets[f.secid]) for f in ready])
+        except Exception as e:
+            logger.error(f"批量绘制图表失败，改为逐个绘制：{e}")
+    
+    # 取回 AI 分析结果（截止时间到达或出错时使用规则模板）
+    analyses = [
+        ai_pool.result(future, lambda f=f: f.analyzer._generate_fallback_analysis(markets[f.secid]))
+        for f, future in zip(ready, futures)
+    ]
+    
+    reports = {}
+    for facade, llm_analysis, png in zip(ready, analyses, pngs):
+        try:
+            reports[facade.secid] = facade.build_report(markets[facade.secid], llm_analysis, save_chart, png)
+        except Exception as e:
+            logger.error(f"{facade.name}报告生成失败：{e}")
+    logger.info(f"指数分析完成：{len(reports)}/{len(targets)}")
+    return reports
@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+"""
+K 线列式存储
+
+KlineFrame 用连续的 NumPy 数组按列保存 K 线，代替 List[Dict]：
+1. 日期为 int32 的 yyyymmdd，分钟K线另有 int16 的 HHMM 时间列，价格/成交量等为 float64，
+   每根K线约 86 字节
+2. 按日期正序保存，tail()/window()/切片返回共享内存的视图，不复制数据
+3. frame[i] 返回与原来相同的中文键字典，to_records()/from_records() 与旧格式互转
+4. parse_kline_columns() 一次性解析整个 klines 数组（K线、资金流向共用）
+
+后端 data_providers/kline_frame.py 直接导入本模块。解析性能对比见 kline_frame_benchmark.py。
+"""
+
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+# 列名 -> 中文字段名（与 parse_kline_lines 返回的字典键一致）
+COLUMNS = {
+    "open": "开盘",
+    "close": "收盘",
+    "high": "最高",
+    "low": "最低",
+    "volume": "成交量",
+    "amount": "成交额",
+    "amplitude": "振幅",
+    "change_pct": "涨跌幅",
+    "change": "涨跌额",
+    "turnover": "换手率",
+}
+
+
+# 各列遇到 "-"（停牌、未上市等）时的取值：价格和成交量记为 NaN，其余沿用原来的 0
+MISSING = {
+    "open": np.nan,
+    "close": np.nan,
+    "high": np.nan,
+    "low": np.nan,
+    "volume": np.nan,
+    "amount": np.nan,
+    "amplitude": 0.0,
+    "change_pct": 0.0,
+    "change": 0.0,
+    "turnover": 0.0,
+}
+
+
+def date_to_int(date_str: str) -> int:
+    """"2024-01-02" -> 20240102"""
+    return int(date_str[:10].replace("-", ""))
+
+
+def int_to_date(value: int) -> str:
+    """20240102 -> "2024-01-02\""""
+    value = int(value)
+    return f"{value // 10000:04d}-{value // 100 % 100:02d}-{value % 100:02d}"
+
+
+def format_time(date: str, hhmm: int) -> str:
+    """"2024-01-02", 931 -> "2024-01-02 09:31"（日线及以上周期 hhmm 为 0，只返回日期）"""
+    return f"{date} {hhmm // 100:02d}:{hhmm % 100:02d}" if hhmm else date
+
+
+def parse_times(date_strs: np.ndarray) -> np.ndarray:
+    """日期字符串数组 -> int16 HHMM（"2024-01-02 09:31" -> 931，没有时间部分为 0）"""
+    if not len(date_strs) or date_strs.dtype.itemsize // 4 < 16:
+        return np.zeros(len(date_strs), dtype=np.int16)
+    digits = date_strs.astype("U16").view(np.uint32).reshape(-1, 16)[:, 11:16].astype(np.int32) - 48
+    times = digits[:, 0] * 1000 + digits[:, 1] * 100 + digits[:, 3] * 10 + digits[:, 4]
+    # 没有时间部分的行（码点为 0）记为 0
+    return np.where(digits[:, 2] == ord(":") - 48, times, 0).astype(np.int16)
+
+
+def parse_dates(date_strs: np.ndarray) -> np.ndarray:
+    """日期字符串数组（"2024-01-02" 或 "2024-01-02 09:31"）-> int32 yyyymmdd"""
+    if not len(date_strs):
+        return np.empty(0, dtype=np.int32)
+    # 取前 10 个字符，按 UCS4 码点直接计算各位数字
+    digits = date_strs.astype("U10").view(np.uint32).reshape(-1, 10).astype(np.int32) - 48
+    return (digits[:, 0] * 10000000 + digits[:, 1] * 1000000 + digits[:, 2] * 100000 + digits[:, 3] * 10000
+            + digits[:, 5] * 1000 + digits[:, 6] * 100 + digits[:, 8] * 10 + digits[:, 9])
+
+
+def _parse_kline_rows(lines: Sequence[str], n_fields: int, missing: Sequence[float]):
+    """逐行解析（字段数不一致等 loadtxt 无法处理的情况）"""
+    date_strs = []
+    values = np.empty((n_fields, len(lines)))
+    for i, line in enumerate(lines):
+        parts = line.split(",")
+        date_strs.append(parts[0])
+        for j in range(n_fields):
+            part = parts[j + 1] if j + 1 < len(parts) else "-"
+            values[j, i] = float(part) if part not in ("-", "") else missing[j]
+    return np.array(date_strs, dtype=str), values
+
+
+def parse_kline_columns(lines: Sequence[str], n_fields: int, missing=0.0):
+    """将东方财富 klines 数组（"日期,值1,值2,..."）一次性解析为列
+
+    日期按固定宽度截取，数值部分将 "-" 替换为 nan 后交给 np.loadtxt 的 C 解析器，
+    不再逐行 split 和逐个 float()。
+
+    Args:
+        lines: klines 原始数据行
+        n_fields: 日期之后需要解析的字段数
+        missing: "-" 的取值，可以是单个数值或与字段一一对应的序列（如 NaN / 0）
+
+    Returns:
+        (date_strs, values)：日期字符串数组和 (n_fields, n) 的 float64 数组
+    """
+    n = len(lines)
+    if np.ndim(missing) == 0:
+        missing = [missing] * n_fields
+    if n == 0:
+        return np.empty(0, dtype=str), np.empty((n_fields, 0))
+
+    date_width = lines[0].find(",")
+    text = "\n".join(lines) + "\n"
+    # ",-," 需要替换两次才能覆盖相邻的两个 "-"
+    text = text.replace(",-\n", ",nan\n").replace(",-,", ",nan,").replace(",-,", ",nan,")
+    try:
+        values = np.loadtxt(
+            text.splitlines(), delimiter=",", usecols=range(1, n_fields + 1), ndmin=2, dtype=np.float64
+        ).T.copy()
+    except ValueError:
+        return _parse_kline_rows(lines, n_fields, missing)
+
+    for j, fill in enumerate(missing):
+        if not np.isnan(fill):
+            column = values[j]
+            column[np.isnan(column)] = fill
+    return np.array(lines, dtype=f"U{date_width}"), values
+
+
+class KlineFrame:
+    """按列保存的 K 线数据（日期正序）"""
+
+    __slots__ = ("dates", "times") + tuple(COLUMNS)
+
+    def __init__(self, dates: np.ndarray, times: Optional[np.ndarray] = None, **columns: np.ndarray):
+        self.dates = np.asarray(dates, dtype=np.int32)
+        self.times = np.zeros(len(self.dates), dtype=np.int16) if times is None else np.asarray(times, dtype=np.int16)
+        for name in COLUMNS:
+            values = columns.get(name)
+            if values is None:
+                values = np.zeros(len(self.dates))
+            setattr(self, name, np.asarray(values, dtype=np.float64))
+
+    # ========== 构造 ==========
+
+    @classmethod
+    def empty(cls) -> "KlineFrame":
+        return cls(np.empty(0, dtype=np.int32))
+
+    @classmethod
+    def from_lines(cls, lines: Sequence[str]) -> "KlineFrame":
+        """由东方财富 K 线原始数据行构造（"-" 按 MISSING 取值）"""
+        date_strs, values = parse_kline_columns(lines, len(COLUMNS), [MISSING[name] for name in COLUMNS])
+        return cls(parse_dates(date_strs), parse_times(date_strs), **dict(zip(COLUMNS, values)))
+
+    @classmethod
+    def from_records(cls, records: Sequence[Dict]) -> "KlineFrame":
+        """由中文键字典列表构造（按日期排序）"""
+        records = sorted(records, key=lambda r: r.get("日期", ""))
+        date_strs = np.array([r["日期"] for r in records], dtype=str)
+        columns = {
+            name: np.array([float(r.get(label) or 0) for r in records])
+            for name, label in COLUMNS.items()
+        }
+        return cls(parse_dates(date_strs), parse_times(date_strs), **columns)
+
+    @classmethod
+    def coerce(cls, data) -> Optional["KlineFrame"]:
+        """KlineFrame 原样返回，字典列表转换为 KlineFrame，空数据返回 None"""
+        if data is None or isinstance(data, cls):
+            return data
+        return cls.from_records(data) if data else None
+
+    # ========== 切片 ==========
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def __getitem__(self, index):
+        """切片返回视图；整数下标返回中文键字典"""
+        if isinstance(index, slice):
+            return KlineFrame(
+                self.dates[index], self.times[index], **{name: getattr(self, name)[index] for name in COLUMNS}
+            )
+        return self.record(index)
+
+    def tail(self, n: int) -> "KlineFrame":
+        """最近 n 根（视图）"""
+        return self[-n:] if n > 0 else self[:0]
+
+    def window(self, start: int, end: int) -> "KlineFrame":
+        """[start, end) 区间的K线（视图），start/end 为 yyyymmdd 整数"""
+        lo, hi = np.searchsorted(self.dates, [start, end])
+        return self[lo:hi]
+
+    # ========== 转换 ==========
+
+    def date_str(self, i: int) -> str:
+        """第 i 根K线的日期（分钟K线包含时间，如 "2024-01-02 09:31"）"""
+        return format_time(int_to_date(self.dates[i]), int(self.times[i]))
+
+    def record(self, i: int) -> Dict:
+        """第 i 根K线的中文键字典"""
+        record = {"日期": self.date_str(i)}
+        for name, label in COLUMNS.items():
+            record[label] = float(getattr(self, name)[i])
+        return record
+
+    def to_records(self) -> List[Dict]:
+        """转换为中文键字典列表（兼容旧接口）"""
+        dates = [format_time(int_to_date(d), t) for d, t in zip(self.dates.tolist(), self.times.tolist())]
+        columns = [(label, getattr(self, name).tolist()) for name, label in COLUMNS.items()]
+        return [
+            {"日期": date, **{label: values[i] for label, values in columns}}
+            for i, date in enumerate(dates)
+        ]
+
+    @property
+    def nbytes(self) -> int:
+        return self.dates.nbytes + self.times.nbytes + sum(getattr(self, name).nbytes for name in COLUMNS)
+
+    def __repr__(self) -> str:
+        if not len(self):
+            return "KlineFrame(0 bars)"
+        return f"KlineFrame({len(self)} bars, {self.date_str(0)} ~ {self.date_str(-1)})"
+
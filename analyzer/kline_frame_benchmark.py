@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+K 线解析性能对比
+
+逐行 split + float（原实现） vs KlineFrame.from_lines（parse_kline_columns），
+对比解析耗时和每根K线的内存占用。
+
+用法：python3 kline_frame_benchmark.py [K线根数 ...，默认 5000 50000]
+"""
+
+import random
+import sys
+import time
+
+from kline_frame import KlineFrame
+
+
+def parse_by_loop(klines):
+    result = []
+    for line in klines:
+        parts = line.split(",")
+        result.append({
+            "日期": parts[0],
+            "开盘": float(parts[1]),
+            "收盘": float(parts[2]),
+            "最高": float(parts[3]),
+            "最低": float(parts[4]),
+            "成交量": float(parts[5]),
+            "成交额": float(parts[6]),
+            "振幅": float(parts[7]) if parts[7] != "-" else 0,
+            "涨跌幅": float(parts[8]) if parts[8] != "-" else 0,
+            "涨跌额": float(parts[9]) if parts[9] != "-" else 0,
+            "换手率": float(parts[10]) if parts[10] != "-" else 0,
+        })
+    return result
+
+
+def make_lines(n):
+    lines = []
+    for i in range(n):
+        year, day = 1990 + i // 250, i % 250
+        close = round(random.uniform(5, 50), 2)
+        lines.append(
+            f"{year}-{1 + day // 21:02d}-{1 + day % 21:02d},{close},{close},{close + 1},{close - 1},"
+            f"{random.randint(1000, 10 ** 7)},{random.uniform(1e6, 1e9):.1f},"
+            f"{random.uniform(0, 10):.2f},{random.uniform(-10, 10):.2f},{random.uniform(-1, 1):.2f},"
+            + ("-" if i % 97 == 0 else f"{random.uniform(0, 5):.2f}")
+        )
+    return lines
+
+
+def best_of(func, lines, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(lines)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def records_nbytes(records):
+    return sum(
+        sys.getsizeof(r) + sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in r.items())
+        for r in records
+    )
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [5000, 50000]
+    for n in sizes:
+        lines = make_lines(n)
+        frame = KlineFrame.from_lines(lines)
+        records = parse_by_loop(lines)
+        assert frame.to_records() == records
+
+        loop = best_of(parse_by_loop, lines)
+        columns = best_of(KlineFrame.from_lines, lines)
+        print(f"{n} 根K线：逐行解析 {loop * 1000:.1f} ms，列式解析 {columns * 1000:.1f} ms，"
+              f"加速 {loop / columns:.1f} 倍；内存 {records_nbytes(records) / n:.0f} -> {frame.nbytes / n:.0f} 字节/根")
+
+
+if __name__ == "__main__":
+    main()
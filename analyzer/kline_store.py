@@ -0,0 +1,248 @@
+# -*- coding: utf-8 -*-
+"""
+K 线本地增量存储
+
+按 (secid, klt, fqt) 保存东方财富 K 线原始数据行（"日期,开盘,收盘,..."）：
+1. 记录每个键已存储的最早/最新日期
+2. 已有数据时通过 beg= 只请求最新日期之后的尾部（最新一根会被覆盖，兼容盘中未收盘的K线）
+3. 存储不足所需天数时通过 end= 向前补齐更早的历史，已有的历史不会重复下载
+4. 复权因子变化（除权除息后前复权价格整体变化）时自动重建该键
+
+使用 SQLite WAL 模式，launchd 的多次运行与后端可同时读写同一个库文件。
+"""
+
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional
+
+from config_manager import config
+from http_client import http_get
+
+# 默认存储路径（后端 data_providers/kline_store.py 直接导入本模块，读写同一个文件）
+DB_PATH = config.data_dir / "kline.db"
+
+# 同一个键在该时间内不重复请求尾部（秒）
+TAIL_REFRESH_SECONDS = 60
+
+KLINE_URL = (
+    "http://push2his.eastmoney.com/api/qt/stock/kline/get?"
+    "secid={secid}&fields1=f1,f2,f3,f4,f5,f6&"
+    "fields2=f51,f52,f53,f54,f55,f56,f57,f58,f59,f60,f61&"
+    "klt={klt}&fqt={fqt}"
+)
+
+
+def _compact_date(date_str: str) -> str:
+    """"2024-01-02" / "2024-01-02 09:31" -> "20240102"""
+    return date_str[:10].replace("-", "")
+
+
+class KlineStore:
+    """K 线增量存储"""
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path) if path else DB_PATH
+        self._local = threading.local()
+
+    def _conn(self) -> sqlite3.Connection:
+        """每个线程使用独立连接"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS klines (
+                    secid TEXT NOT NULL,
+                    klt INTEGER NOT NULL,
+                    fqt INTEGER NOT NULL,
+                    date TEXT NOT NULL,
+                    line TEXT NOT NULL,
+                    PRIMARY KEY (secid, klt, fqt, date)
+                ) WITHOUT ROWID
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS kline_meta (
+                    secid TEXT NOT NULL,
+                    klt INTEGER NOT NULL,
+                    fqt INTEGER NOT NULL,
+                    first_date TEXT,
+                    last_date TEXT,
+                    head_reached INTEGER NOT NULL DEFAULT 0,
+                    updated_at REAL NOT NULL DEFAULT 0,
+                    PRIMARY KEY (secid, klt, fqt)
+                )
+            """)
+            self._local.conn = conn
+        return conn
+
+    # ========== 读写 ==========
+
+    def read(self, secid: str, klt: int = 101, fqt: int = 1, limit: Optional[int] = None) -> List[str]:
+        """按日期正序读取已存储的 K 线行（limit 为最近 N 根）"""
+        conn = self._conn()
+        if limit is None:
+            rows = conn.execute(
+                "SELECT line FROM klines WHERE secid=? AND klt=? AND fqt=? ORDER BY date",
+                (secid, klt, fqt),
+            ).fetchall()
+        else:
+            rows = conn.execute(
+                "SELECT line FROM klines WHERE secid=? AND klt=? AND fqt=? ORDER BY date DESC LIMIT ?",
+                (secid, klt, fqt, limit),
+            ).fetchall()
+            rows.reverse()
+        return [r[0] for r in rows]
+
+    def count(self, secid: str, klt: int = 101, fqt: int = 1) -> int:
+        """已存储的 K 线数量"""
+        return self._conn().execute(
+            "SELECT COUNT(*) FROM klines WHERE secid=? AND klt=? AND fqt=?",
+            (secid, klt, fqt),
+        ).fetchone()[0]
+
+    def meta(self, secid: str, klt: int = 101, fqt: int = 1) -> Optional[dict]:
+        """读取存储元信息"""
+        row = self._conn().execute(
+            "SELECT first_date, last_date, head_reached, updated_at FROM kline_meta "
+            "WHERE secid=? AND klt=? AND fqt=?",
+            (secid, klt, fqt),
+        ).fetchone()
+        if row is None:
+            return None
+        return {"first_date": row[0], "last_date": row[1], "head_reached": bool(row[2]), "updated_at": row[3]}
+
+    def metas(self, klt: int = 101, fqt: int = 1) -> dict:
+        """一次读取某周期全部标的的元信息和K线数量：{secid: meta}（全市场扫描使用）"""
+        rows = self._conn().execute(
+            "SELECT m.secid, m.first_date, m.last_date, m.head_reached, m.updated_at, "
+            "(SELECT COUNT(*) FROM klines k WHERE k.secid=m.secid AND k.klt=m.klt AND k.fqt=m.fqt) "
+            "FROM kline_meta m WHERE m.klt=? AND m.fqt=?",
+            (klt, fqt),
+        ).fetchall()
+        return {
+            r[0]: {"first_date": r[1], "last_date": r[2], "head_reached": bool(r[3]), "updated_at": r[4], "count": r[5]}
+            for r in rows
+        }
+
+    def merge(self, secid: str, klt: int, fqt: int, lines: List[str], head_reached: bool = False):
+        """合并 K 线行（同日期覆盖）并更新元信息"""
+        conn = self._conn()
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO klines (secid, klt, fqt, date, line) VALUES (?, ?, ?, ?, ?)",
+                [(secid, klt, fqt, line.split(",", 1)[0], line) for line in lines],
+            )
+            first, last = conn.execute(
+                "SELECT MIN(date), MAX(date) FROM klines WHERE secid=? AND klt=? AND fqt=?",
+                (secid, klt, fqt),
+            ).fetchone()
+            conn.execute(
+                """
+                INSERT INTO kline_meta (secid, klt, fqt, first_date, last_date, head_reached, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (secid, klt, fqt) DO UPDATE SET
+                    first_date=excluded.first_date,
+                    last_date=excluded.last_date,
+                    head_reached=MAX(kline_meta.head_reached, excluded.head_reached),
+                    updated_at=excluded.updated_at
+                """,
+                (secid, klt, fqt, first, last, int(head_reached), time.time()),
+            )
+
+    def clear(self, secid: str, klt: int = 101, fqt: int = 1):
+        """删除某个键的全部数据"""
+        conn = self._conn()
+        with conn:
+            conn.execute("DELETE FROM klines WHERE secid=? AND klt=? AND fqt=?", (secid, klt, fqt))
+            conn.execute("DELETE FROM kline_meta WHERE secid=? AND klt=? AND fqt=?", (secid, klt, fqt))
+
+    # ========== 增量更新 ==========
+
+    @staticmethod
+    def kline_url(secid: str, klt: int, fqt: int, **params) -> str:
+        """K 线接口地址"""
+        url = KLINE_URL.format(secid=secid, klt=klt, fqt=fqt)
+        for key, value in params.items():
+            url += f"&{key}={value}"
+        return url
+
+    @staticmethod
+    def parse_response(data: dict) -> List[str]:
+        """从 K 线接口返回值中取出原始数据行"""
+        if data.get("data") and data["data"].get("klines"):
+            return data["data"]["klines"]
+        return []
+
+    def _fetch(self, secid: str, klt: int, fqt: int, **params) -> List[str]:
+        """请求东方财富 K 线接口，返回原始数据行"""
+        url = self.kline_url(secid, klt, fqt, **params)
+        return self.parse_response(http_get(url, endpoint="kline").json())
+
+    def update_steps(self, secid: str, days: int, klt: int = 101, fqt: int = 1):
+        """增量更新流程（生成器）
+
+        每次 yield 一组接口参数，调用方请求后通过 send() 传回原始数据行。
+        同步的 update() 和 async_fetcher 中的异步版本共用这一流程。
+        """
+        meta = self.meta(secid, klt, fqt)
+
+        # 1. 首次获取：直接拉取最近 days 根
+        if meta is None:
+            lines = yield {"end": "20500101", "lmt": days}
+            if lines:
+                self.merge(secid, klt, fqt, lines, head_reached=len(lines) < days)
+            return
+
+        # 2. 尾部增量：从已存储的最新日期开始请求（最新一根重新获取以覆盖盘中数据）
+        if time.time() - meta["updated_at"] >= TAIL_REFRESH_SECONDS:
+            tail = yield {"beg": _compact_date(meta["last_date"]), "end": "20500101"}
+            if tail:
+                stored = self.read(secid, klt, fqt, limit=1)
+                overlap = [line for line in tail if line.split(",", 1)[0] == meta["last_date"]]
+                # 已存储K线的开盘价发生变化，说明复权因子变了，整段重建
+                if stored and overlap and overlap[0].split(",")[1] != stored[0].split(",")[1]:
+                    print(f"{secid} 复权数据已变化，重建本地K线")
+                    self.clear(secid, klt, fqt)
+                    lines = yield {"end": "20500101", "lmt": days}
+                    if lines:
+                        self.merge(secid, klt, fqt, lines, head_reached=len(lines) < days)
+                    return
+                self.merge(secid, klt, fqt, tail)
+
+        # 3. 向前补齐：存储不足 days 根且尚未到达上市首日
+        missing = days - self.count(secid, klt, fqt)
+        if missing > 0 and not meta["head_reached"]:
+            # end 含当日，多请求一根与已存储的最早K线重叠
+            head = yield {"end": _compact_date(meta["first_date"]), "lmt": missing + 1}
+            # 空回复按临时失败处理（不标记已到上市首日，下次继续补齐），非空且不足一页才说明已到首日
+            if head:
+                self.merge(secid, klt, fqt, head, head_reached=len(head) < missing + 1)
+
+    def update(self, secid: str, days: int, klt: int = 101, fqt: int = 1):
+        """确保存储中至少有最近 days 根 K 线，且尾部为最新"""
+        steps = self.update_steps(secid, days, klt, fqt)
+        try:
+            params = next(steps)
+            while True:
+                params = steps.send(self._fetch(secid, klt, fqt, **params))
+        except StopIteration:
+            pass
+
+    def get_klines(self, secid: str, days: int, klt: int = 101, fqt: int = 1) -> List[str]:
+        """获取最近 days 根 K 线原始数据行（增量更新后从本地读取）
+
+        网络不可用时返回本地已有的数据。
+        """
+        try:
+            self.update(secid, days, klt, fqt)
+        except Exception as e:
+            print(f"K线增量更新失败，使用本地数据: {e}")
+        return self.read(secid, klt, fqt, limit=days)
+
+
+# 全局实例
+store = KlineStore()
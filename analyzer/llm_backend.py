@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+"""
+AI 分析后端
+
+call_ai 通过这里的后端执行提示词，由 LLM_BACKEND 选择：
+1. "http"：常驻的 OpenAI 兼容服务（/chat/completions），同一 Session 内保持 keep-alive 连接，
+   以流式方式读取回答；服务只需启动一次，每个提示词不再启动新进程
+2. "cli"：原有的命令行方式（qodercli -p），每个提示词启动一次子进程
+
+后端的 complete() 统一返回 Completion：状态为 "ok"、"refused"（拒绝回答，内容为 None）、
+"timeout" 或 "error"（内容为错误说明），并附带退出码/HTTP 状态码和命中的拒绝特征（用于调用统计）。
+identity 用于 AI 回答缓存的键，更换后端或模型后不复用旧的回答。
+"""
+
+import json
+import re
+import subprocess
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from config_manager import config
+
+# 拒绝回答的特征（命中时由调用方使用规则模板）
+REFUSE_PATTERNS = [
+    r"我是Qoder.*软件工程",
+    r"无法提供.*投资建议",
+    r"没有.*金融.*能力",
+    r"不属于.*专业范围"
+]
+# HTTP 后端的连接超时（秒），读取超时由每次调用的剩余时间决定
+CONNECT_TIMEOUT = 3.05
+
+
+@dataclass
+class Completion:
+    """一次调用的结果"""
+    status: str  # ok / refused / timeout / error
+    text: Optional[str]  # 回答；拒绝时为 None，超时或出错时为错误说明
+    exit_code: Optional[int] = None  # 命令行的退出码或 HTTP 状态码
+    refusal: Optional[str] = None  # 命中的拒绝特征
+
+
+def match_refusal(response: str) -> Optional[str]:
+    """返回命中的拒绝特征（未命中时为 None）"""
+    return next((pattern for pattern in REFUSE_PATTERNS if re.search(pattern, response)), None)
+
+
+def _answer(response: str, exit_code: Optional[int]) -> Completion:
+    refusal = match_refusal(response)
+    if refusal:
+        return Completion("refused", None, exit_code, refusal)
+    return Completion("ok", response, exit_code)
+
+
+class LLMBackend:
+    """后端接口"""
+
+    identity = ""
+
+    def complete(self, prompt: str, timeout: float) -> Completion:
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class CLIBackend(LLMBackend):
+    """命令行后端：每个提示词执行一次 `<path> -p <prompt>`"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or config.llm_cli_path
+        self.identity = f"cli:{self.path}"
+
+    def complete(self, prompt: str, timeout: float) -> Completion:
+        try:
+            result = subprocess.run(
+                [self.path, "-p", prompt],
+                capture_output=True,
+                text=True,
+                timeout=timeout
+            )
+            if result.returncode == 0:
+                return _answer(result.stdout.strip(), result.returncode)
+            else:
+                return Completion("error", f"*AI 分析调用失败: {result.stderr}*", result.returncode)
+        except FileNotFoundError:
+            return Completion("error", f"*AI CLI 未找到（{self.path}），跳过 AI 分析*")
+        except subprocess.TimeoutExpired:
+            return Completion("timeout", "*AI 分析超时*")
+        except Exception as e:
+            return Completion("error", f"*AI 分析出错: {e}*")
+
+
+class HTTPBackend(LLMBackend):
+    """OpenAI 兼容的 HTTP 后端（流式读取，连接在多次调用间复用，线程安全）"""
+
+    def __init__(self, base_url: Optional[str] = None, model: Optional[str] = None,
+                 api_key: Optional[str] = None):
+        self.base_url = (base_url or config.llm_base_url).rstrip("/")
+        self.model = model if model is not None else config.llm_model
+        self.api_key = api_key if api_key is not None else config.llm_api_key
+        self.identity = f"http:{self.base_url}:{self.model}"
+        self._session = None
+        self._lock = threading.Lock()
+
+    def _get_session(self):
+        with self._lock:
+            if self._session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+
+                session = requests.Session()
+                # 每个 AI 工作线程一条 keep-alive 连接
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=config.ai_max_workers, max_retries=0)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                if self.api_key:
+                    session.headers["Authorization"] = f"Bearer {self.api_key}"
+                self._session = session
+            return self._session
+
+    def complete(self, prompt: str, timeout: float) -> Completion:
+        import requests
+
+        deadline = time.monotonic() + timeout
+        payload = {
+            "model": self.model,
+            "messages": [{"role": "user", "content": prompt}],
+            "stream": True,
+        }
+        try:
+            with self._get_session().post(
+                f"{self.base_url}/chat/completions",
+                json=payload,
+                stream=True,
+                timeout=(CONNECT_TIMEOUT, timeout),
+            ) as resp:
+                status_code = resp.status_code
+                if status_code != 200:
+                    return Completion("error", f"*AI 分析调用失败: HTTP {status_code} {resp.text[:200]}*", status_code)
+                # text/event-stream 未声明字符集时 requests 按 ISO-8859-1 解码
+                resp.encoding = resp.encoding if "charset" in resp.headers.get("Content-Type", "") else "utf-8"
+                parts = []
+                for line in resp.iter_lines(decode_unicode=True):
+                    if time.monotonic() > deadline:
+                        return Completion("timeout", "*AI 分析超时*", status_code)
+                    if not line or not line.startswith("data:"):
+                        continue
+                    data = line[5:].strip()
+                    if data == "[DONE]":
+                        break
+                    choices = json.loads(data).get("choices") or [{}]
+                    parts.append(choices[0].get("delta", {}).get("content") or "")
+        except requests.Timeout:
+            return Completion("timeout", "*AI 分析超时*")
+        except requests.ConnectionError:
+            return Completion("error", f"*AI 服务无法连接（{self.base_url}），跳过 AI 分析*")
+        except Exception as e:
+            return Completion("error", f"*AI 分析出错: {e}*")
+
+        return _answer("".join(parts).strip(), status_code)
+
+    def close(self):
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+
+BACKENDS = {
+    "cli": CLIBackend,
+    "http": HTTPBackend,
+}
+
+_backend: Optional[LLMBackend] = None
+_backend_lock = threading.Lock()
+
+
+def get_backend() -> LLMBackend:
+    """按 LLM_BACKEND 创建的后端（整个进程共用一个）"""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            name = config.llm_backend
+            if name not in BACKENDS:
+                raise ValueError(f"未知的 LLM_BACKEND: {name}（可选: {', '.join(BACKENDS)}）")
+            _backend = BACKENDS[name]()
+        return _backend
+
+
+def close_backend():
+    """关闭后端的连接（运行结束时调用）"""
+    global _backend
+    with _backend_lock:
+        if _backend is not None:
+            _backend.close()
+            _backend = None
@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+"""
+AI 分析结果的持久化缓存
+
+1. 以"规范化后的提示词 + 提示词类型 + 后端标识"的哈希为键，提示词完全相同时直接复用上次的回答
+2. 每类提示词有各自的有效期（LLM_CACHE_TTL）：
+   - "session"：到当前交易时段结束（11:30 / 15:00 / 次日 09:30）
+   - "day"：到当天结束
+   - 整数：秒数；0 表示该类不缓存
+3. AI 拒绝回答（call_ai 返回 None）也会缓存（负缓存），有效期不超过 NEGATIVE_TTL，
+   期间直接使用规则模板，不再重复调用；调用失败、超时等错误不缓存
+4. 批量分析的回答不符合分隔格式时按后端记录（当天有效），期间该后端逐个分析，不再先试批量
+5. 运行结束时输出各类提示词的命中率
+
+缓存存放在 data_dir/llm_cache.sqlite，过期条目在每次运行首次访问时清理。
+"""
+
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from config_manager import config
+
+DB_PATH = config.data_dir / "llm_cache.sqlite"
+# 拒绝回答的最长缓存时间（秒），过后重新尝试
+NEGATIVE_TTL = 3600
+# 交易时段的结束时间（时, 分），最后一个时段持续到次日开盘
+SESSION_ENDS = [(11, 30), (15, 0)]
+NEXT_OPEN = (9, 30)
+# 批量回答格式不符的记录（按后端），有效期策略同 LLM_CACHE_TTL
+BATCH_FORMAT_KIND = "batch_format"
+BATCH_FORMAT_TTL = "day"
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_prompt(prompt: str) -> str:
+    """去掉首尾空白，连续空白（含换行、缩进）合并为一个空格"""
+    return _WHITESPACE.sub(" ", prompt).strip()
+
+
+def prompt_key(prompt: str, kind: str, backend: str) -> str:
+    digest = hashlib.sha256()
+    for part in (backend, kind, normalize_prompt(prompt)):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def session_end(now: datetime) -> datetime:
+    """当前交易时段的结束时间"""
+    for hour, minute in SESSION_ENDS:
+        end = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        if now < end:
+            return end
+    return (now + timedelta(days=1)).replace(hour=NEXT_OPEN[0], minute=NEXT_OPEN[1], second=0, microsecond=0)
+
+
+def expires_at(policy, now: Optional[datetime] = None) -> Optional[float]:
+    """按有效期策略计算过期时间戳（不缓存时返回 None）"""
+    now = now or datetime.now()
+    if policy == "session":
+        return session_end(now).timestamp()
+    if policy == "day":
+        return (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0).timestamp()
+    seconds = float(policy or 0)
+    return now.timestamp() + seconds if seconds > 0 else None
+
+
+class LLMCache:
+    """AI 回答缓存（线程安全，每个线程使用独立的 SQLite 连接）"""
+
+    def __init__(self, path: Optional[Path] = None, ttl: Optional[Dict] = None):
+        self.path = Path(path or DB_PATH)
+        self.ttl = ttl if ttl is not None else config.llm_cache_ttl
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._pruned = False
+        self.reset_stats()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    response TEXT,
+                    created_at REAL NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            """)
+            self._local.conn = conn
+        with self._lock:
+            if not self._pruned:
+                self._pruned = True
+                with conn:
+                    conn.execute("DELETE FROM responses WHERE expires_at <= ?", (time.time(),))
+        return conn
+
+    def _count(self, kind: str, field: str):
+        with self._lock:
+            entry = self._stats.setdefault(kind, {"hits": 0, "refusals": 0, "misses": 0})
+            entry[field] += 1
+
+    def enabled(self, kind: str) -> bool:
+        return bool(self.ttl.get(kind))
+
+    def get(self, prompt: str, kind: str, backend: str,
+            now: Optional[datetime] = None) -> Tuple[bool, Optional[str]]:
+        """查询缓存（now 为查询时间，默认当前时间）
+
+        Returns:
+            (是否命中, 回答)；命中的回答为 None 表示上次拒绝回答
+        """
+        if not self.enabled(kind):
+            return False, None
+        try:
+            row = self._conn().execute(
+                "SELECT response FROM responses WHERE key = ? AND expires_at > ?",
+                (prompt_key(prompt, kind, backend), (now or datetime.now()).timestamp()),
+            ).fetchone()
+        except sqlite3.Error as e:
+            print(f"读取 AI 缓存失败: {e}")
+            return False, None
+        if row is None:
+            self._count(kind, "misses")
+            return False, None
+        self._count(kind, "hits" if row[0] is not None else "refusals")
+        return True, row[0]
+
+    def put(self, prompt: str, kind: str, backend: str, response: Optional[str],
+            now: Optional[datetime] = None):
+        """保存回答（response 为 None 表示拒绝回答，有效期不超过 NEGATIVE_TTL；now 默认当前时间）"""
+        now = now or datetime.now()
+        expiry = expires_at(self.ttl.get(kind), now)
+        if expiry is None:
+            return
+        created = now.timestamp()
+        if response is None:
+            expiry = min(expiry, created + NEGATIVE_TTL)
+        try:
+            conn = self._conn()
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, kind, response, created_at, expires_at) VALUES (?, ?, ?, ?, ?)",
+                    (prompt_key(prompt, kind, backend), kind, response, created, expiry),
+                )
+        except sqlite3.Error as e:
+            print(f"写入 AI 缓存失败: {e}")
+
+    def mark_batch_unsupported(self, backend: str, now: Optional[datetime] = None):
+        """记录该后端的批量回答不符合分隔格式"""
+        now = now or datetime.now()
+        try:
+            conn = self._conn()
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, kind, response, created_at, expires_at) VALUES (?, ?, ?, ?, ?)",
+                    (prompt_key("", BATCH_FORMAT_KIND, backend), BATCH_FORMAT_KIND, None,
+                     now.timestamp(), expires_at(BATCH_FORMAT_TTL, now)),
+                )
+        except sqlite3.Error as e:
+            print(f"写入 AI 缓存失败: {e}")
+
+    def batch_unsupported(self, backend: str, now: Optional[datetime] = None) -> bool:
+        """该后端近期的批量回答是否不符合分隔格式（不计入命中统计）"""
+        try:
+            row = self._conn().execute(
+                "SELECT 1 FROM responses WHERE key = ? AND expires_at > ?",
+                (prompt_key("", BATCH_FORMAT_KIND, backend), (now or datetime.now()).timestamp()),
+            ).fetchone()
+        except sqlite3.Error as e:
+            print(f"读取 AI 缓存失败: {e}")
+            return False
+        return row is not None
+
+    def reset_stats(self):
+        with self._lock:
+            self._stats: Dict[str, Dict[str, int]] = {}
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {kind: dict(s) for kind, s in self._stats.items()}
+
+    def print_stats(self):
+        """打印本次运行的 AI 缓存命中情况"""
+        stats = self.stats()
+        if not stats:
+            return
+        print("[缓存] AI 分析缓存统计：")
+        for kind, s in sorted(stats.items()):
+            total = s["hits"] + s["refusals"] + s["misses"]
+            rate = (s["hits"] + s["refusals"]) / total * 100 if total else 0
+            print(
+                f"  - {kind}: 命中 {s['hits']} 次，命中拒绝记录 {s['refusals']} 次，"
+                f"未命中 {s['misses']} 次，命中率 {rate:.0f}%"
+            )
+
+
+# 全局实例
+llm_cache = LLMCache()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+OpenAI 兼容服务的本地替身
+
+实现 POST /v1/chat/completions（支持 stream=true 的 SSE 流式返回），回答为固定格式的文本，
+用于在没有模型服务的机器上联调 LLM_BACKEND=http 和测试完整的报告流程。
+
+用法：python3 llm_stub_server.py [--port 8000] [--delay 0.0]
+"""
+
+import argparse
+import json
+import re
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# 批量分析提示词中的标的分隔行（格式说明中的示例行名称为"名称"）
+_BATCH_HEADER = re.compile(r"<<<标的(\d+)：([^>]+)>>>")
+
+
+def stub_answer(prompt: str) -> str:
+    """按提示词类型返回固定格式的回答（批量分析按分隔格式逐个标的回答）"""
+    if "周期性分析" in prompt:
+        return "当前周期: 本地替身服务\n周期位置: 未知\n持续时间: 未知\n分析: 本地替身服务的固定回答。"
+    targets = {}
+    for index, name in _BATCH_HEADER.findall(prompt):
+        if name != "名称":
+            targets.setdefault(int(index), name)
+    if targets:
+        sections = [f"<<<标的{i}：{name}>>>\n*本地替身服务对{name}的固定回答*" for i, name in sorted(targets.items())]
+        return "\n".join(sections + ["<<<结束>>>"])
+    return f"*本地替身服务的固定回答（提示词 {len(prompt)} 字符）*"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # 支持 keep-alive
+    delay = 0.0
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, body: dict):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": f"unknown path {self.path}"}})
+            return
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        prompt = "".join(m.get("content", "") for m in request.get("messages", []))
+        answer = stub_answer(prompt)
+        time.sleep(self.delay)
+
+        if not request.get("stream"):
+            self._send_json(200, {
+                "object": "chat.completion",
+                "model": request.get("model", ""),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": answer}, "finish_reason": "stop"}],
+            })
+            return
+
+        # 流式返回：按 chunked 编码逐段发送 SSE 事件
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        pieces = [answer[i:i + 16] for i in range(0, len(answer), 16)]
+        events = [{"choices": [{"index": 0, "delta": {"content": piece}}]} for piece in pieces]
+        for event in events:
+            self._write_chunk(f"data: {json.dumps(event, ensure_ascii=False)}\n\n")
+        self._write_chunk("data: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _write_chunk(self, text: str):
+        data = text.encode("utf-8")
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAI 兼容服务的本地替身")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--delay", type=float, default=0.0, help="每次回答前等待的秒数（模拟推理耗时）")
+    args = parser.parse_args()
+
+    StubHandler.delay = args.delay
+    server = ThreadingHTTPServer((args.host, args.port), StubHandler)
+    print(f"本地替身服务已启动: http://{args.host}:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+AI 调用统计
+
+call_ai 的每次调用都记录一条：提示词类型、提示词/回答字节数、耗时、结果状态、退出码（HTTP 状态码）
+和命中的拒绝特征。状态为：
+- ok / refused / timeout / error：实际调用了后端
+- cache_hit / cache_refused：命中 AI 回答缓存（llm_cache），未调用后端
+- deadline：已到本次运行的截止时间，未调用后端
+
+运行结束时汇总（调用次数、按状态计数、耗时合计与 p50/p95、提示词大小分布等），
+写入报告旁的 JSON 文件（<报告名>.<运行开始时间 HHMMSS>.llm.json），便于按天跟踪 AI 调用的耗时和开销。
+报告按天命名，同一天的多次运行（如 10:00 和 14:30）各写一份，不会互相覆盖。
+"""
+
+import json
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+# 直方图的分桶上限（最后一个桶为"以上"）
+LATENCY_BUCKETS = [1, 2, 5, 10, 30, 60, 120, 300]  # 秒
+PROMPT_BYTES_BUCKETS = [1024, 2048, 4096, 8192, 16384, 65536, 262144]
+# 实际调用了后端的状态
+CALLED = ("ok", "refused", "timeout", "error")
+
+
+def percentile(values: Sequence[float], q: float) -> Optional[float]:
+    """最近秩法分位数（values 为空时返回 None）"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * q // 100))
+    return ordered[int(rank) - 1]
+
+
+def histogram(values: Sequence[float], buckets: Sequence[float]) -> Dict[str, int]:
+    counts = {f"<={bound}": 0 for bound in buckets}
+    counts[f">{buckets[-1]}"] = 0
+    for value in values:
+        bound = next((b for b in buckets if value <= b), None)
+        counts[f"<={bound}" if bound is not None else f">{buckets[-1]}"] += 1
+    return counts
+
+
+def _distribution(values: Sequence[float], digits: int = 3) -> Dict:
+    return {
+        "total": round(sum(values), digits),
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "max": max(values) if values else None,
+    }
+
+
+class LLMTelemetry:
+    """AI 调用记录（线程安全）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """清空记录（每次运行开始时调用）"""
+        with self._lock:
+            self._calls: List[Dict] = []
+            self._started_at = datetime.now()
+
+    def record(self, kind: Optional[str], backend: str, prompt: str, status: str,
+               response: Optional[str] = None, latency: float = 0.0,
+               exit_code: Optional[int] = None, refusal: Optional[str] = None):
+        entry = {
+            "time": datetime.now().strftime("%H:%M:%S"),
+            "kind": kind or "other",
+            "backend": backend,
+            "status": status,
+            "prompt_bytes": len(prompt.encode("utf-8")),
+            "response_bytes": len(response.encode("utf-8")) if response else 0,
+            "latency_s": round(latency, 3),
+            "exit_code": exit_code,
+            "refusal": refusal,
+        }
+        with self._lock:
+            self._calls.append(entry)
+
+    def calls(self) -> List[Dict]:
+        with self._lock:
+            return list(self._calls)
+
+    def summary(self) -> Dict:
+        """本次运行的汇总"""
+        calls = self.calls()
+        called = [c for c in calls if c["status"] in CALLED]
+        by_status: Dict[str, int] = {}
+        for c in calls:
+            by_status[c["status"]] = by_status.get(c["status"], 0) + 1
+        by_kind: Dict[str, Dict] = {}
+        for kind in sorted({c["kind"] for c in calls}):
+            kind_called = [c for c in called if c["kind"] == kind]
+            by_kind[kind] = {
+                "requests": sum(1 for c in calls if c["kind"] == kind),
+                "backend_calls": len(kind_called),
+                "latency_s": _distribution([c["latency_s"] for c in kind_called]),
+            }
+        refusals: Dict[str, int] = {}
+        for c in called:
+            if c["refusal"]:
+                refusals[c["refusal"]] = refusals.get(c["refusal"], 0) + 1
+        latencies = [c["latency_s"] for c in called]
+        prompt_bytes = [c["prompt_bytes"] for c in called]
+        return {
+            "started_at": self._started_at.strftime("%Y-%m-%d %H:%M:%S"),
+            "requests": len(calls),
+            "backend_calls": len(called),
+            "by_status": by_status,
+            "timeouts": by_status.get("timeout", 0),
+            "refusals": refusals,
+            "latency_s": _distribution(latencies),
+            "latency_histogram": histogram(latencies, LATENCY_BUCKETS),
+            "prompt_bytes": _distribution(prompt_bytes, 0),
+            "prompt_bytes_histogram": histogram(prompt_bytes, PROMPT_BYTES_BUCKETS),
+            "response_bytes": _distribution([c["response_bytes"] for c in called], 0),
+            "by_kind": by_kind,
+        }
+
+    def write_sidecar(self, report_path) -> Optional[Path]:
+        """把汇总和每次调用的记录写入报告旁的 <报告名>.<运行开始时间>.llm.json"""
+        if not self.calls():
+            return None
+        report_path = Path(report_path)
+        path = report_path.with_name(f"{report_path.stem}.{self._started_at:%H%M%S}.llm.json")
+        try:
+            path.write_text(
+                json.dumps({"summary": self.summary(), "calls": self.calls()}, ensure_ascii=False, indent=2),
+                encoding="utf-8",
+            )
+        except OSError as e:
+            print(f"写入 AI 调用统计失败: {e}")
+            return None
+        return path
+
+    def print_stats(self):
+        summary = self.summary()
+        if not summary["requests"]:
+            return
+        latency = summary["latency_s"]
+        status = "，".join(f"{k} {v}" for k, v in sorted(summary["by_status"].items()))
+        line = f"[AI] 共 {summary['requests']} 次请求（{status}），调用后端 {summary['backend_calls']} 次"
+        if summary["backend_calls"]:
+            line += f"，耗时合计 {latency['total']:.1f}s，p50 {latency['p50']:.1f}s，p95 {latency['p95']:.1f}s"
+        print(line)
+
+
+# 全局实例
+llm_telemetry = LLMTelemetry()
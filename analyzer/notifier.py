@@ -1,19 +1,8 @@
 # -*- coding: utf-8 -*-
-import smtplib
-import sys
 import re
 from datetime import datetime
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from email.utils import formataddr
 from config_manager import config
 
-try:
-    import markdown
-except ImportError:
-    print("请先安装依赖: pip install markdown")
-    sys.exit(1)
-
 # 邮件配置
 EMAIL_SENDER = config.email_sender
 EMAIL_AUTH_CODE = config.email_auth_code
@@ -27,6 +16,17 @@ def send_email(subject, content):
         print("邮件配置不完整，跳过邮件发送。请检查配置文件或环境变量。")
         return False
     
+    # markdown 和 smtplib（含 ssl）在发送时才导入，缺少依赖时只跳过邮件，不中断报告生成
+    try:
+        import markdown
+    except ImportError:
+        print("缺少 markdown 依赖，跳过邮件发送。请先安装依赖: pip install markdown")
+        return False
+    import smtplib
+    from email.mime.text import MIMEText
+    from email.mime.multipart import MIMEMultipart
+    from email.utils import formataddr
+    
     print(f"正在发送邮件报告至 {EMAIL_RECEIVER}...")
     try:
         # 将 Markdown 转换为 HTML，支持表格扩展
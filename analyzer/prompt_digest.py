@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+"""
+AI 提示词的数据摘要
+
+报告正文是给人看的 Markdown（含 Base64 筹码图、指数图和多张表格），直接作为提示词时长达数百 KB。
+这里把 generate_target_report() 返回的结构化数据（实时行情、K线、资金流向、成交量特征、筹码、
+指数关键位）整理成紧凑的要点，并控制在 token 预算内：
+
+1. build_target_digest()：单标的要点，超出预算时按优先级从低到高丢弃整段
+2. pack_batches()：批量分析时按标的数和 token 预算把多个标的装入同一个提示词
+3. build_summary_digest()：综合总结用，每个标的一行，再附上去掉图片和表格分隔行的板块/周期性行业内容
+4. estimate_tokens()：按中文字符 1 token、其他字符 4 个 1 token 粗略估算
+"""
+
+import re
+from typing import Dict, List, Optional, Sequence
+
+# 单标的要点的 token 预算
+TARGET_TOKEN_BUDGET = 400
+# 批量分析时每个提示词中数据要点的 token 预算
+BATCH_TOKEN_BUDGET = 3000
+# 综合总结的 token 预算
+SUMMARY_TOKEN_BUDGET = 1200
+
+_CJK = re.compile(r"[\u3000-\u303f\u4e00-\u9fff\uff00-\uffef]")
+_MD_IMAGE = re.compile(r"!\[[^\]]*\]\([^)]*\)")
+_HTML_TAG = re.compile(r"<[^>]+>")
+_TABLE_RULE = re.compile(r"^\|?[\s:|-]+\|?$")
+
+
+def estimate_tokens(text: str) -> int:
+    cjk = len(_CJK.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def truncate_to_budget(text: str, budget: int) -> str:
+    """按行截断到预算内"""
+    lines, used = [], 0
+    for line in text.splitlines():
+        cost = estimate_tokens(line) + 1
+        if used + cost > budget:
+            lines.append("……（已截断）")
+            break
+        lines.append(line)
+        used += cost
+    return "\n".join(lines)
+
+
+def compact_markdown(text: str) -> str:
+    """去掉图片（含内嵌 Base64）、HTML 标签、表格分隔行和空行"""
+    text = _HTML_TAG.sub("", _MD_IMAGE.sub("", text))
+    lines = [line.strip() for line in text.splitlines()]
+    return "\n".join(line for line in lines if line and not _TABLE_RULE.match(line))
+
+
+def _yi(value) -> str:
+    return f"{value / 100000000:.2f}"
+
+
+def latest_change(status: Dict) -> Optional[float]:
+    """最新涨跌幅（%）：优先实时行情，其次最近一天的 K 线"""
+    realtime = status.get("realtime")
+    if realtime and realtime.get("涨跌幅") is not None:
+        return realtime["涨跌幅"]
+    history = status.get("history")
+    if history:
+        return max(history, key=lambda row: row["日期"])["涨跌幅"]
+    return None
+
+
+def main_flow_total(status: Dict, days: int = 3) -> Optional[float]:
+    """最近 days 天主力净流入合计（元）"""
+    money_flow = status.get("money_flow")
+    if not money_flow:
+        return None
+    rows = sorted(money_flow, key=lambda row: row["日期"], reverse=True)[:days]
+    return sum(row["主力净流入"] for row in rows)
+
+
+def _realtime_section(status: Dict) -> List[str]:
+    realtime = status.get("realtime")
+    if not realtime:
+        return []
+    return [f"实时：最新价 {realtime['最新价']:.2f}，涨跌幅 {realtime['涨跌幅']:.2f}%，成交额 {_yi(realtime['成交额'])} 亿"]
+
+
+def _history_section(status: Dict) -> List[str]:
+    history = status.get("history")
+    if not history:
+        return []
+    rows = sorted(history, key=lambda row: row["日期"], reverse=True)
+    days = "；".join(
+        f"{row['日期'][5:]} 收 {row['收盘']:.2f}（{row['涨跌幅']:+.2f}%，额 {_yi(row['成交额'])} 亿，振幅 {row['振幅']:.2f}%）"
+        for row in rows
+    )
+    return [f"近{len(rows)}日：{days}"]
+
+
+def _money_flow_section(status: Dict) -> List[str]:
+    money_flow = status.get("money_flow")
+    if not money_flow:
+        return []
+    rows = sorted(money_flow, key=lambda row: row["日期"], reverse=True)
+    days = "；".join(
+        f"{row['日期'][5:]} {_yi(row['主力净流入'])}（超大单 {_yi(row['超大单净流入'])}，大单 {_yi(row['大单净流入'])}）"
+        for row in rows
+    )
+    return [f"主力净流入（亿）：{days}；合计 {_yi(main_flow_total(status, len(rows)))}"]
+
+
+def _volume_section(status: Dict) -> List[str]:
+    volume = status.get("volume_analysis")
+    if not volume or "error" in volume:
+        return []
+    parts = [f"{volume['成交量状态']}（较均量 {volume['成交量变化']}）", f"换手率 {volume['今日换手率']}"]
+    if volume.get("平均换手率"):
+        parts[-1] += f"（平均 {volume['平均换手率']}）"
+    if volume.get("量价关系描述"):
+        parts.append(f"{volume['量价关系类型']}：{volume['量价关系描述']}")
+    return [f"成交量：{'，'.join(parts)}"]
+
+
+def _chip_section(status: Dict) -> List[str]:
+    chip = status.get("chip_distribution")
+    if not chip:
+        return []
+    fields = [("获利比例", "获利比例"), ("平均成本", "平均成本"), ("90%成本", "90%成本区间"),
+              ("90%集中度", "90%集中度"), ("70%集中度", "70%集中度")]
+    parts = [f"{label} {chip[key]}" for key, label in fields if chip.get(key)]
+    return [f"筹码：{'，'.join(parts)}"] if parts else []
+
+
+def _index_section(status: Dict) -> List[str]:
+    levels = status.get("index_levels")
+    if not levels or levels.get("ma250") is None:
+        return []
+    return [
+        f"关键位：250 日均线 {levels['ma250']:.2f}，近 20 日高点 {levels['recent_high']:.2f}，"
+        f"低点 {levels['recent_low']:.2f}"
+    ]
+
+
+# 按优先级从高到低排列，超出预算时从末尾开始丢弃
+TARGET_SECTIONS = [
+    _realtime_section,
+    _history_section,
+    _money_flow_section,
+    _volume_section,
+    _chip_section,
+    _index_section,
+]
+
+
+def build_target_digest(name: str, status: Dict, budget: int = TARGET_TOKEN_BUDGET) -> str:
+    """单标的数据要点（不含图片和表格）"""
+    lines = [f"{name}（{status.get('code', '')}）"]
+    used = estimate_tokens(lines[0])
+    for section in TARGET_SECTIONS:
+        section_lines = section(status)
+        cost = sum(estimate_tokens(line) + 1 for line in section_lines)
+        if used + cost > budget:
+            print(f"{name} 的数据要点超出预算，省略 {section.__name__.strip('_')}")
+            continue
+        lines.extend(section_lines)
+        used += cost
+    return "\n".join(lines)
+
+
+def pack_batches(items: Sequence, digests: Sequence[str], max_items: int,
+                 budget: int = BATCH_TOKEN_BUDGET) -> List[List]:
+    """按顺序把 items 分批：每批最多 max_items 个，且数据要点合计不超过 budget（单个超出预算的单独成批）"""
+    batches, current, used = [], [], 0
+    for item, digest in zip(items, digests):
+        cost = estimate_tokens(digest)
+        if current and (len(current) >= max(1, max_items) or used + cost > budget):
+            batches.append(current)
+            current, used = [], 0
+        current.append(item)
+        used += cost
+    if current:
+        batches.append(current)
+    return batches
+
+
+def target_overview(status: Dict) -> str:
+    """综合总结中每个标的的一行概览"""
+    parts = []
+    change = latest_change(status)
+    if change is not None:
+        parts.append(f"涨跌幅 {change:+.2f}%")
+    flow = main_flow_total(status)
+    if flow is not None:
+        parts.append(f"近3日主力净流入 {_yi(flow)} 亿")
+    volume = status.get("volume_analysis")
+    if volume and "error" not in volume:
+        parts.append(f"{volume['成交量状态']}，{volume['量价关系类型']}")
+    chip = status.get("chip_distribution")
+    if chip and chip.get("获利比例"):
+        parts.append(f"获利比例 {chip['获利比例']}")
+    return f"{status.get('name', '')}：{'，'.join(parts) or '数据获取失败'}"
+
+
+def build_summary_digest(statuses: Sequence[Dict], sections: Sequence[str],
+                         budget: int = SUMMARY_TOKEN_BUDGET) -> str:
+    """综合总结的数据要点：各标的概览 + 去掉图片和表格分隔行的其他报告段落（超出预算时截断）"""
+    lines = ["【各标的概览】"] + [f"- {target_overview(status)}" for status in statuses]
+    lines += [compact_markdown(section) for section in sections]
+    return truncate_to_budget("\n".join(lines), budget)
@@ -2,14 +2,22 @@
 from datetime import datetime
 from config_manager import config
 from data_fetcher import get_realtime_quote, get_index_history, get_money_flow, get_sector_data, get_chip_distribution, get_stock_chip_image_and_data
-from cyclical_analyzer import analyze_cyclical_industries
 from volume_analyzer import get_volume_analysis_report, get_volume_feature_summary
 
 # 配置
 REPORTS_DIR = config.reports_dir
 
-def generate_target_report(target):
-    """生成单个标的的报告内容"""
+def generate_target_report(target, realtime=None, prefetched=None):
+    """生成单个标的的报告内容
+    
+    Args:
+        target: 标的配置
+        realtime: 已批量获取的实时行情（为 None 时单独请求）
+        prefetched: async_fetcher.fetch_targets() 并发获取的数据（为 None 时逐项同步请求）
+    """
+    prefetched = prefetched or {}
+    if realtime is None:
+        realtime = prefetched.get("realtime")
     secid = target["secid"]
     name = target["name"]
     
@@ -20,7 +28,8 @@ def generate_target_report(target):
     
     # 0. 实时行情
     report_lines.append("### 实时行情")
-    realtime = get_realtime_quote(secid)
+    if realtime is None:
+        realtime = get_realtime_quote(secid)
     if realtime:
         report_lines.append(f"- **最新价**: {realtime['最新价']:.2f}")
         report_lines.append(f"- **涨跌幅**: {realtime['涨跌幅']:.2f}%")
@@ -42,7 +51,7 @@ def generate_target_report(target):
     
     # 1. 行情数据
     report_lines.append("### 行情数据（最近3天）")
-    history = get_index_history(secid, 3)
+    history = prefetched["history"] if "history" in prefetched else get_index_history(secid, 3)
     if history:
         # 按日期倒排
         history.sort(key=lambda x: x['日期'], reverse=True)
@@ -66,7 +75,7 @@ def generate_target_report(target):
     
     # 2. 资金流向
     report_lines.append("### 资金流向（最近3天）")
-    money_flow = get_money_flow(secid, 3)
+    money_flow = prefetched["money_flow"] if "money_flow" in prefetched else get_money_flow(secid, 3)
     if money_flow:
         # 按日期倒排
         money_flow.sort(key=lambda x: x['日期'], reverse=True)
@@ -91,7 +100,7 @@ def generate_target_report(target):
     # 2.5 成交量特征分析
     print(f"\n--- 开始获取 {name} 的成交量分析 ---")
     try:
-        volume_report = get_volume_analysis_report(secid, days=20)
+        volume_report = get_volume_analysis_report(secid, days=20, history=prefetched.get("volume_history"))
         if volume_report:
             report_lines.append("### 成交量特征分析")
             report_lines.append("")
@@ -106,14 +115,16 @@ def generate_target_report(target):
     # 只有个股才获取筹码分布图和详细数据
     chip_image_base64 = None
     chip_detail_data = None
-    chip_data = None  # 初始化变量
     
     if target['type'] == 'stock':
         report_lines.append("### 筹码分布")
         
         print(f"\n--- 开始获取 {name} ({target['code']}) 的筹码分布信息 ---")
         try:
-            chip_image_base64, chip_detail_data = get_stock_chip_image_and_data(target['code'])
+            if "chip_image" in prefetched:
+                chip_image_base64, chip_detail_data = prefetched["chip_image"], prefetched["chip_detail"]
+            else:
+                chip_image_base64, chip_detail_data = get_stock_chip_image_and_data(target['code'])
             
             if chip_image_base64:
                 print(f"成功获取 {name} 的筹码分布图")
@@ -155,18 +166,21 @@ def generate_target_report(target):
     
     report_lines.append("")
     
-    # 4. 恒生科技指数特别分析（如果配置了 HSTECH）
-    if target.get('is_hstech', False):
-        from hstech_analyzer import HSTECHAnalyzerFacade
-        
-        report_lines.append("### 恒生科技指数智能分析")
+    # 4. 指数智能分析（支撑位、压力位和入场时机）
+    index_levels = None
+    if target.get('type') == 'index':
+        report_lines.append(f"### {name}智能分析")
         print(f"\n--- 开始生成 {name} 智能分析报告 ---")
         
         try:
-            analyzer = HSTECHAnalyzerFacade()
-            report = analyzer.generate_full_report(save_chart=True, verbose=False)
+            # stock_analyzer 中已由 analyze_indices() 并发生成时直接使用
+            report = prefetched.get("index_report")
+            if report is None:
+                from index_analyzer import IndexAnalyzerFacade
+                report = IndexAnalyzerFacade(secid, name).generate_full_report(save_chart=True, verbose=False)
             
             if report:
+                index_levels = report.get("technical_indicators")
                 # 添加文字分析
                 report_lines.append("**智能分析结果**")
                 report_lines.append("")
@@ -181,10 +195,10 @@ def generate_target_report(target):
                 else:
                     print(f"未能获取 {name} 的分析图表 Base64 数据")
             else:
-                print(f"恒生科技指数分析失败")
+                print(f"{name}分析失败")
                 
         except Exception as e:
-            print(f"恒生科技指数分析错误：{e}")
+            print(f"{name}分析错误：{e}")
             import traceback
             traceback.print_exc()
         print(f"--- 智能分析报告生成结束 ---\n")
@@ -194,11 +208,23 @@ def generate_target_report(target):
     # 获取成交量特征摘要（用于AI分析）
     volume_summary = None
     try:
-        volume_summary = get_volume_feature_summary(secid, days=20)
+        volume_summary = get_volume_feature_summary(secid, days=20, history=prefetched.get("volume_history"))
     except Exception as e:
         print(f"获取成交量特征摘要失败: {e}")
     
-    return "\n".join(report_lines), {"history": history, "money_flow": money_flow, "chip_distribution": chip_data, "volume_analysis": volume_summary}
+    # 结构化数据：用于判断数据是否获取成功，并供 AI 提示词摘要（prompt_digest）和规则模板使用
+    status = {
+        "name": name,
+        "code": target["code"],
+        "type": target.get("type"),
+        "realtime": realtime,
+        "history": history,
+        "money_flow": money_flow,
+        "chip_distribution": chip_detail_data,
+        "volume_analysis": volume_summary,
+        "index_levels": index_levels,
+    }
+    return "\n".join(report_lines), status
 
 def generate_sector_report():
     """生成热门板块报告内容"""
@@ -230,6 +256,7 @@ def generate_cyclical_industry_report():
         ""
     ]
     
+    from cyclical_analyzer import analyze_cyclical_industries
     industries = analyze_cyclical_industries()
     if industries and len(industries) > 0:
         for industry in industries:
@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""
+K 线周期合成
+
+支持东方财富的全部常用周期（klt 参数）：1/5/15/30/60 分钟、日线（101）、周线（102）、月线（103）。
+只有 1 分钟和日线从接口获取并存入本地K线存储，其余周期在本地合成：
+1. 5/15/30/60 分钟线由 1 分钟线按交易时段分组合成（每个时段内重新计数，与行情软件一致）
+2. 周线、月线由日线按自然周/自然月分组合成，日期为该周期内最后一个交易日
+
+分组后开盘取首根、收盘取末根、最高/最低取极值、成交量/成交额/换手率求和，
+涨跌额、涨跌幅、振幅按上一根合成K线的收盘价重新计算。
+"""
+
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+
+from kline_frame import KlineFrame
+
+MINUTE_KLTS = (1, 5, 15, 30, 60)
+DAILY_KLT = 101
+WEEKLY_KLT = 102
+MONTHLY_KLT = 103
+KLTS = MINUTE_KLTS + (DAILY_KLT, WEEKLY_KLT, MONTHLY_KLT)
+
+KLT_NAMES = {
+    1: "1分钟", 5: "5分钟", 15: "15分钟", 30: "30分钟", 60: "60分钟",
+    DAILY_KLT: "日线", WEEKLY_KLT: "周线", MONTHLY_KLT: "月线",
+}
+
+# 交易时段（HHMM），分钟K线的时间为该分钟结束时刻
+A_SHARE_SESSIONS = ((930, 1130), (1300, 1500))
+HK_SESSIONS = ((930, 1200), (1300, 1600))
+# 港股市场的 secid 前缀
+HK_MARKETS = ("116", "124")
+
+# 合成周/月线时每根所需日线数的上限（多取一根覆盖首个不完整的周期）
+DAYS_PER_BAR = {WEEKLY_KLT: 5, MONTHLY_KLT: 23}
+
+
+def sessions_for(secid: Optional[str]) -> Tuple[Tuple[int, int], ...]:
+    """按 secid 的市场前缀返回交易时段"""
+    if secid and secid.split(".")[0] in HK_MARKETS:
+        return HK_SESSIONS
+    return A_SHARE_SESSIONS
+
+
+def source_klt(klt: int) -> int:
+    """合成该周期所需的基础周期：分钟线为 1 分钟，周/月线为日线"""
+    if klt not in KLTS:
+        raise ValueError(f"不支持的K线周期: {klt}")
+    return 1 if klt in MINUTE_KLTS else DAILY_KLT
+
+
+def source_count(count: int, klt: int) -> int:
+    """合成 count 根该周期K线所需的基础K线数量"""
+    if klt in MINUTE_KLTS:
+        return count * klt + klt
+    if klt in DAYS_PER_BAR:
+        return (count + 1) * DAYS_PER_BAR[klt]
+    return count
+
+
+def _minutes(hhmm):
+    return hhmm // 100 * 60 + hhmm % 100
+
+
+def _aggregate(frame: KlineFrame, starts: np.ndarray, dates: np.ndarray, times: np.ndarray) -> KlineFrame:
+    """按分组起点合成K线（starts 为每组第一根的下标）"""
+    ends = np.append(starts[1:], len(frame)) - 1
+    volume = np.nan_to_num(frame.volume)
+    amount = np.nan_to_num(frame.amount)
+    turnover = np.nan_to_num(frame.turnover)
+
+    close = frame.close[ends]
+    high = np.fmax.reduceat(frame.high, starts)
+    low = np.fmin.reduceat(frame.low, starts)
+    # 第一组的前收盘由首根K线的 收盘 - 涨跌额 还原
+    prev_close = np.concatenate(([frame.close[0] - frame.change[0]], close[:-1]))
+    change = close - prev_close
+    with np.errstate(divide="ignore", invalid="ignore"):
+        change_pct = np.where(prev_close > 0, change / prev_close * 100, 0.0)
+        amplitude = np.where(prev_close > 0, (high - low) / prev_close * 100, 0.0)
+
+    return KlineFrame(
+        dates,
+        times,
+        open=frame.open[starts],
+        close=close,
+        high=high,
+        low=low,
+        volume=np.add.reduceat(volume, starts),
+        amount=np.add.reduceat(amount, starts),
+        amplitude=amplitude,
+        change_pct=change_pct,
+        change=change,
+        turnover=np.add.reduceat(turnover, starts),
+    )
+
+
+def _group_starts(keys: np.ndarray) -> np.ndarray:
+    return np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+
+
+def resample_minutes(frame: KlineFrame, minutes: int,
+                     sessions: Sequence[Tuple[int, int]] = A_SHARE_SESSIONS) -> KlineFrame:
+    """1 分钟线合成 N 分钟线
+
+    每个交易时段内按 N 分钟分组，时段末尾不足 N 分钟的部分单独成一根
+    （如港股上午 150 分钟的 60 分钟线为 10:30、11:30、12:00）。
+    集合竞价（时段开始时刻）的K线并入第一组。
+    """
+    if minutes == 1 or not len(frame):
+        return frame
+
+    clock = _minutes(frame.times.astype(np.int32))
+    # 晚于上一时段结束时刻的K线归入下一时段
+    session_no = np.full(len(frame), len(sessions) - 1, dtype=np.int64)
+    for i in range(len(sessions) - 2, -1, -1):
+        session_no[clock <= _minutes(sessions[i][1])] = i
+    session_start = np.array([_minutes(start) for start, _ in sessions], dtype=np.int32)[session_no]
+    length = np.array([_minutes(end) - _minutes(start) for start, end in sessions], dtype=np.int32)[session_no]
+    offset = np.clip(clock - session_start, 1, length)
+
+    bucket = (offset + minutes - 1) // minutes
+    label = session_start + np.minimum(bucket * minutes, length)
+    keys = frame.dates.astype(np.int64) * 100000 + session_no * 10000 + bucket
+    starts = _group_starts(keys)
+    times = (label[starts] // 60 * 100 + label[starts] % 60).astype(np.int16)
+    return _aggregate(frame, starts, frame.dates[starts], times)
+
+
+def resample_calendar(daily: KlineFrame, klt: int) -> KlineFrame:
+    """日线合成周线（102）或月线（103），日期为周期内最后一个交易日"""
+    if not len(daily):
+        return daily
+    years, months, days = daily.dates // 10000, daily.dates // 100 % 100, daily.dates % 100
+    if klt == WEEKLY_KLT:
+        month_start = ((years - 1970) * 12 + months - 1).astype("datetime64[M]").astype("datetime64[D]")
+        day_number = (month_start + (days - 1)).astype(np.int64)
+        # 1970-01-01 为周四，+3 后按周一分周
+        keys = (day_number + 3) // 7
+    elif klt == MONTHLY_KLT:
+        keys = years * 100 + months
+    else:
+        raise ValueError(f"不支持的K线周期: {klt}")
+
+    starts = _group_starts(keys)
+    ends = np.append(starts[1:], len(daily)) - 1
+    return _aggregate(daily, starts, daily.dates[ends], np.zeros(len(starts), dtype=np.int16))
+
+
+def resample(frame: KlineFrame, klt: int, secid: Optional[str] = None) -> KlineFrame:
+    """将 source_klt(klt) 周期的K线合成 klt 周期"""
+    if klt in MINUTE_KLTS:
+        return resample_minutes(frame, klt, sessions_for(secid))
+    if klt in (WEEKLY_KLT, MONTHLY_KLT):
+        return resample_calendar(frame, klt)
+    return frame
@@ -0,0 +1,292 @@
+# -*- coding: utf-8 -*-
+"""
+滚动窗口统计（盘中增量更新）
+
+盘中监控时每次只处理最新快照，不再每轮重新获取历史、从头计算均值：
+1. RollingWindow 保存最近 size 个已收盘的值，push() 为 O(1)：
+   维护累计和/平方和（求均值、方差）以及单调队列（求最大/最小值）
+2. 当日K线尚未收盘，用 with_live(当日值) 把它与前 size-1 个已收盘值合并计算，同样为 O(1)，
+   结果与把当日K线放在窗口末尾重新计算一致（与 analyze_volume特征 的均量口径相同）
+3. VolumeStream 用本地K线存储中的日线初始化一次，之后每个快照只更新当日值，跨日时当日值转为已收盘
+4. IntradayVolumeMonitor 对多只标的批量拉取快照（每轮一次批量行情请求）并更新各自的 VolumeStream
+
+每个窗口占用 O(size) 内存。
+"""
+
+from collections import deque
+from datetime import date
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from data_fetcher import get_kline_frame, get_realtime_quotes
+from kline_frame import KlineFrame, date_to_int
+
+# 成交量均线周期
+VOLUME_WINDOWS = (5, 10, 20)
+# 换手率、成交量极值和标准差的统计周期
+STATS_WINDOW = 20
+
+
+class RollingWindow:
+    """固定长度的滚动窗口统计"""
+
+    __slots__ = ("size", "_values", "_count", "_shift", "_sum", "_sumsq", "_max", "_min")
+
+    def __init__(self, size: int, values: Iterable[float] = ()):
+        if size < 1:
+            raise ValueError(f"窗口长度必须为正数: {size}")
+        self.size = size
+        self._values = deque()
+        # 已 push 的总数，作为单调队列中元素的序号
+        self._count = 0
+        # 累计和按首个值平移，避免成交量等大数的平方和损失精度
+        self._shift = None
+        self._sum = 0.0
+        self._sumsq = 0.0
+        # 单调队列：(序号, 值)，队首为窗口内的最大/最小值
+        self._max = deque()
+        self._min = deque()
+        for value in values:
+            self.push(value)
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    @property
+    def full(self) -> bool:
+        return len(self._values) == self.size
+
+    @property
+    def last(self) -> Optional[float]:
+        return self._values[-1] if self._values else None
+
+    def push(self, value: float):
+        """追加一个已收盘的值，窗口已满时移出最早的值"""
+        value = float(value)
+        if self._shift is None:
+            self._shift = value
+        if len(self._values) == self.size:
+            self._evict()
+        self._values.append(value)
+        shifted = value - self._shift
+        self._sum += shifted
+        self._sumsq += shifted * shifted
+
+        index = self._count
+        self._count += 1
+        while self._max and self._max[-1][1] <= value:
+            self._max.pop()
+        self._max.append((index, value))
+        while self._min and self._min[-1][1] >= value:
+            self._min.pop()
+        self._min.append((index, value))
+
+        # 每滚动 64 个窗口重新求和一次，消除浮点累计误差（均摊 O(1)）
+        if self._count % (self.size * 64) == 0:
+            self._resync()
+
+    def _evict(self):
+        oldest = self._values.popleft()
+        shifted = oldest - self._shift
+        self._sum -= shifted
+        self._sumsq -= shifted * shifted
+        first = self._count - self.size
+        if self._max and self._max[0][0] <= first:
+            self._max.popleft()
+        if self._min and self._min[0][0] <= first:
+            self._min.popleft()
+
+    def _resync(self):
+        self._shift = self._values[-1]
+        shifted = [v - self._shift for v in self._values]
+        self._sum = sum(shifted)
+        self._sumsq = sum(v * v for v in shifted)
+
+    def _extreme(self, queue: deque, skip_oldest: bool) -> Optional[float]:
+        """窗口内的最大/最小值；skip_oldest 时不含最早的值"""
+        if not queue:
+            return None
+        if skip_oldest and queue[0][0] == self._count - len(self._values):
+            return queue[1][1] if len(queue) > 1 else None
+        return queue[0][1]
+
+    # ========== 统计量 ==========
+
+    def stats(self) -> Dict[str, Optional[float]]:
+        """已收盘值的统计（窗口未满时按已有的值计算）"""
+        n = len(self._values)
+        if not n:
+            return {"count": 0, "mean": None, "std": None, "max": None, "min": None}
+        return self._summary(n, self._sum, self._sumsq, self._extreme(self._max, False), self._extreme(self._min, False))
+
+    def with_live(self, live: float) -> Dict[str, Optional[float]]:
+        """把未收盘的当日值 live 作为窗口最后一个值的统计（不修改窗口）"""
+        live = float(live)
+        n, total, total_sq = len(self._values), self._sum, self._sumsq
+        skip_oldest = n == self.size
+        if skip_oldest:
+            oldest = self._values[0] - self._shift
+            n, total, total_sq = n - 1, total - oldest, total_sq - oldest * oldest
+        shift = self._shift if self._shift is not None else live
+        shifted = live - shift
+        high = self._extreme(self._max, skip_oldest)
+        low = self._extreme(self._min, skip_oldest)
+        return self._summary(
+            n + 1, total + shifted, total_sq + shifted * shifted,
+            live if high is None else max(high, live),
+            live if low is None else min(low, live),
+            shift,
+        )
+
+    def _summary(self, n, total, total_sq, high, low, shift=None) -> Dict[str, Optional[float]]:
+        shift = self._shift if shift is None else shift
+        mean = total / n
+        variance = max(total_sq / n - mean * mean, 0.0)
+        return {
+            "count": n,
+            "mean": mean + shift,
+            "std": variance ** 0.5,
+            "max": high,
+            "min": low,
+        }
+
+
+class VolumeStream:
+    """单只标的的成交量/换手率滚动统计"""
+
+    def __init__(self, secid: str, windows: Sequence[int] = VOLUME_WINDOWS, stats_window: int = STATS_WINDOW):
+        self.secid = secid
+        self.windows = tuple(windows)
+        self.stats_window = stats_window
+        self.volume = {period: RollingWindow(period) for period in self.windows}
+        self.volume_stats = RollingWindow(stats_window)
+        self.turnover = RollingWindow(stats_window)
+        # 最近一根已收盘K线的日期（yyyymmdd）和当日未收盘的值
+        self.last_closed = 0
+        self.live_date = 0
+        self.live_volume: Optional[float] = None
+        self.live_turnover: Optional[float] = None
+
+    @property
+    def history_days(self) -> int:
+        return max(self.windows + (self.stats_window,))
+
+    def seed(self, history: Optional[KlineFrame], today: Optional[int] = None):
+        """用日K线初始化（只调用一次）；最后一根为今日时作为未收盘的当日值"""
+        if not history:
+            return
+        today = today or date_to_int(date.today().isoformat())
+        closed = history[:-1] if history.dates[-1] >= today else history
+        for volume, turnover, day in zip(closed.volume.tolist(), closed.turnover.tolist(), closed.dates.tolist()):
+            self._close(volume, turnover, day)
+        if len(closed) < len(history):
+            self.live_date = int(history.dates[-1])
+            self.live_volume = float(history.volume[-1])
+            self.live_turnover = float(history.turnover[-1])
+
+    def _close(self, volume: float, turnover: float, day: int):
+        if np.isnan(volume):
+            return
+        for window in self.volume.values():
+            window.push(volume)
+        self.volume_stats.push(volume)
+        self.turnover.push(turnover)
+        self.last_closed = day
+
+    def update(self, volume: float, turnover: float, day: Optional[int] = None) -> Dict:
+        """处理一个快照（当日累计成交量、换手率），跨日时前一日的值转为已收盘"""
+        day = day or date_to_int(date.today().isoformat())
+        if self.live_date and day > self.live_date and self.live_volume is not None:
+            self._close(self.live_volume, self.live_turnover or 0.0, self.live_date)
+        if day > self.last_closed:
+            self.live_date = day
+            self.live_volume = float(volume)
+            self.live_turnover = float(turnover)
+        return self.features()
+
+    def features(self) -> Dict:
+        """当前成交量特征（含未收盘的当日值，字段与 analyze_volume特征 对应）"""
+        live = self.live_volume
+        if live is None:
+            current = self.volume_stats.last
+            averages = {p: w.stats() for p, w in self.volume.items()}
+            volume_stats, turnover_stats = self.volume_stats.stats(), self.turnover.stats()
+            current_turnover = self.turnover.last
+        else:
+            current = live
+            averages = {p: w.with_live(live) for p, w in self.volume.items()}
+            volume_stats = self.volume_stats.with_live(live)
+            turnover_stats = self.turnover.with_live(self.live_turnover or 0.0)
+            current_turnover = self.live_turnover
+
+        result = {"secid": self.secid, "date": self.live_date or self.last_closed, "current_volume": current}
+        for period, stats in averages.items():
+            # 与 calculate_ma 一致：天数不足时为 None
+            result[f"avg_volume_{period}"] = stats["mean"] if stats["count"] >= period else None
+        avg_5 = result.get("avg_volume_5")
+        result["is_volume_up"] = bool(avg_5 and current is not None and current > avg_5 * 1.5)
+        result["is_volume_down"] = bool(avg_5 and current is not None and current < avg_5 * 0.5)
+        result["volume_max"] = volume_stats["max"]
+        result["volume_min"] = volume_stats["min"]
+        result["volume_std"] = volume_stats["std"]
+        result["current_turnover"] = current_turnover
+        result["avg_turnover"] = turnover_stats["mean"]
+        return result
+
+
+class IntradayVolumeMonitor:
+    """多只标的的盘中成交量监控：初始化一次，之后每轮只拉取一次批量快照"""
+
+    def __init__(self, secids: Sequence[str], windows: Sequence[int] = VOLUME_WINDOWS,
+                 history_loader: Callable[[str, int], Optional[KlineFrame]] = get_kline_frame):
+        self.streams: Dict[str, VolumeStream] = {}
+        for secid in dict.fromkeys(secids):
+            stream = VolumeStream(secid, windows)
+            stream.seed(history_loader(secid, stream.history_days + 1))
+            self.streams[secid] = stream
+
+    def poll(self, quotes: Optional[Dict[str, Dict]] = None) -> Dict[str, Dict]:
+        """拉取（或使用传入的）最新快照并更新，返回 {secid: 成交量特征}"""
+        if quotes is None:
+            quotes = get_realtime_quotes(list(self.streams), fresh=True)
+        today = date_to_int(date.today().isoformat())
+        result = {}
+        for secid, quote in quotes.items():
+            stream = self.streams.get(secid)
+            if stream is not None:
+                result[secid] = stream.update(quote.get("成交量", 0), quote.get("换手率", 0), today)
+        return result
+
+    def alerts(self, features: Dict[str, Dict]) -> List[str]:
+        """放量/缩量的标的"""
+        return [secid for secid, f in features.items() if f["is_volume_up"] or f["is_volume_down"]]
+
+
+if __name__ == "__main__":
+    # 与整窗重新计算的结果对比，并测试单次更新耗时
+    import time
+
+    rng = np.random.default_rng(0)
+    values = rng.lognormal(12, 0.6, 5000)
+    window = RollingWindow(20)
+    for i, value in enumerate(values):
+        window.push(value)
+        live = values[i] * 1.1
+        stats = window.with_live(live)
+        expected = np.append(values[max(0, i - 18):i + 1], live)
+        assert np.isclose(stats["mean"], expected.mean())
+        assert np.isclose(stats["std"], expected.std())
+        assert stats["max"] == expected.max() and stats["min"] == expected.min()
+
+    stream = VolumeStream("1.600036")
+    stream.seed(KlineFrame(
+        np.arange(20240101, 20240131, dtype=np.int32),
+        volume=values[:30], turnover=rng.uniform(0.5, 3, 30),
+    ), today=20240201)
+    start = time.perf_counter()
+    for volume in values:
+        stream.update(volume, 1.0, 20240201)
+    elapsed = (time.perf_counter() - start) / len(values)
+    print(f"单个快照更新：{elapsed * 1e6:.1f} µs")
+    print(stream.features())
@@ -4,23 +4,21 @@
 沪深300 股票分析脚本 - 重构版
 - 数据来源：东方财富 API
 - 模块化拆分：data_fetcher, ai_analyzer, cyclical_analyzer, notifier, report_generator
+- 模块顶层只导入标准库：交易日判断之后才导入 numpy/requests 等依赖，
+  aiohttp 只在多标的并发获取时导入，pandas 只在有指数标的时导入，matplotlib 在绘图时导入
+  （导入耗时可用 python3 import_profile.py 查看）
+
+用法：python3 stock_analyzer.py [--targets 600036 HSTECH]
 """
 
+import argparse
 import sys
 from datetime import datetime
 
 # 强制 stdout 无缓冲输出，确保日志实时写入文件
 if hasattr(sys.stdout, 'reconfigure'):
     sys.stdout.reconfigure(line_buffering=True)
-from ai_analyzer import ai_analyze_target, ai_analyze_summary
-from data_fetcher import is_trading_day
-from report_generator import (
-    generate_target_report, 
-    generate_sector_report, 
-    generate_cyclical_industry_report, 
-    save_report
-)
-from notifier import send_email
+from trading_calendar import is_trading_day
 
 # 配置
 TARGETS = [
@@ -28,16 +26,41 @@ TARGETS = [
     {"code": "161725", "name": "招商中证白酒指数", "secid": "0.161725", "type": "fund"},
     {"code": "600036", "name": "招商银行", "secid": "1.600036", "type": "stock"},
     {"code": "601398", "name": "工商银行", "secid": "1.601398", "type": "stock"},
-    {"code": "HSTECH", "name": "恒生科技指数", "secid": "124.HSTECH", "type": "index", "is_hstech": True},
+    {"code": "HSTECH", "name": "恒生科技指数", "secid": "124.HSTECH", "type": "index"},
 ]
 
-def main():
+def main(targets=None):
+    """生成报告（targets 为要分析的标的，默认全部）"""
     # 检查是否为交易日
     if not is_trading_day():
         print(f"[{datetime.now()}] 今日为非交易日，跳过执行。")
         return
-        
+    
+    from ai_analyzer import ai_analyze_summary, ai_pool, collect_target_analyses, submit_target_analyses
+    from report_generator import (
+        generate_target_report, 
+        generate_sector_report, 
+        generate_cyclical_industry_report, 
+        save_report
+    )
+    from notifier import send_email
+    from http_client import reset_stats as reset_http_stats, print_stats as print_http_stats
+    from fetch_cache import run_cache
+    from browser_pool import browser_pool
+    from volume_profile import volume_profiles
+    from chart_renderer import chart_renderer
+    from llm_cache import llm_cache
+    from llm_backend import close_backend
+    from llm_telemetry import llm_telemetry
+    
+    targets = targets or TARGETS
     today_str = datetime.now().strftime("%Y-%m-%d")
+    reset_http_stats()
+    run_cache.reset()
+    llm_cache.reset_stats()
+    llm_telemetry.reset()
+    # 全部 AI 调用的截止时间（AI_RUN_DEADLINE）从这里起算
+    ai_pool.start_run()
     print(f"[{datetime.now()}] 开始生成多标的分析报告...")
     print("数据来源: 东方财富")
     
@@ -51,41 +74,77 @@ def main():
     # 1. 遍历标的生成报告（包含单标的 AI 分析）
     has_any_valid_data = False
     
-    for target in TARGETS:
+    # 盘中的放量/缩量判断需要日内成交量分布（过期时才重新计算）
+    try:
+        volume_profiles.refresh([t["secid"] for t in targets])
+    except Exception as e:
+        print(f"更新日内成交量分布失败: {e}")
+    
+    # 并发获取所有标的的数据（实时行情批量请求，各标的K线/资金流向/筹码同时进行），
+    # 单个标的时直接逐项获取，不导入 aiohttp
+    prefetched = {}
+    if len(targets) > 1:
+        print("正在并发获取各标的数据...")
+        try:
+            from async_fetcher import fetch_targets
+            prefetched = fetch_targets(targets)
+        except Exception as e:
+            print(f"并发获取数据失败，改为逐个获取: {e}")
+    
+    # 指数的支撑位/压力位分析：数据已在上一步预取，各指数的 LLM 分析并发进行
+    index_targets = [t for t in targets if t.get("type") == "index"]
+    if index_targets:
+        print(f"正在并发分析 {len(index_targets)} 个指数...")
+        try:
+            from index_analyzer import analyze_indices
+            for secid, report in analyze_indices(index_targets).items():
+                prefetched.setdefault(secid, {})["index_report"] = report
+        except Exception as e:
+            print(f"指数并发分析失败，改为逐个分析: {e}")
+    
+    target_parts = []
+    for target in targets:
         name = target['name']
-        print(f"正在获取 {name} ({target['code']}) 数据并进行 AI 分析...")
-        target_report, status = generate_target_report(target)
+        print(f"正在生成 {name} ({target['code']}) 报告...")
+        target_report, status = generate_target_report(target, prefetched=prefetched.get(target["secid"]))
         
-        # 单标的 AI 分析
-        if status["history"] or status["money_flow"] or status.get("chip_distribution"):
-            has_any_valid_data = True
-            target_ai = ai_analyze_target(name, target_report)
+        has_data = bool(status["history"] or status["money_flow"] or status.get("chip_distribution"))
+        has_any_valid_data = has_any_valid_data or has_data
+        target_parts.append((name, target_report, status, has_data))
+    
+    # 单标的 AI 分析按 AI_BATCH_SIZE 分批提交到 AI 执行池（提示词只包含结构化数据的要点），
+    # 不等待结果，继续生成板块和周期性行业报告
+    pending_ai = submit_target_analyses([(name, status) for name, _, status, has_data in target_parts if has_data])
+    
+    # 2. 热门板块分析
+    print("正在获取热门板块数据...")
+    sector_report = generate_sector_report()
+    
+    # 3. 周期性行业分析（各行业的 AI 分析与上面的单标的 AI 分析同时进行）
+    print("正在分析周期性行业...")
+    cyclical_report = generate_cyclical_industry_report()
+    
+    # 按标的顺序取回 AI 分析结果，截止时间到达时仍未完成的使用规则模板
+    target_ai_results = collect_target_analyses(pending_ai)
+    for name, target_report, status, has_data in target_parts:
+        if has_data:
+            target_ai = target_ai_results[name]
         else:
             target_ai = "*因数据获取失败，无法进行 AI 分析*"
-            
-        # print(f"--- AI 分析结果 ({name}) ---\n{target_ai}\n")
-            
+        
         full_report_parts.append(target_report)
         full_report_parts.append(f"### AI 智能研判 ({name})")
         full_report_parts.append(target_ai)
         full_report_parts.append("")
         full_report_parts.append("---")
     
-    # 2. 添加热门板块分析
-    print("正在获取热门板块数据...")
-    sector_report = generate_sector_report()
     full_report_parts.append(sector_report)
-    
-    # 3. 添加周期性行业分析
-    print("正在分析周期性行业...")
-    cyclical_report = generate_cyclical_industry_report()
     full_report_parts.append(cyclical_report)
     
     # 4. 综合总结 AI 分析
     if has_any_valid_data:
         print("正在进行市场综合总结...")
-        full_data_content = "\n".join(full_report_parts)
-        summary_ai = ai_analyze_summary(full_data_content)
+        summary_ai = ai_analyze_summary([status for _, _, status, _ in target_parts], [sector_report, cyclical_report])
         print(f"--- 市场综合总结 ---\n{summary_ai}\n")
     else:
         summary_ai = "*因数据获取失败，无法进行综合总结*"
@@ -103,12 +162,32 @@ def main():
     # 6. 保存报告
     filepath = save_report(full_report)
     print(f"报告已保存: {filepath}")
+    # AI 调用的耗时、超时和拒绝统计写入报告旁的 JSON 文件
+    telemetry_path = llm_telemetry.write_sidecar(filepath)
+    if telemetry_path:
+        print(f"AI 调用统计已保存: {telemetry_path}")
     
     # 7. 发送邮件
     subject = f"股票/基金智能分析报告 - {today_str}"
     send_email(subject, full_report)
     
+    # 8. 关闭浏览器（如有）、AI 执行池和 AI 后端的连接，输出本次运行的连接复用、缓存命中（行情、AI 回答）和图表缓存统计
+    browser_pool.close()
+    ai_pool.shutdown()
+    close_backend()
+    print_http_stats()
+    run_cache.print_stats()
+    llm_cache.print_stats()
+    llm_telemetry.print_stats()
+    chart_renderer.print_stats()
+    
     return filepath
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="股票/基金智能分析报告")
+    parser.add_argument("--targets", nargs="*", help="只分析指定代码的标的（默认全部）")
+    args = parser.parse_args()
+    selected = [t for t in TARGETS if t["code"] in args.targets] if args.targets else None
+    if args.targets and not selected:
+        parser.error(f"未找到标的: {' '.join(args.targets)}")
+    main(selected)
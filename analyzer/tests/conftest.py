@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""
+测试公共设置
+
+analyzer 内的模块使用扁平导入，这里把 analyzer 目录加入 sys.path；
+DATA_DIR 指向临时目录，避免导入时的默认路径写入 ~/stock-reports；
+fake_backend 用固定回答替换 AI 后端，记录收到的提示词。
+"""
+
+import os
+import sys
+import tempfile
+
+import pytest
+
+ANALYZER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ANALYZER_DIR not in sys.path:
+    sys.path.insert(0, ANALYZER_DIR)
+
+os.environ.setdefault("DATA_DIR", tempfile.mkdtemp(prefix="analyzer-tests-"))
+
+
+import ai_analyzer  # noqa: E402
+import llm_backend  # noqa: E402
+from llm_backend import Completion  # noqa: E402
+
+
+class FakeBackend(llm_backend.LLMBackend):
+    """answer 为固定回答，或根据提示词生成回答的函数"""
+    identity = "test:backend"
+
+    def __init__(self, answer):
+        self.answer = answer
+        self.prompts = []
+
+    def complete(self, prompt, timeout):
+        self.prompts.append(prompt)
+        text = self.answer(prompt) if callable(self.answer) else self.answer
+        return Completion("ok", text, 0)
+
+
+@pytest.fixture
+def fake_backend(monkeypatch):
+    def install(answer):
+        backend = FakeBackend(answer)
+        monkeypatch.setattr(ai_analyzer, "get_backend", lambda: backend)
+        return backend
+    return install
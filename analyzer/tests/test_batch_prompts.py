@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""批量 AI 分析：按分隔行拆分回答（parse_batch_response）、按标的数 / token 预算分批（pack_batches），
+以及回答不符合格式的后端不再批量"""
+
+import pytest
+
+import ai_analyzer
+from ai_analyzer import parse_batch_response
+from llm_cache import LLMCache
+from llm_stub_server import stub_answer
+from prompt_digest import estimate_tokens, pack_batches
+
+
+def test_well_formed_answer():
+    response = """<<<标的1：沪深300>>>
+沪深300 缩量震荡。
+
+<<<标的2：招商银行>>>
+招商银行主力净流入。
+<<<结束>>>"""
+    assert parse_batch_response(response, 2) == {1: "沪深300 缩量震荡。", 2: "招商银行主力净流入。"}
+
+
+def test_missing_section_is_left_out():
+    response = "<<<标的1：沪深300>>>\n分析一\n<<<标的3：腾讯控股>>>\n分析三\n<<<结束>>>"
+    assert parse_batch_response(response, 3) == {1: "分析一", 3: "分析三"}
+
+
+def test_empty_and_out_of_range_sections_ignored():
+    response = "<<<标的1：沪深300>>>\n\n<<<标的2：招商银行>>>\n分析二\n<<<标的5：多余>>>\n分析五"
+    assert parse_batch_response(response, 2) == {2: "分析二"}
+
+
+def test_duplicate_header_keeps_first():
+    response = "<<<标的1：沪深300>>>\n第一次\n<<<标的1：沪深300>>>\n重复\n<<<标的2：招商银行>>>\n分析二"
+    assert parse_batch_response(response, 2) == {1: "第一次", 2: "分析二"}
+
+
+def test_bold_wrapped_headers_accepted():
+    response = "**<<<标的1：沪深300>>>**\n分析一\n** <<<标的2: 招商银行>>> **\n分析二\n**<<<结束>>>**\n补充说明"
+    assert parse_batch_response(response, 2) == {1: "分析一", 2: "分析二"}
+
+
+def test_text_after_end_marker_dropped():
+    response = "<<<标的1：沪深300>>>\n分析一\n<<<标的2：招商银行>>>\n分析二\n<<<结束>>>\n以上仅供参考。\n<<<标的2：招商银行>>>\n覆盖"
+    assert parse_batch_response(response, 2) == {1: "分析一", 2: "分析二"}
+
+
+def test_header_must_be_on_its_own_line():
+    response = "如下 <<<标的1：沪深300>>> 分析一"
+    assert parse_batch_response(response, 1) == {}
+
+
+def test_answer_ignoring_format():
+    assert parse_batch_response("整体来看市场偏弱，建议观望。", 3) == {}
+
+
+def test_pack_batches_splits_on_max_items():
+    items = list(range(7))
+    digests = ["要点"] * len(items)
+    assert pack_batches(items, digests, max_items=3) == [[0, 1, 2], [3, 4, 5], [6]]
+    assert pack_batches(items, digests, max_items=1) == [[i] for i in items]
+    assert pack_batches(items, digests, max_items=0) == [[i] for i in items]
+
+
+def test_pack_batches_splits_on_budget():
+    digests = ["数" * 40, "数" * 40, "数" * 30, "数" * 100, "数" * 10]
+    assert [estimate_tokens(d) for d in digests] == [40, 40, 30, 100, 10]
+    items = list(range(len(digests)))
+    # 40 + 40 <= 100，再加 30 超出；100 单独满预算；最后 10 另起一批
+    assert pack_batches(items, digests, max_items=8, budget=100) == [[0, 1], [2], [3], [4]]
+
+
+def test_pack_batches_oversized_digest_gets_own_batch():
+    digests = ["数" * 10, "数" * 500, "数" * 10]
+    assert pack_batches([0, 1, 2], digests, max_items=8, budget=100) == [[0], [1], [2]]
+
+
+def test_pack_batches_keeps_order_and_handles_empty():
+    assert pack_batches([], [], max_items=8) == []
+    items = ["a", "b", "c", "d"]
+    batches = pack_batches(items, ["数" * 60] * 4, max_items=8, budget=130)
+    assert batches == [["a", "b"], ["c", "d"]]
+    assert [item for batch in batches for item in batch] == items
+
+
+@pytest.fixture
+def run_targets(tmp_path, monkeypatch):
+    cache = LLMCache(tmp_path / "llm_cache.sqlite", ttl={"target": "day"})
+    monkeypatch.setattr(ai_analyzer, "llm_cache", cache)
+    monkeypatch.setitem(ai_analyzer.config.config, "AI_BATCH_SIZE", 8)
+
+    def run(names):
+        items = [(name, {"code": name, "name": name}) for name in names]
+        pending = ai_analyzer.submit_target_analyses(items)
+        return ai_analyzer.collect_target_analyses(pending)
+    return run
+
+
+def test_stub_answer_is_parsed_in_one_call(run_targets, fake_backend):
+    backend = fake_backend(stub_answer)
+    results = run_targets(["甲", "乙", "丙"])
+
+    assert len(backend.prompts) == 1
+    assert results == {name: f"*本地替身服务对{name}的固定回答*" for name in ("甲", "乙", "丙")}
+    # 各标的按单标的提示词缓存，逐个分析时直接命中
+    ai_analyzer.ai_analyze_target("乙", {"code": "乙", "name": "乙"})
+    assert len(backend.prompts) == 1
+
+
+def test_backend_ignoring_format_stops_batching(run_targets, fake_backend):
+    backend = fake_backend("整体偏弱，建议观望。")
+
+    first = run_targets(["甲", "乙", "丙"])
+    assert len(backend.prompts) == 4  # 一次批量 + 三次逐个
+    assert set(first) == {"甲", "乙", "丙"}
+
+    backend.prompts.clear()
+    run_targets(["丁", "戊", "己"])
+    assert len(backend.prompts) == 3
+    assert all("<<<标的" not in prompt for prompt in backend.prompts)
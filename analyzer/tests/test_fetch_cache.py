@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""fetch_cache：线程和 asyncio 调用方共用在途请求"""
+
+import asyncio
+import threading
+import time
+
+from fetch_cache import RunCache
+
+
+def test_async_caller_joins_sync_fetch():
+    cache = RunCache()
+    started, calls = threading.Event(), []
+
+    def fetch(days):
+        calls.append(days)
+        started.set()
+        time.sleep(0.1)
+        return list(range(days))
+
+    thread = threading.Thread(target=cache.get_window, args=("kline", "1.600036", 20, fetch))
+    thread.start()
+    started.wait()
+
+    async def fetch_async(days):
+        calls.append(days)
+        return list(range(days))
+
+    value = asyncio.run(cache.aget_window("kline", "1.600036", 5, fetch_async))
+    thread.join()
+
+    assert calls == [20]
+    assert value == list(range(15, 20))
+    assert cache.stats()["kline"] == {"hits": 0, "misses": 1, "joined": 1}
+
+
+def test_sync_caller_joins_async_fetch():
+    cache = RunCache()
+    calls, result = [], {}
+
+    async def fetch_many(keys):
+        calls.append(list(keys))
+        await asyncio.sleep(0.1)
+        return {key: {"secid": key} for key in keys}
+
+    async def main():
+        task = asyncio.create_task(cache.aget_many("quote", ["1.600036", "0.000001"], fetch_many))
+        await asyncio.sleep(0.02)
+        # 同步调用方在另一个线程中等待同一批在途请求
+        thread = threading.Thread(
+            target=lambda: result.update(cache.get_many("quote", ["0.000001"], fetch_many))
+        )
+        thread.start()
+        value = await task
+        await asyncio.to_thread(thread.join)
+        return value
+
+    value = asyncio.run(main())
+
+    assert calls == [["1.600036", "0.000001"]]
+    assert result == {"0.000001": {"secid": "0.000001"}}
+    assert set(value) == {"1.600036", "0.000001"}
+    assert cache.stats()["quote"]["joined"] == 1
+
+
+def test_cancelled_async_waiter_does_not_cancel_shared_fetch():
+    cache = RunCache()
+
+    async def slow(days):
+        await asyncio.sleep(0.1)
+        return list(range(days))
+
+    async def main():
+        owner = asyncio.create_task(cache.aget_window("kline", "1.600036", 10, slow))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.create_task(cache.aget_window("kline", "1.600036", 10, slow))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        return await owner
+
+    assert asyncio.run(main()) == list(range(10))
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""parse_kline_columns 与逐行解析 _parse_kline_rows 的结果一致性（"-" 替换、按列填充、ValueError 回退）"""
+
+import math
+
+import numpy as np
+import pytest
+
+import kline_frame
+from kline_frame import _parse_kline_rows, parse_kline_columns
+
+N_FIELDS = 10
+NAN_AND_ZERO = [math.nan] * 5 + [0.0] * 5
+
+LINES = [
+    "2024-01-02,10.00,10.50,10.80,9.90,1000,10500.0,9.09,5.00,0.50,0.30",
+    # 末尾为 "-"
+    "2024-01-03,10.50,10.60,10.90,10.40,1200,12600.0,4.76,0.95,0.10,-",
+    # 相邻的两个、三个 "-"
+    "2024-01-04,10.60,10.70,11.00,10.50,1300,13800.0,-,-,0.10,0.40",
+    "2024-01-05,10.70,10.80,11.10,10.60,1400,15000.0,-,-,-,0.50",
+    # 相邻的 "-" 一直到行尾
+    "2024-01-08,10.80,10.90,11.20,10.70,1500,16300.0,4.63,0.93,-,-",
+    # 首个数值字段为 "-"
+    "2024-01-09,-,10.90,11.20,10.70,1500,16300.0,4.63,0.93,0.10,0.20",
+]
+
+
+def assert_same(columns, rows):
+    assert list(columns[0]) == list(rows[0])
+    np.testing.assert_array_equal(columns[1], rows[1])
+
+
+@pytest.mark.parametrize("missing", [0.0, math.nan, NAN_AND_ZERO], ids=["zero", "nan", "per-column"])
+def test_matches_row_parser(missing):
+    fill = missing if isinstance(missing, list) else [missing] * N_FIELDS
+    assert_same(parse_kline_columns(LINES, N_FIELDS, missing), _parse_kline_rows(LINES, N_FIELDS, fill))
+
+
+def test_dash_replaced_with_missing_value():
+    dates, values = parse_kline_columns(LINES, N_FIELDS, NAN_AND_ZERO)
+
+    assert list(dates[:2]) == ["2024-01-02", "2024-01-03"]
+    assert values.shape == (N_FIELDS, len(LINES))
+    assert values[9, 1] == 0.0  # 行尾
+    assert list(values[6:8, 2]) == [0.0, 0.0]  # 相邻两个
+    assert list(values[6:9, 3]) == [0.0, 0.0, 0.0]  # 相邻三个
+    assert list(values[8:10, 4]) == [0.0, 0.0]  # 相邻到行尾
+    assert math.isnan(values[0, 5])  # 该列的缺失值为 NaN
+    assert values[0, 4] == 10.80
+
+
+def test_fewer_fields_than_requested():
+    dates, values = parse_kline_columns(LINES, 3)
+    assert values.shape == (3, len(LINES))
+    assert list(values[:, 0]) == [10.00, 10.50, 10.80]
+
+
+def test_empty_input():
+    dates, values = parse_kline_columns([], N_FIELDS)
+    assert dates.shape == (0,)
+    assert values.shape == (N_FIELDS, 0)
+
+
+@pytest.mark.parametrize("line, field, expected", [
+    # 字段数不足：缺失的字段按 "-" 处理
+    ("2024-01-10,10.90,11.00,11.30", 9, 0.0),
+    # 空字段
+    ("2024-01-10,10.90,,11.30,10.80,1600,17600.0,4.59,0.92,0.10,0.20", 1, math.nan),
+], ids=["short-line", "empty-field"])
+def test_value_error_falls_back_to_row_parser(line, field, expected, monkeypatch):
+    lines = LINES + [line]
+    calls = []
+    original = kline_frame._parse_kline_rows
+
+    def spy(*args):
+        calls.append(args)
+        return original(*args)
+
+    monkeypatch.setattr(kline_frame, "_parse_kline_rows", spy)
+    dates, values = parse_kline_columns(lines, N_FIELDS, NAN_AND_ZERO)
+
+    assert len(calls) == 1
+    assert_same((dates, values), original(lines, N_FIELDS, NAN_AND_ZERO))
+    assert dates[-1] == "2024-01-10"
+    np.testing.assert_array_equal(values[field, -1], expected)
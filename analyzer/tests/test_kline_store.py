@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+"""kline_store：首次获取、尾部增量、向前补齐、复权变化重建和 60 秒内不重复请求"""
+
+from datetime import date, timedelta
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+import kline_store
+from kline_store import KlineStore
+
+SECID = "1.600036"
+
+
+def make_line(day: date, open_: float, close: float) -> str:
+    return f"{day.isoformat()},{open_:.2f},{close:.2f},{close + 1:.2f},{open_ - 1:.2f},1000,10000,1.0,0.5,0.1,0.3"
+
+
+def make_series(n: int, start: date = date(2024, 1, 1), offset: float = 0.0):
+    return [make_line(start + timedelta(days=i), 10 + i + offset, 10.5 + i + offset) for i in range(n)]
+
+
+class FakeKlineServer:
+    """按 beg / end / lmt 参数从完整序列中返回 K 线，并记录每次请求的参数"""
+
+    def __init__(self, lines):
+        self.lines = list(lines)
+        self.requests = []
+
+    def __call__(self, url, endpoint=None):
+        params = {k: v[0] for k, v in parse_qs(urlsplit(url).query).items()}
+        self.requests.append(params)
+        lines = self.lines
+        if "beg" in params:
+            lines = [l for l in lines if kline_store._compact_date(l) >= params["beg"]]
+        if "end" in params:
+            lines = [l for l in lines if kline_store._compact_date(l) <= params["end"]]
+        if "lmt" in params:
+            lines = lines[-int(params["lmt"]):]
+        payload = {"data": {"klines": lines}}
+        return type("Response", (), {"json": lambda self: payload})()
+
+
+@pytest.fixture
+def store(tmp_path):
+    return KlineStore(tmp_path / "kline.db")
+
+
+@pytest.fixture
+def server(monkeypatch):
+    fake = FakeKlineServer(make_series(30))
+    monkeypatch.setattr(kline_store, "http_get", fake)
+    return fake
+
+
+def expire_tail(store):
+    """让下一次 update 重新请求尾部（模拟已超过 TAIL_REFRESH_SECONDS）"""
+    conn = store._conn()
+    with conn:
+        conn.execute("UPDATE kline_meta SET updated_at = 0")
+
+
+def test_empty_store_fetches_latest_days(store, server):
+    lines = store.get_klines(SECID, 10)
+
+    assert server.requests == [{"secid": SECID, "fields1": "f1,f2,f3,f4,f5,f6",
+                                "fields2": "f51,f52,f53,f54,f55,f56,f57,f58,f59,f60,f61",
+                                "klt": "101", "fqt": "1", "end": "20500101", "lmt": "10"}]
+    assert lines == server.lines[-10:]
+    meta = store.meta(SECID)
+    assert meta["first_date"] == server.lines[-10].split(",")[0]
+    assert meta["last_date"] == server.lines[-1].split(",")[0]
+    assert not meta["head_reached"]
+
+
+def test_empty_store_marks_head_reached_when_history_is_short(store, server):
+    server.lines = server.lines[:4]
+    assert store.get_klines(SECID, 10) == server.lines
+    assert store.meta(SECID)["head_reached"]
+
+
+def test_tail_refresh_skipped_within_refresh_window(store, server):
+    store.get_klines(SECID, 10)
+    server.requests.clear()
+    store.get_klines(SECID, 10)
+    assert server.requests == []
+
+
+def test_tail_append_overwrites_overlapping_last_bar(store, server):
+    store.get_klines(SECID, 10)
+    last_day = date.fromisoformat(server.lines[-1].split(",")[0])
+    # 最后一根盘中K线收盘后收盘价变化（开盘价不变），并新增两根
+    server.lines[-1] = make_line(last_day, 10 + 29, 99.0)
+    server.lines += [make_line(last_day + timedelta(days=i), 50 + i, 51 + i) for i in (1, 2)]
+    expire_tail(store)
+    server.requests.clear()
+
+    lines = store.get_klines(SECID, 12)
+
+    assert server.requests[0]["beg"] == last_day.strftime("%Y%m%d")
+    assert "lmt" not in server.requests[0]
+    assert store.count(SECID) == 12
+    assert lines[-3:] == server.lines[-3:]
+    assert lines[-3].split(",")[2] == "99.00"
+
+
+def test_backfill_requests_history_before_first_date(store, server):
+    store.get_klines(SECID, 5)
+    first_date = store.meta(SECID)["first_date"]
+    server.requests.clear()
+
+    lines = store.get_klines(SECID, 8)
+
+    # 尾部仍在刷新间隔内，只向前补齐：end 为已存储的最早日期（含当日），多请求一根重叠
+    assert len(server.requests) == 1
+    assert server.requests[0]["end"] == first_date.replace("-", "")
+    assert server.requests[0]["lmt"] == "4"
+    assert lines == server.lines[-8:]
+    assert store.meta(SECID)["first_date"] == server.lines[-8].split(",")[0]
+
+
+def test_backfill_stops_once_head_reached(store, server):
+    server.lines = server.lines[-12:]
+    store.get_klines(SECID, 10)
+    assert store.get_klines(SECID, 20) == server.lines
+    assert store.meta(SECID)["head_reached"]
+    server.requests.clear()
+    store.get_klines(SECID, 20)
+    assert server.requests == []
+
+
+def test_empty_backfill_reply_does_not_mark_head_reached(store, server):
+    store.get_klines(SECID, 5)
+    full = server.lines
+    server.lines = []  # 补齐请求返回 {"data": {"klines": []}}
+
+    assert store.get_klines(SECID, 8) == full[-5:]
+    meta = store.meta(SECID)
+    assert not meta["head_reached"]
+    assert meta["first_date"] == full[-5].split(",")[0]
+
+    # 接口恢复后继续补齐
+    server.lines = full
+    server.requests.clear()
+    assert store.get_klines(SECID, 8) == full[-8:]
+    assert server.requests[0]["lmt"] == "4"
+
+
+def test_adjustment_change_rebuilds_key(store, server):
+    store.get_klines(SECID, 10)
+    # 除权除息后前复权价格整体变化：重叠的最后一根开盘价不同
+    server.lines = make_series(30, offset=-3.0)
+    expire_tail(store)
+    server.requests.clear()
+
+    lines = store.get_klines(SECID, 10)
+
+    assert [set(r) & {"beg", "lmt"} for r in server.requests] == [{"beg"}, {"lmt"}]
+    assert server.requests[1]["lmt"] == "10"
+    assert lines == server.lines[-10:]
+    assert store.count(SECID) == 10
+
+
+def test_network_failure_returns_local_data(store, server, monkeypatch):
+    store.get_klines(SECID, 10)
+    expire_tail(store)
+
+    def fail(url, endpoint=None):
+        raise ConnectionError("offline")
+
+    monkeypatch.setattr(kline_store, "http_get", fail)
+    assert store.get_klines(SECID, 10) == server.lines[-10:]
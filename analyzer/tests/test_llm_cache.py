@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""llm_cache：按交易时段 / 当天 / 秒数的有效期、拒绝回答的负缓存上限，以及 call_ai 的 accept 过滤"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+import ai_analyzer
+from config_manager import DEFAULT_LLM_CACHE_TTL, _check_ttl, _parse_ttl
+from llm_cache import NEGATIVE_TTL, LLMCache, expires_at
+
+BACKEND = "test:backend"
+# 周五，验证 15:00 之后滚动到次日 09:30
+FRIDAY = datetime(2026, 10, 16)
+
+
+def at(hour, minute=0, day=FRIDAY):
+    return day.replace(hour=hour, minute=minute)
+
+
+@pytest.mark.parametrize("now, expected", [
+    (at(9, 0), at(11, 30)),
+    (at(11, 29), at(11, 30)),
+    (at(11, 30), at(15, 0)),
+    (at(13, 45), at(15, 0)),
+    (at(15, 0), at(9, 30, FRIDAY + timedelta(days=1))),
+    (at(22, 10), at(9, 30, FRIDAY + timedelta(days=1))),
+], ids=["before-11:30", "just-before-11:30", "at-11:30", "afternoon", "at-15:00", "evening"])
+def test_session_expiry(now, expected):
+    assert expires_at("session", now) == expected.timestamp()
+
+
+def test_day_expiry_is_next_midnight():
+    assert expires_at("day", at(10, 0)) == datetime(2026, 10, 17).timestamp()
+    assert expires_at("day", at(23, 59)) == datetime(2026, 10, 17).timestamp()
+
+
+def test_seconds_and_zero():
+    assert expires_at(300, at(10, 0)) == at(10, 5).timestamp()
+    assert expires_at(0, at(10, 0)) is None
+    assert expires_at(None, at(10, 0)) is None
+
+
+def test_parse_ttl_from_environment():
+    ttl = _parse_ttl("cyclical=session, target=0,summary=300 ,index=day")
+    assert ttl == {"target": 0, "summary": 300, "index": "day", "cyclical": "session"}
+    assert _parse_ttl("") == DEFAULT_LLM_CACHE_TTL
+
+
+def test_invalid_ttl_falls_back_to_default(capsys):
+    ttl = _parse_ttl("summary=1h,target=-5,extra=weekly")
+    assert ttl["summary"] == DEFAULT_LLM_CACHE_TTL["summary"]
+    assert ttl["target"] == DEFAULT_LLM_CACHE_TTL["target"]
+    assert ttl["extra"] == 0
+    assert "summary" in capsys.readouterr().out
+    # config.py 中的字典同样校验
+    assert _check_ttl({"summary": "1h", "index": 600, "cyclical": True}) == {
+        "summary": "session", "index": 600, "cyclical": "day"}
+
+
+def test_put_with_checked_ttl_does_not_raise(tmp_path):
+    cache = LLMCache(tmp_path / "llm_cache.sqlite", ttl=_parse_ttl("summary=1h"))
+    cache.put("提示词", "summary", BACKEND, "回答", now=at(10, 0))
+    assert cache.get("提示词", "summary", BACKEND, now=at(11, 0)) == (True, "回答")
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return LLMCache(tmp_path / "llm_cache.sqlite", ttl={"target": "session", "summary": "day", "index": 0})
+
+
+def test_session_entry_expires_at_session_end(cache):
+    cache.put("提示词", "target", BACKEND, "回答", now=at(10, 0))
+
+    assert cache.get("提示词", "target", BACKEND, now=at(11, 29)) == (True, "回答")
+    assert cache.get("提示词", "target", BACKEND, now=at(11, 31)) == (False, None)
+
+
+def test_afternoon_entry_survives_until_next_open(cache):
+    cache.put("提示词", "target", BACKEND, "回答", now=at(16, 0))
+
+    next_day = FRIDAY + timedelta(days=1)
+    assert cache.get("提示词", "target", BACKEND, now=at(9, 29, next_day)) == (True, "回答")
+    assert cache.get("提示词", "target", BACKEND, now=at(9, 31, next_day)) == (False, None)
+
+
+def test_day_entry_expires_at_midnight(cache):
+    cache.put("提示词", "summary", BACKEND, "回答", now=at(10, 0))
+
+    assert cache.get("提示词", "summary", BACKEND, now=at(23, 59)) == (True, "回答")
+    assert cache.get("提示词", "summary", BACKEND, now=datetime(2026, 10, 17, 0, 1)) == (False, None)
+
+
+def test_zero_ttl_kind_is_not_cached(cache):
+    assert not cache.enabled("index")
+    cache.put("提示词", "index", BACKEND, "回答", now=at(10, 0))
+    assert cache.get("提示词", "index", BACKEND, now=at(10, 0)) == (False, None)
+
+
+def test_refusal_capped_at_negative_ttl(cache):
+    # "day" 的有效期到午夜，拒绝回答只保留 NEGATIVE_TTL
+    cache.put("提示词", "summary", BACKEND, None, now=at(10, 0))
+    cap = at(10, 0) + timedelta(seconds=NEGATIVE_TTL)
+
+    assert cache.get("提示词", "summary", BACKEND, now=cap - timedelta(minutes=1)) == (True, None)
+    assert cache.get("提示词", "summary", BACKEND, now=cap + timedelta(minutes=1)) == (False, None)
+    assert cache.stats()["summary"] == {"hits": 0, "refusals": 1, "misses": 1}
+
+
+def test_refusal_keeps_shorter_session_expiry(cache):
+    cache.put("提示词", "target", BACKEND, None, now=at(11, 0))
+    assert cache.get("提示词", "target", BACKEND, now=at(11, 31)) == (False, None)
+
+
+def test_key_depends_on_kind_and_backend_not_whitespace(cache):
+    cache.put("数据：\n  上涨 1%", "summary", BACKEND, "回答", now=at(10, 0))
+
+    assert cache.get("数据： 上涨 1%", "summary", BACKEND, now=at(10, 1)) == (True, "回答")
+    assert cache.get("数据： 上涨 1%", "summary", "other:backend", now=at(10, 1)) == (False, None)
+    assert cache.get("数据： 上涨 1%", "target", BACKEND, now=at(10, 1)) == (False, None)
+
+
+@pytest.fixture
+def ai(cache, fake_backend, monkeypatch):
+    monkeypatch.setattr(ai_analyzer, "llm_cache", cache)
+    return fake_backend
+
+
+def test_call_ai_does_not_cache_rejected_answer(ai, cache):
+    backend = ai("不符合格式的回答")
+
+    assert ai_analyzer.call_ai("提示词", kind="summary", accept=lambda r: False) == "不符合格式的回答"
+    assert cache.get("提示词", "summary", BACKEND) == (False, None)
+    ai_analyzer.call_ai("提示词", kind="summary", accept=lambda r: False)
+    assert len(backend.prompts) == 2
+
+
+def test_call_ai_caches_accepted_answer(ai, cache):
+    backend = ai("回答")
+
+    assert ai_analyzer.call_ai("提示词", kind="summary", accept=lambda r: True) == "回答"
+    assert ai_analyzer.call_ai("提示词", kind="summary", accept=lambda r: True) == "回答"
+    assert len(backend.prompts) == 1
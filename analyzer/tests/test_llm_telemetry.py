@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+"""llm_telemetry：同一天多次运行的统计文件互不覆盖"""
+
+import json
+from datetime import datetime
+
+from llm_telemetry import LLMTelemetry
+
+
+def run(report, started_at, calls):
+    telemetry = LLMTelemetry()
+    telemetry._started_at = started_at
+    for latency in calls:
+        telemetry.record("target", "test:backend", "提示词", "ok", "回答", latency)
+    return telemetry.write_sidecar(report)
+
+
+def test_sidecar_named_by_run_start(tmp_path):
+    report = tmp_path / "report_2026-10-16.md"
+
+    morning = run(report, datetime(2026, 10, 16, 10, 0, 5), [1.0, 2.0])
+    afternoon = run(report, datetime(2026, 10, 16, 14, 30, 0), [3.0])
+
+    assert morning.name == "report_2026-10-16.100005.llm.json"
+    assert afternoon.name == "report_2026-10-16.143000.llm.json"
+    assert json.loads(morning.read_text(encoding="utf-8"))["summary"]["backend_calls"] == 2
+    assert json.loads(afternoon.read_text(encoding="utf-8"))["summary"]["backend_calls"] == 1
+
+
+def test_no_sidecar_without_calls(tmp_path):
+    assert run(tmp_path / "report.md", datetime(2026, 10, 16, 10, 0), []) is None
+    assert list(tmp_path.iterdir()) == []
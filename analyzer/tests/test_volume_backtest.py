@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""volume_backtest：结果缓存在K线尾部更新或向前补齐后失效"""
+
+from datetime import date, timedelta
+
+import pytest
+
+import volume_backtest
+from kline_store import KlineStore
+
+SECID = "1.600036"
+
+
+def make_lines(n: int, end: date):
+    lines = []
+    for i in range(n):
+        day = end - timedelta(days=n - 1 - i)
+        close = 10 + (i % 13) * 0.1
+        volume = 1000 + (i % 7) * 300
+        lines.append(f"{day.isoformat()},{close - 0.05:.2f},{close:.2f},{close + 0.2:.2f},{close - 0.2:.2f},"
+                     f"{volume},{volume * close * 100:.0f},1.5,{(i % 5 - 2) * 0.3:.2f},0.03,{0.5 + (i % 7) * 0.1:.2f}")
+    return lines
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = KlineStore(tmp_path / "kline.db")
+    monkeypatch.setattr(volume_backtest, "kline_store", store)
+    monkeypatch.setattr(volume_backtest, "CACHE_DIR", tmp_path / "backtest")
+    return store
+
+
+def run():
+    return volume_backtest.run_backtest([SECID], years=2, days=20, workers=1)
+
+
+def test_backfill_invalidates_cached_result(store):
+    lines = make_lines(800, date.today() - timedelta(days=1))
+    store.merge(SECID, 101, 1, lines[-60:])
+    first = run()
+    assert first["bars"] == 60
+    assert run() == first  # 命中缓存
+
+    # 向前补齐更早的K线：最新日期不变
+    store.merge(SECID, 101, 1, lines[:-60], head_reached=True)
+    second = run()
+    # 回测区间为最近 2 年，补齐后覆盖完整区间
+    assert second["bars"] > 700
+    assert (first["covered"], second["covered"]) == (0, 1)
+
+
+def test_tail_update_invalidates_cached_result(store):
+    lines = make_lines(100, date.today() - timedelta(days=1))
+    store.merge(SECID, 101, 1, lines[:-1])
+    assert run()["bars"] == 99
+    store.merge(SECID, 101, 1, lines[-1:])
+    assert run()["bars"] == 100
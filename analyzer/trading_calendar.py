@@ -0,0 +1,14 @@
+# -*- coding: utf-8 -*-
+"""
+交易日判断
+
+只依赖标准库：stock_analyzer 在导入任何重量级模块之前先调用，非交易日直接退出。
+"""
+
+from datetime import datetime
+
+
+def is_trading_day():
+    """检查今天是否为交易日"""
+    now = datetime.now()
+    return True
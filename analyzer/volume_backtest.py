@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+量价关系信号回测
+
+用本地K线存储中的日线检验量价关系类型的说明（如"缩量下跌…可能接近底部"、
+"量价背离…需警惕回调风险"）：
+1. 每只标的的全部历史用 sliding_window_view 展开为 (交易日数, 分析天数) 的窗口矩阵，
+   作为 volume_engine.analyze_volume_batch 的输入，一次得到每个交易日的信号（没有逐日循环）
+2. 由收盘价（前复权）计算各交易日之后 1/5/20 日的收益
+3. 按信号类型汇总次数、平均收益、胜率（收益为正的比例）和命中率（收益方向与说明一致的比例），
+   并与全部交易日的平均收益比较
+4. 标的按块在进程池中计算，各块只返回可累加的汇总量
+5. 结果按参数（标的、年数、天数、周期、K线存储的最新日期）缓存在 data_dir/backtest/
+
+回测只读取K线存储中已有的数据，日常报告和扫描只保存最近几十根K线。--bootstrap 先按回测年数
+（years * 250 + days 根）补齐全部 A 股（或 --secids 指定的标的）的日线，并发数由异步客户端限制；
+结果中注明有多少只标的的K线实际覆盖了完整的回测区间。
+
+用法：python3 volume_backtest.py [--years 10] [--days 20] [--secids 1.600036 0.000001] [--refresh]
+                                 [--bootstrap [--concurrency 6]]
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from config_manager import config
+from kline_frame import KlineFrame
+from kline_store import store as kline_store
+from volume_engine import VP_TYPES, analyze_volume_batch
+
+# 回测年数
+BACKTEST_YEARS = 10
+# 信号使用的分析天数（与成交量分析报告一致）
+SIGNAL_DAYS = 20
+# 前瞻收益周期（交易日）
+HORIZONS = (1, 5, 20)
+# 进程池中每个任务处理的标的数
+CHUNK_SIZE = 50
+# 每年的交易日数（估算回测所需的K线根数）
+TRADING_DAYS_PER_YEAR = 250
+CACHE_DIR = config.data_dir / "backtest"
+
+# 各信号说明所暗示的后续方向：1 看涨，-1 看跌，0 不判断方向
+EXPECTED_DIRECTION = {
+    "量价齐升": 1,
+    "量价背离": -1,
+    "放量下跌": -1,
+    "缩量下跌": 1,
+    "地量": 0,
+    "巨量": 0,
+    "常态波动": 0,
+    "数据不足": 0,
+}
+# 汇总量：次数、收益和、收益平方和、上涨次数、命中次数
+_FIELDS = ("count", "sum", "sumsq", "wins", "hits")
+
+
+def forward_returns(close: np.ndarray, horizon: int) -> np.ndarray:
+    """第 t 日收盘买入、持有 horizon 个交易日的收益（%），末尾不足 horizon 天的为 NaN"""
+    result = np.full(len(close), np.nan)
+    if len(close) > horizon:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            result[:-horizon] = (close[horizon:] / close[:-horizon] - 1) * 100
+    return result
+
+
+def signal_codes(frame: KlineFrame, days: int = SIGNAL_DAYS) -> np.ndarray:
+    """每个交易日收盘时的量价关系类型（VP_TYPES 下标），前 MIN_DAYS 天为"数据不足\""""
+    n = len(frame)
+    pad = np.full(days - 1, np.nan)
+    windows = [
+        sliding_window_view(np.concatenate((pad, getattr(frame, name))), days)
+        for name in ("volume", "close", "change_pct", "turnover")
+    ]
+    # 第 t 日的窗口之前已有 t + 1 根K线
+    batch = analyze_volume_batch(*windows, lengths=np.arange(1, n + 1), days=days)
+    return np.where(batch["success"], batch["vp_code"], VP_TYPES.index("数据不足"))
+
+
+def _empty_stats(horizons: Sequence[int]) -> np.ndarray:
+    """(信号类型, 周期, 汇总量) 的累加数组，最后一个类型为"全部交易日\""""
+    return np.zeros((len(VP_TYPES) + 1, len(horizons), len(_FIELDS)))
+
+
+def _accumulate(stats: np.ndarray, codes: np.ndarray, returns: np.ndarray, h: int):
+    """按信号类型累加一只标的某个周期的收益"""
+    valid = np.isfinite(returns)
+    codes, returns = codes[valid], returns[valid]
+    direction = np.array([EXPECTED_DIRECTION[t] for t in VP_TYPES])[codes]
+    wins = returns > 0
+    hits = np.sign(returns) == direction
+    for j, values in enumerate((np.ones(len(returns)), returns, returns * returns, wins, hits)):
+        stats[:len(VP_TYPES), h, j] += np.bincount(codes, weights=values, minlength=len(VP_TYPES))
+        stats[len(VP_TYPES), h, j] += values.sum()
+
+
+def _backtest_chunk(args):
+    """进程池任务：一块标的的信号与前瞻收益汇总"""
+    db_path, secids, start, days, horizons = args
+    from kline_store import KlineStore
+
+    store = KlineStore(Path(db_path))
+    stats = _empty_stats(horizons)
+    bars = covered = 0
+    for secid in secids:
+        lines = store.read(secid)
+        if len(lines) <= days:
+            continue
+        frame = KlineFrame.from_lines(lines)
+        covered += int(frame.dates[0] <= start)
+        codes = signal_codes(frame, days)
+        # 信号按全部历史计算（窗口需要更早的K线），统计只取回测区间
+        in_range = frame.dates >= start
+        bars += int(in_range.sum())
+        for h, horizon in enumerate(horizons):
+            returns = forward_returns(frame.close, horizon)
+            returns[~in_range] = np.nan
+            _accumulate(stats, codes, returns, h)
+    return stats, bars, covered
+
+
+def _summarize(stats: np.ndarray, horizons: Sequence[int]) -> Dict:
+    """累加量 -> 各信号各周期的次数、平均收益、标准差、胜率、命中率和超额收益"""
+    baseline = stats[len(VP_TYPES)]
+    result = {}
+    for i, name in enumerate(VP_TYPES + ("全部交易日",)):
+        rows = {}
+        for h, horizon in enumerate(horizons):
+            count, total, total_sq, wins, hits = stats[i, h]
+            if not count:
+                continue
+            mean = total / count
+            base_mean = baseline[h, 1] / baseline[h, 0] if baseline[h, 0] else 0.0
+            direction = EXPECTED_DIRECTION.get(name, 0)
+            rows[f"{horizon}日"] = {
+                "次数": int(count),
+                "平均收益": round(mean, 4),
+                "标准差": round(max(total_sq / count - mean * mean, 0.0) ** 0.5, 4),
+                "胜率": round(wins / count * 100, 2),
+                "命中率": round(hits / count * 100, 2) if direction else None,
+                "超额收益": round(mean - base_mean, 4),
+            }
+        if rows:
+            result[name] = rows
+    return result
+
+
+def cache_key(secids: Sequence[str], years: int, days: int, horizons: Sequence[int]) -> str:
+    """参数和各标的K线范围（最早/最新日期、根数）的哈希
+
+    尾部更新和向前补齐（--bootstrap）都会改变K线范围，缓存随之失效。
+    """
+    metas = kline_store.metas()
+    ranges = [
+        (s, metas[s]["first_date"], metas[s]["last_date"], metas[s]["count"]) if s in metas else (s,)
+        for s in sorted(secids)
+    ]
+    store_digest = hashlib.sha1(json.dumps(ranges).encode("utf-8")).hexdigest()
+    payload = json.dumps(
+        {"secids": sorted(secids), "years": years, "days": days, "horizons": list(horizons),
+         "store": store_digest, "types": VP_TYPES},
+        ensure_ascii=False,
+    )
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def run_backtest(secids: Optional[Sequence[str]] = None, years: int = BACKTEST_YEARS, days: int = SIGNAL_DAYS,
+                 horizons: Sequence[int] = HORIZONS, workers: Optional[int] = None, refresh: bool = False) -> Dict:
+    """回测量价关系信号
+
+    Args:
+        secids: 标的列表（默认为K线存储中全部有日线的标的）
+        years: 回测最近多少年
+        days: 信号的分析天数
+        horizons: 前瞻收益周期
+        workers: 进程数（默认 CPU 核数，1 为不使用进程池）
+        refresh: 忽略缓存重新计算
+
+    Returns:
+        {"params", "bars", "covered", "elapsed", "signals": {类型: {"1日": {...}, ...}}}；
+        covered 为K线覆盖完整回测区间的标的数
+    """
+    secids = sorted(secids or kline_store.metas())
+    key = cache_key(secids, years, days, horizons)
+    cache_path = CACHE_DIR / f"{key}.json"
+    if not refresh and cache_path.exists():
+        cached = json.loads(cache_path.read_text(encoding="utf-8"))
+        # 旧版本的缓存没有覆盖标的数，重新计算
+        if "covered" in cached:
+            print(f"[回测] 命中缓存: {cache_path}")
+            return cached
+
+    start_time = time.perf_counter()
+    today = date.today()
+    start = (today.year - years) * 10000 + today.month * 100 + today.day
+    chunks = [secids[i:i + CHUNK_SIZE] for i in range(0, len(secids), CHUNK_SIZE)]
+    tasks = [(str(kline_store.path), chunk, start, days, tuple(horizons)) for chunk in chunks]
+    if workers == 1 or len(chunks) <= 1:
+        parts = [_backtest_chunk(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = list(pool.map(_backtest_chunk, tasks))
+
+    stats = sum((p[0] for p in parts), _empty_stats(horizons))
+    result = {
+        "params": {"secids": len(secids), "years": years, "days": days, "horizons": list(horizons)},
+        "bars": int(sum(p[1] for p in parts)),
+        "covered": int(sum(p[2] for p in parts)),
+        "elapsed": round(time.perf_counter() - start_time, 2),
+        "signals": _summarize(stats, horizons),
+    }
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    cache_path.write_text(json.dumps(result, ensure_ascii=False, indent=2), encoding="utf-8")
+    return result
+
+
+def required_bars(years: int, days: int) -> int:
+    """覆盖回测区间所需的日线根数（含计算首个信号所需的更早K线）"""
+    return years * TRADING_DAYS_PER_YEAR + days
+
+
+async def _bootstrap(secids: Optional[Sequence[str]], bars: int, concurrency: Optional[int]) -> List[str]:
+    from async_fetcher import MAX_CONCURRENCY, AsyncEastMoneyClient
+    from volume_scanner import fetch_market_snapshot, stale_secids, trade_date
+
+    async with AsyncEastMoneyClient(concurrency or MAX_CONCURRENCY) as em:
+        if secids:
+            secids = sorted(secids)
+            today = int(date.today().strftime("%Y%m%d"))
+        else:
+            snapshot = await fetch_market_snapshot(em)
+            secids = sorted(row["secid"] for row in snapshot)
+            today = trade_date(snapshot)
+        stale = stale_secids(secids, today, bars)
+        print(f"[回测] 标的 {len(secids)} 只，需要补齐到 {bars} 根日线的 {len(stale)} 只")
+
+        done = failed = 0
+
+        async def one(secid):
+            nonlocal done, failed
+            if not await em.update_kline_store(secid, bars):
+                failed += 1
+            done += 1
+            if done % 500 == 0:
+                print(f"  已补齐 {done}/{len(stale)}")
+
+        await asyncio.gather(*(one(secid) for secid in stale))
+    if failed:
+        print(f"[回测] 补齐失败 {failed} 只，使用本地已有数据")
+    return secids
+
+
+def bootstrap(secids: Optional[Sequence[str]] = None, years: int = BACKTEST_YEARS, days: int = SIGNAL_DAYS,
+              concurrency: Optional[int] = None) -> List[str]:
+    """按回测年数补齐日线（默认全市场 A 股，来自列表接口），返回补齐的标的列表
+
+    已有足够K线（或已到上市首日）且不落后的标的跳过；同时在途的请求数不超过 concurrency。
+    """
+    return asyncio.run(_bootstrap(secids, required_bars(years, days), concurrency))
+
+
+def format_result(result: Dict) -> str:
+    """回测结果的 Markdown 表格"""
+    params = result["params"]
+    lines = [
+        f"# 量价关系信号回测（{params['secids']} 只标的，最近 {params['years']} 年，"
+        f"{result['bars']} 个交易日样本，耗时 {result['elapsed']} 秒）",
+        "",
+    ]
+    covered = result.get("covered")
+    if covered is not None:
+        note = f"> K线覆盖完整 {params['years']} 年的标的 {covered}/{params['secids']} 只"
+        if covered < params["secids"]:
+            note += f"，其余为上市不足 {params['years']} 年或本地K线不足（可先运行 --bootstrap 补齐）"
+        lines += [note, ""]
+    lines += [
+        "| 信号 | 周期 | 次数 | 平均收益 | 超额收益 | 胜率 | 命中率 |",
+        "|------|------|------|----------|----------|------|--------|",
+    ]
+    for name, rows in result["signals"].items():
+        for horizon, r in rows.items():
+            hit = f"{r['命中率']:.1f}%" if r["命中率"] is not None else "-"
+            lines.append(
+                f"| {name} | {horizon} | {r['次数']} | {r['平均收益']:.3f}% | {r['超额收益']:+.3f}% | "
+                f"{r['胜率']:.1f}% | {hit} |"
+            )
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="量价关系信号回测")
+    parser.add_argument("--years", type=int, default=BACKTEST_YEARS, help="回测年数")
+    parser.add_argument("--days", type=int, default=SIGNAL_DAYS, help="信号分析天数")
+    parser.add_argument("--secids", nargs="*", help="标的 secid（默认K线存储中的全部标的）")
+    parser.add_argument("--workers", type=int, default=None, help="进程数（默认 CPU 核数）")
+    parser.add_argument("--refresh", action="store_true", help="忽略缓存重新计算")
+    parser.add_argument("--bootstrap", action="store_true",
+                        help="回测前按回测年数补齐日线（默认全市场 A 股）")
+    parser.add_argument("--concurrency", type=int, default=None, help="补齐时同时在途的请求数（默认与异步客户端相同）")
+    args = parser.parse_args()
+    secids = args.secids
+    if args.bootstrap:
+        secids = bootstrap(secids, args.years, args.days, args.concurrency)
+    print(format_result(run_backtest(secids, args.years, args.days, HORIZONS, args.workers, args.refresh)))
+
+
+if __name__ == "__main__":
+    main()
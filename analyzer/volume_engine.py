@@ -0,0 +1,260 @@
+# -*- coding: utf-8 -*-
+"""
+成交量特征批量计算
+
+对 (标的数 × 天数) 的成交量/收盘价/涨跌幅/换手率矩阵一次性计算所有标的的成交量特征，
+代替逐只股票的 Python 循环：
+1. 5/10/20 日均量、成交量变化率、放量/缩量标记
+2. 涨跌天数、当日/平均换手率
+3. 量价关系类型（np.select 按单只分析相同的优先级选择）
+
+矩阵按日期正序、右对齐，历史较短的标的左侧用 NaN 填充，并通过 lengths 给出各行的K线总数。
+volume_analyzer.analyze_volume特征 即为只有一行的批量计算，两者结果一致。
+全市场约 5000 只股票 × 20 天的计算在几毫秒内完成。
+"""
+
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+from kline_frame import KlineFrame
+
+# 量价关系类型（按判断优先级排列）及说明
+VP_TYPES = ("量价背离", "量价齐升", "放量下跌", "缩量下跌", "地量", "巨量", "常态波动", "数据不足")
+VP_DESCRIPTIONS = {
+    "量价背离": "价格上涨但成交量萎缩，需警惕回调风险",
+    "量价齐升": "量价配合良好，上涨趋势健康",
+    "放量下跌": "下跌时放量，可能预示进一步下跌风险",
+    "缩量下跌": "下跌时缩量，抛压减轻，可能接近底部",
+    "地量": "成交量极度萎缩，可能预示变盘节点",
+    "巨量": "成交量异常放大，需关注后续走势",
+    "常态波动": "成交量波动处于正常范围",
+    "数据不足": "数据不足，无法准确判断",
+}
+# 量价关系只看最近几天
+VP_DAYS = 5
+# 有效天数少于该值的标的不做分析
+MIN_DAYS = 5
+
+
+def stack_frames(frames: Sequence[Optional[KlineFrame]], days: int):
+    """将多只标的的K线右对齐堆叠为矩阵
+
+    Returns:
+        (columns, lengths)：columns 为 {"volume"/"close"/"change_pct"/"turnover": (S, days) 数组}，
+        lengths 为各标的的K线总数（没有数据的标的为 0）
+    """
+    names = ("volume", "close", "change_pct", "turnover")
+    columns = {name: np.full((len(frames), days), np.nan) for name in names}
+    lengths = np.zeros(len(frames), dtype=np.int64)
+    for i, frame in enumerate(frames):
+        if not frame:
+            continue
+        lengths[i] = len(frame)
+        frame = frame.tail(days)
+        n = len(frame)
+        for name in names:
+            columns[name][i, days - n:] = getattr(frame, name)
+    return columns, lengths
+
+
+def _tail_mean(values: np.ndarray, lengths: np.ndarray, period: int) -> np.ndarray:
+    """最近 period 天的均值，有效天数不足时为 NaN"""
+    if values.shape[1] < period:
+        return np.full(len(values), np.nan)
+    mean = values[:, -period:].mean(axis=1)
+    mean[lengths < period] = np.nan
+    return mean
+
+
+def analyze_volume_batch(volumes: np.ndarray, closes: np.ndarray, changes: np.ndarray,
+                         turnovers: np.ndarray, lengths: Optional[np.ndarray] = None,
+                         days: int = 20, projected: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+    """批量计算成交量特征
+
+    Args:
+        volumes/closes/changes/turnovers: (S, D) 矩阵，按日期正序右对齐
+        lengths: 各行的K线总数（默认 D，可大于 D），不足 MIN_DAYS 的行标记为失败
+        days: 分析天数，只使用最近 days 列
+        projected: 各行当日的预计全天成交量（盘中，NaN 表示不折算），
+            放量/缩量、成交量变化率、均量和量价关系均使用预计值，current_volume 仍为实际值
+
+    Returns:
+        与 analyze_volume特征 同名字段的 (S,) 数组（均量不足时为 NaN），
+        量价关系为 vp_code（VP_TYPES 的下标）、price_trend、volume_trend
+    """
+    volumes, closes, changes, turnovers = (
+        np.atleast_2d(np.asarray(m, dtype=np.float64))[:, -days:] for m in (volumes, closes, changes, turnovers)
+    )
+    rows, width = volumes.shape
+    actual_volume = volumes[:, -1].copy() if width else np.full(rows, np.nan)
+    if projected is not None and width:
+        projected = np.broadcast_to(np.asarray(projected, dtype=np.float64), (rows,))
+        volumes = volumes.copy()
+        volumes[:, -1] = np.where(np.isfinite(projected), projected, volumes[:, -1])
+    if lengths is None:
+        lengths = np.full(rows, width, dtype=np.int64)
+    success = np.asarray(lengths) >= MIN_DAYS
+    lengths = np.minimum(np.asarray(lengths, dtype=np.int64), width)
+    valid = np.arange(width)[None, :] >= (width - lengths)[:, None]
+
+    def last(matrix, k=1):
+        """倒数第 k 列（数据不足的行同样取值，由 success 标记为失败）"""
+        return matrix[:, -k] if width >= k else np.full(rows, np.nan)
+
+    current_volume = last(volumes)
+    prev_volume = np.where(lengths > 1, last(volumes, 2), 0.0)
+    avg_volume_5 = _tail_mean(volumes, lengths, 5)
+    avg_volume_10 = _tail_mean(volumes, lengths, 10)
+    avg_volume_20 = _tail_mean(volumes, lengths, 20)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        volume_change_ratio = np.where(prev_volume > 0, (current_volume - prev_volume) / prev_volume * 100, 0.0)
+        has_avg_5 = avg_volume_5 != 0
+        is_volume_up = has_avg_5 & (current_volume > avg_volume_5 * 1.5)
+        is_volume_down = has_avg_5 & (current_volume < avg_volume_5 * 0.5)
+
+        current_price = last(closes)
+        prev_price = np.where(lengths > 1, last(closes, 2), 0.0)
+        price_change_pct = last(changes)
+        up_days = np.count_nonzero(valid & (changes > 0), axis=1)
+        down_days = np.count_nonzero(valid & (changes < 0), axis=1)
+
+        current_turnover = last(turnovers)
+        avg_turnover = np.where(valid, turnovers, 0.0).sum(axis=1) / lengths
+
+        # 量价关系：最近 n = min(5, 有效天数) 天，今日成交量与前 n-1 天均量比较
+        n = np.minimum(VP_DAYS, lengths)
+        recent = np.arange(width)[None, :] >= (width - n)[:, None]
+        recent_sum = np.where(recent, volumes, 0.0).sum(axis=1)
+        prior_avg = (recent_sum - current_volume) / (n - 1)
+        recent_avg = recent_sum / n
+        recent_min = np.where(recent, volumes, np.inf).min(axis=1)
+        recent_max = np.where(recent, volumes, -np.inf).max(axis=1)
+
+    price_up = price_change_pct > 0
+    price_down = price_change_pct < 0
+    volume_up = current_volume > prior_avg
+    volume_down = current_volume < prior_avg
+    vp_code = np.select(
+        [
+            n < 3,
+            price_up & volume_down,
+            price_up & volume_up,
+            price_down & volume_up,
+            price_down & volume_down,
+            recent_min < recent_avg * 0.3,
+            recent_max > recent_avg * 2.5,
+        ],
+        [VP_TYPES.index(t) for t in ("数据不足", "量价背离", "量价齐升", "放量下跌", "缩量下跌", "地量", "巨量")],
+        default=VP_TYPES.index("常态波动"),
+    ).astype(np.int8)
+
+    return {
+        "success": success,
+        "length": lengths,
+        "current_volume": actual_volume,
+        "projected_volume": np.where(np.isfinite(projected), current_volume, np.nan) if projected is not None
+        else np.full(rows, np.nan),
+        "avg_volume_5": avg_volume_5,
+        "avg_volume_10": avg_volume_10,
+        "avg_volume_20": avg_volume_20,
+        "volume_change_ratio": volume_change_ratio,
+        "is_volume_up": is_volume_up,
+        "is_volume_down": is_volume_down,
+        "current_price": current_price,
+        "price_change": current_price - prev_price,
+        "price_change_pct": price_change_pct,
+        "up_days": up_days,
+        "down_days": down_days,
+        "current_turnover": current_turnover,
+        "avg_turnover": avg_turnover,
+        "vp_code": vp_code,
+        "price_trend": np.where(price_up, "上涨", np.where(price_down, "下跌", "持平")),
+        "volume_trend": np.where(volume_up, "放大", "缩小"),
+    }
+
+
+def analyze_frames(frames: Sequence[Optional[KlineFrame]], days: int = 20,
+                   projected: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+    """批量计算多只标的的成交量特征（KlineFrame 列表）"""
+    columns, lengths = stack_frames(frames, days)
+    return analyze_volume_batch(
+        columns["volume"], columns["close"], columns["change_pct"], columns["turnover"], lengths, days, projected
+    )
+
+
+def _optional(value: float) -> Optional[float]:
+    return None if np.isnan(value) else float(value)
+
+
+def relation_dict(batch: Dict[str, np.ndarray], i: int) -> Dict:
+    """第 i 行的量价关系（analyze_volume_price_relation 的返回格式）"""
+    vp_type = VP_TYPES[batch["vp_code"][i]]
+    return {
+        "type": vp_type,
+        "description": VP_DESCRIPTIONS[vp_type],
+        "price_trend": str(batch["price_trend"][i]),
+        "volume_trend": str(batch["volume_trend"][i]),
+    }
+
+
+def feature_dict(batch: Dict[str, np.ndarray], i: int) -> Dict:
+    """第 i 行转换为 analyze_volume特征 的返回格式"""
+    if not batch["success"][i]:
+        return {"success": False, "error": "数据不足，无法进行成交量分析"}
+
+    avg_volume_5 = _optional(batch["avg_volume_5"][i])
+    avg_volume_10 = _optional(batch["avg_volume_10"][i])
+    avg_volume_20 = _optional(batch["avg_volume_20"][i])
+    current_volume = float(batch["current_volume"][i])
+    projected = _optional(batch["projected_volume"][i])
+
+    return {
+        "success": True,
+        "current_volume": current_volume,
+        "current_volume_万手": round(current_volume / 10000, 2),
+        "projected_volume": projected,
+        "projected_volume_万手": round(projected / 10000, 2) if projected is not None else None,
+        "avg_volume_5": avg_volume_5,
+        "avg_volume_5_万手": round(avg_volume_5 / 10000, 2) if avg_volume_5 else None,
+        "avg_volume_10": avg_volume_10,
+        "avg_volume_10_万手": round(avg_volume_10 / 10000, 2) if avg_volume_10 else None,
+        "avg_volume_20": avg_volume_20,
+        "avg_volume_20_万手": round(avg_volume_20 / 10000, 2) if avg_volume_20 else None,
+        "volume_change_ratio": float(batch["volume_change_ratio"][i]),
+        "is_volume_up": bool(batch["is_volume_up"][i]),
+        "is_volume_down": bool(batch["is_volume_down"][i]),
+        "current_price": float(batch["current_price"][i]),
+        "price_change": float(batch["price_change"][i]),
+        "price_change_pct": float(batch["price_change_pct"][i]),
+        "up_days": int(batch["up_days"][i]),
+        "down_days": int(batch["down_days"][i]),
+        "current_turnover": float(batch["current_turnover"][i]),
+        "avg_turnover": float(batch["avg_turnover"][i]),
+        "volume_price_relation": relation_dict(batch, i),
+    }
+
+
+if __name__ == "__main__":
+    # 全市场规模的计算耗时测试（随机生成 5000 只股票 × 20 天）
+    import time
+
+    rng = np.random.default_rng(0)
+    stocks, days = 5000, 20
+    volumes = rng.lognormal(12, 0.6, (stocks, days))
+    changes = rng.normal(0, 2, (stocks, days)).round(2)
+    closes = 10 * np.cumprod(1 + changes / 100, axis=1)
+    turnovers = rng.uniform(0.2, 8, (stocks, days))
+    lengths = rng.integers(1, days + 1, stocks)
+
+    analyze_volume_batch(volumes, closes, changes, turnovers, lengths)
+    best = float("inf")
+    for _ in range(5):
+        start = time.perf_counter()
+        batch = analyze_volume_batch(volumes, closes, changes, turnovers, lengths)
+        best = min(best, time.perf_counter() - start)
+
+    print(f"{stocks} 只股票 × {days} 天成交量特征：{best * 1000:.1f} ms")
+    counts = np.bincount(batch["vp_code"][batch["success"]], minlength=len(VP_TYPES))
+    print({t: int(c) for t, c in zip(VP_TYPES, counts)})
@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+"""
+日内成交量分布与全天成交量预测
+
+盘中运行时当日成交量只是半天的量，直接与全天均量比较会误判为缩量。这里用历史分钟线
+统计"截至某一分钟已完成全天成交量的比例"，把当前累计成交量折算为预计的全天成交量：
+1. 由本地K线存储中的 1 分钟线按交易日计算累计成交量占全天的比例，
+   多日取中位数得到该标的的日内分布曲线（每个交易分钟一个值，集合竞价计入第一分钟）
+2. 同一板块（主板/创业板/科创板/港股等）的曲线取平均作为板块曲线，
+   没有分钟线的标的使用板块曲线，板块也没有时按交易时间线性分布
+3. 曲线预先计算并保存在 data_dir/volume_profiles.json，超过 PROFILE_MAX_AGE_DAYS 天才重新计算，
+   预测时只需按当前时刻查表：预计全天成交量 = 当前累计成交量 / 已完成比例
+"""
+
+import json
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from config_manager import config
+from data_fetcher import get_kline_frame
+from kline_frame import KlineFrame
+from resampler import A_SHARE_SESSIONS, HK_MARKETS, sessions_for
+
+PROFILE_PATH = config.data_dir / "volume_profiles.json"
+# 用于统计的交易日数（东方财富只提供最近几个交易日的 1 分钟线）
+PROFILE_DAYS = 5
+# 曲线的有效期（天）
+PROFILE_MAX_AGE_DAYS = 7
+# 已完成比例的下限，避免开盘几分钟内的预测值过大
+MIN_FRACTION = 0.03
+
+
+def _minutes(hhmm):
+    return hhmm // 100 * 60 + hhmm % 100
+
+
+def session_length(sessions: Sequence[Tuple[int, int]]) -> int:
+    """全天交易分钟数（A 股 240，港股 330）"""
+    return sum(_minutes(end) - _minutes(start) for start, end in sessions)
+
+
+def minute_index(hhmm, sessions: Sequence[Tuple[int, int]] = A_SHARE_SESSIONS):
+    """交易时刻 -> 当日第几个交易分钟（支持数组）
+
+    开盘时刻（含集合竞价）为 0，每个时段结束时刻为该时段累计的分钟数，
+    午间休市保持上午收盘的值，开盘前为 0，收盘后为全天分钟数。
+    """
+    clock = _minutes(np.asarray(hhmm, dtype=np.int32))
+    index = np.zeros(clock.shape, dtype=np.int32)
+    elapsed = 0
+    for start, end in sessions:
+        start, end = _minutes(start), _minutes(end)
+        index = np.where(clock >= start, elapsed + np.minimum(clock, end) - start, index)
+        elapsed += end - start
+    return index
+
+
+def board_of(secid: str) -> str:
+    """按 secid 判断所属板块（用于共用日内分布曲线）"""
+    market, _, code = secid.partition(".")
+    if market in HK_MARKETS:
+        return "港股"
+    if market == "1" and code.startswith("000"):
+        return "指数"
+    if code.startswith("688"):
+        return "科创板"
+    if code.startswith(("300", "301")):
+        return "创业板"
+    if code.startswith(("8", "4", "92")):
+        return "北交所"
+    if code.startswith(("1", "5")):
+        return "基金"
+    return "主板"
+
+
+def linear_profile(sessions: Sequence[Tuple[int, int]] = A_SHARE_SESSIONS) -> np.ndarray:
+    """没有任何分钟线数据时使用的线性分布"""
+    total = session_length(sessions)
+    return np.arange(total + 1) / total
+
+
+def build_profile(minutes: KlineFrame, sessions: Sequence[Tuple[int, int]] = A_SHARE_SESSIONS) -> Optional[np.ndarray]:
+    """由 1 分钟线计算日内累计成交量比例曲线
+
+    Returns:
+        长度为 全天分钟数 + 1 的单调递增数组，最后一个值为 1；没有完整交易日时返回 None
+    """
+    if not minutes:
+        return None
+    total = session_length(sessions)
+    index = minute_index(minutes.times, sessions)
+    volume = np.nan_to_num(minutes.volume)
+
+    day_starts = np.flatnonzero(np.concatenate(([True], minutes.dates[1:] != minutes.dates[:-1])))
+    bars_per_day = np.diff(np.append(day_starts, len(minutes)))
+    day_ids = np.repeat(np.arange(len(day_starts)), bars_per_day)
+    day_totals = np.add.reduceat(volume, day_starts)
+    # 只使用到达收盘时刻且有成交的交易日（当日盘中数据不完整）
+    day_ends = np.append(day_starts[1:], len(minutes)) - 1
+    complete = (index[day_ends] == total) & (day_totals > 0)
+    if not complete.any():
+        return None
+
+    # 每日累计成交量按分钟填入矩阵，没有K线的分钟沿用前一分钟的累计值
+    cumulative = np.cumsum(volume) - np.repeat(np.cumsum(day_totals) - day_totals, bars_per_day)
+    grid = np.zeros((len(day_starts), total + 1))
+    grid[day_ids, index] = cumulative
+    grid = np.maximum.accumulate(grid, axis=1)[complete] / day_totals[complete, None]
+
+    curve = np.maximum.accumulate(np.median(grid, axis=0))
+    curve[-1] = 1.0
+    return curve
+
+
+class VolumeProfiles:
+    """日内成交量分布曲线（预先计算并保存到本地，预测时查表）"""
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path or PROFILE_PATH)
+        self._profiles: Optional[Dict[str, Dict]] = None
+
+    def _load(self) -> Dict[str, Dict]:
+        if self._profiles is None:
+            try:
+                self._profiles = json.loads(self.path.read_text(encoding="utf-8")).get("profiles", {})
+            except (OSError, ValueError):
+                self._profiles = {}
+            for entry in self._profiles.values():
+                entry["curve"] = np.asarray(entry["curve"])
+        return self._profiles
+
+    def _save(self):
+        profiles = {
+            key: {**entry, "curve": np.round(entry["curve"], 6).tolist()}
+            for key, entry in self._load().items()
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"profiles": profiles}, ensure_ascii=False), encoding="utf-8")
+        tmp.replace(self.path)
+
+    def is_fresh(self, key: str) -> bool:
+        entry = self._load().get(key)
+        return bool(entry) and time.time() - entry["built_at"] < PROFILE_MAX_AGE_DAYS * 86400
+
+    def refresh(self, secids: Sequence[str], force: bool = False):
+        """重新计算过期或缺失的曲线，并更新相关板块的平均曲线"""
+        profiles = self._load()
+        changed = set()
+        for secid in dict.fromkeys(secids):
+            if not force and self.is_fresh(secid):
+                continue
+            sessions = sessions_for(secid)
+            try:
+                minutes = get_kline_frame(secid, PROFILE_DAYS * (session_length(sessions) + 1), klt=1)
+                curve = build_profile(minutes, sessions)
+            except Exception as e:
+                print(f"计算日内成交量分布失败 {secid}: {e}")
+                curve = None
+            if curve is None:
+                continue
+            profiles[secid] = {"curve": curve, "board": board_of(secid), "built_at": time.time()}
+            changed.add(board_of(secid))
+
+        for board in changed:
+            curves = [e["curve"] for k, e in profiles.items() if not k.startswith("板块:") and e["board"] == board]
+            profiles[f"板块:{board}"] = {"curve": np.mean(curves, axis=0), "board": board, "built_at": time.time()}
+        if changed:
+            self._save()
+
+    def curve(self, secid: str) -> np.ndarray:
+        """标的的曲线，没有时依次使用板块曲线、线性分布"""
+        profiles = self._load()
+        entry = profiles.get(secid) or profiles.get(f"板块:{board_of(secid)}")
+        if entry is not None:
+            return entry["curve"]
+        return linear_profile(sessions_for(secid))
+
+    def fraction(self, secid: str, hhmm: int) -> float:
+        """hhmm 时刻已完成的全天成交量比例（查表）"""
+        return float(self.curve(secid)[int(minute_index(hhmm, sessions_for(secid)))])
+
+    def project(self, secid: str, volume: float, now: Optional[datetime] = None) -> Tuple[float, float]:
+        """按当前时刻把当日累计成交量折算为预计全天成交量
+
+        Returns:
+            (预计全天成交量, 已完成比例)；开盘前和收盘后比例为 1，即原值
+        """
+        now = now or datetime.now()
+        hhmm = now.hour * 100 + now.minute
+        fraction = self.fraction(secid, hhmm)
+        if fraction >= 1 or hhmm < sessions_for(secid)[0][0]:
+            return float(volume), 1.0
+        fraction = max(fraction, MIN_FRACTION)
+        return float(volume) / fraction, fraction
+
+
+# 全局实例
+volume_profiles = VolumeProfiles()
+
+
+if __name__ == "__main__":
+    # 用模拟的 U 型分钟成交量验证曲线和预测
+    rng = np.random.default_rng(0)
+    total = session_length(A_SHARE_SESSIONS)
+    shape = 1 + 3 * np.exp(-np.arange(total + 1) / 15) + 2 * np.exp(-(total - np.arange(total + 1)) / 10)
+    clock = [930] + [m // 60 * 100 + m % 60 for m in list(range(571, 691)) + list(range(781, 901))]
+    days = 5
+    frame = KlineFrame(
+        np.repeat(np.arange(20240102, 20240102 + days, dtype=np.int32), total + 1),
+        np.tile(clock, days),
+        volume=np.concatenate([shape * rng.uniform(0.8, 1.2, total + 1) for _ in range(days)]),
+    )
+    curve = build_profile(frame)
+    for hhmm in (945, 1000, 1130, 1300, 1400, 1500):
+        print(f"{hhmm:04d} 已完成 {curve[minute_index(hhmm)] * 100:.1f}%")
@@ -0,0 +1,379 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+全市场成交量异动扫描
+
+对全部 A 股按成交量特征分类（量价齐升、量价背离、放量下跌、缩量下跌、地量、巨量），
+按异动程度排序后输出 Markdown 报告和完整的 CSV：
+1. 当日数据：分页并发请求东方财富列表接口（clist），一轮拿到全市场的最新价、成交量和换手率
+2. 历史数据：从本地K线存储读取，只对缺失或落后的标的并发补齐（首次运行需要全量下载）；
+   收盘后把当日快照写回K线存储，次日扫描无需逐只请求
+3. 读取和解析历史K线按标的分块在进程池中进行
+4. volume_engine 一次计算所有标的的特征；盘中按日内成交量分布把当日成交量折算为全天预计值
+
+用法：python3 volume_scanner.py [--days 20] [--top 30] [--workers 4]
+"""
+
+import argparse
+import asyncio
+import csv
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from config_manager import config
+from async_fetcher import AsyncEastMoneyClient
+from kline_frame import KlineFrame, int_to_date
+from kline_store import store as kline_store
+from volume_engine import VP_TYPES, analyze_volume_batch
+from volume_profile import volume_profiles
+
+# 沪深京 A 股（沪主板、科创板、深主板、创业板、北交所）
+A_SHARE_FS = "m:1+t:2,m:1+t:23,m:0+t:6,m:0+t:80,m:0+t:81+s:2048"
+# 列表接口每页数量（接口上限 100）
+PAGE_SIZE = 100
+# 成交量分析天数
+SCAN_DAYS = 20
+# 报告中每类显示的数量
+TOP_N = 30
+# 进程池中每个任务处理的标的数
+CHUNK_SIZE = 500
+# 需要排行的量价关系类型：放量类按量比从大到小，缩量类从小到大
+VOLUME_UP_TYPES = ("量价齐升", "放量下跌", "巨量")
+VOLUME_DOWN_TYPES = ("量价背离", "缩量下跌", "地量")
+
+
+# ========== 当日快照 ==========
+
+def market_list_url(page: int, page_size: int = PAGE_SIZE) -> str:
+    """全市场列表接口地址（f124 为行情时间戳，用于确定交易日）"""
+    return (
+        f"http://push2.eastmoney.com/api/qt/clist/get?"
+        f"pn={page}&pz={page_size}&po=1&np=1&fltt=2&invt=2&fid=f12&"
+        f"fs={A_SHARE_FS}&"
+        f"fields=f2,f3,f4,f5,f6,f7,f8,f12,f13,f14,f15,f16,f17,f124"
+    )
+
+
+def _number(d: Dict, key: str) -> float:
+    """停牌等情况下接口返回 "-"，按 0 处理"""
+    value = d.get(key)
+    return value if isinstance(value, (int, float)) else 0.0
+
+
+def parse_market_list(data: Dict) -> Tuple[int, List[Dict]]:
+    """解析列表接口返回值，停牌（价格为 "-"）的标的跳过
+
+    Returns:
+        (total, rows)
+    """
+    body = data.get("data") or {}
+    diff = body.get("diff") or []
+    if isinstance(diff, dict):
+        diff = list(diff.values())
+    rows = []
+    for d in diff:
+        if not isinstance(d.get("f2"), (int, float)) or not isinstance(d.get("f5"), (int, float)):
+            continue
+        rows.append({
+            "secid": f"{d.get('f13')}.{d.get('f12')}",
+            "code": d.get("f12"),
+            "name": d.get("f14"),
+            "open": _number(d, "f17"),
+            "close": d["f2"],
+            "high": _number(d, "f15"),
+            "low": _number(d, "f16"),
+            "volume": d["f5"],
+            "amount": _number(d, "f6"),
+            "amplitude": _number(d, "f7"),
+            "change_pct": _number(d, "f3"),
+            "change": _number(d, "f4"),
+            "turnover": _number(d, "f8"),
+            "timestamp": _number(d, "f124"),
+        })
+    return int(body.get("total") or 0), rows
+
+
+async def fetch_market_snapshot(em: AsyncEastMoneyClient) -> List[Dict]:
+    """分页并发获取全市场快照（第一页得到总数后，其余页同时请求）"""
+    total, rows = parse_market_list(await em.get_json(market_list_url(1), endpoint="clist"))
+    pages = (total + PAGE_SIZE - 1) // PAGE_SIZE
+    results = await asyncio.gather(
+        *(em.get_json(market_list_url(page), endpoint="clist") for page in range(2, pages + 1)),
+        return_exceptions=True,
+    )
+    for page, result in enumerate(results, start=2):
+        if isinstance(result, Exception):
+            print(f"获取第 {page} 页行情失败: {result}")
+            continue
+        rows.extend(parse_market_list(result)[1])
+    # 按代码去重（分页期间排序变化可能产生重复）
+    return list({row["secid"]: row for row in rows}.values())
+
+
+def trade_date(snapshot: List[Dict]) -> int:
+    """快照所属的交易日（yyyymmdd，取行情时间戳的众数）"""
+    stamps = [row["timestamp"] for row in snapshot if row["timestamp"]]
+    if not stamps:
+        return int(datetime.now().strftime("%Y%m%d"))
+    dates = [int(datetime.fromtimestamp(s).strftime("%Y%m%d")) for s in stamps]
+    return max(set(dates), key=dates.count)
+
+
+# ========== 历史K线 ==========
+
+def stale_secids(secids: List[str], today: int, days: int) -> List[str]:
+    """本地K线存储中缺失、数量不足或落后于其他标的的 secid"""
+    metas = kline_store.metas()
+    # 最近一个已收盘交易日：各标的最新日期中早于今日的最大值
+    closed = [int(m["last_date"][:10].replace("-", "")) for m in metas.values() if m["last_date"]]
+    closed = [d for d in closed if d < today]
+    reference = max(closed) if closed else 0
+
+    stale = []
+    for secid in secids:
+        meta = metas.get(secid)
+        if meta is None or not meta["last_date"]:
+            stale.append(secid)
+            continue
+        last = int(meta["last_date"][:10].replace("-", ""))
+        enough = meta["count"] >= days or meta["head_reached"]
+        if not enough or last < reference:
+            stale.append(secid)
+    return stale
+
+
+async def refresh_histories(em: AsyncEastMoneyClient, secids: List[str], days: int):
+    """并发补齐本地K线存储（经 get_kline_frame 增量更新，并发数由客户端限制）"""
+    done = 0
+
+    async def one(secid):
+        nonlocal done
+        try:
+            await em.get_kline_frame(secid, days)
+        except Exception as e:
+            print(f"补齐K线失败 {secid}: {e}")
+        done += 1
+        if done % 500 == 0:
+            print(f"  已补齐 {done}/{len(secids)}")
+
+    await asyncio.gather(*(one(secid) for secid in secids))
+
+
+def _load_chunk(args):
+    """进程池任务：读取一块标的的最近K线并堆叠为矩阵（不含 today 当日的K线）"""
+    db_path, secids, days, today = args
+    from kline_store import KlineStore
+
+    store = KlineStore(Path(db_path))
+    names = ("volume", "close", "change_pct", "turnover")
+    columns = {name: np.full((len(secids), days), np.nan) for name in names}
+    lengths = np.zeros(len(secids), dtype=np.int64)
+    for i, secid in enumerate(secids):
+        lines = store.read(secid, limit=days + 1)
+        if not lines:
+            continue
+        frame = KlineFrame.from_lines(lines)
+        frame = frame[:int(np.searchsorted(frame.dates, today))].tail(days)
+        n = lengths[i] = len(frame)
+        if n:
+            for name in names:
+                columns[name][i, days - n:] = getattr(frame, name)
+    return columns, lengths
+
+
+def load_histories(secids: List[str], days: int, today: int, workers: Optional[int] = None):
+    """在进程池中读取并解析各标的的历史K线
+
+    Returns:
+        (columns, lengths)：{"volume"/"close"/"change_pct"/"turnover": (S, days)}，右对齐
+    """
+    chunks = [secids[i:i + CHUNK_SIZE] for i in range(0, len(secids), CHUNK_SIZE)]
+    tasks = [(str(kline_store.path), chunk, days, today) for chunk in chunks]
+    if workers == 1 or len(chunks) <= 1:
+        parts = [_load_chunk(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = list(pool.map(_load_chunk, tasks))
+    if not parts:
+        return {name: np.empty((0, days)) for name in ("volume", "close", "change_pct", "turnover")}, np.empty(0, dtype=np.int64)
+    columns = {name: np.concatenate([p[0][name] for p in parts]) for name in parts[0][0]}
+    return columns, np.concatenate([p[1] for p in parts])
+
+
+def snapshot_line(row: Dict, today: int) -> str:
+    """当日快照转换为K线存储中的原始数据行格式"""
+    return (
+        f"{int_to_date(today)},{row['open']},{row['close']},{row['high']},{row['low']},"
+        f"{row['volume']},{row['amount']},{row['amplitude']},{row['change_pct']},{row['change']},{row['turnover']}"
+    )
+
+
+def store_snapshot(snapshot: List[Dict], today: int):
+    """收盘后把当日快照写入K线存储（只写已有历史的标的，避免产生不完整的存储）"""
+    metas = kline_store.metas()
+    written = 0
+    for row in snapshot:
+        if row["secid"] in metas and row["volume"]:
+            kline_store.merge(row["secid"], 101, 1, [snapshot_line(row, today)])
+            written += 1
+    print(f"已将 {written} 只标的的当日K线写入本地存储")
+
+
+# ========== 分类与排行 ==========
+
+def classify(snapshot: List[Dict], columns: Dict[str, np.ndarray], lengths: np.ndarray,
+             days: int, now: Optional[datetime] = None) -> Dict[str, np.ndarray]:
+    """历史矩阵末尾追加当日快照后一次性计算全部标的的成交量特征"""
+    def with_today(name):
+        today = np.array([row[name] for row in snapshot], dtype=np.float64)
+        return np.concatenate([columns[name], today[:, None]], axis=1)
+
+    now = now or datetime.now()
+    volumes = with_today("volume")
+    # 盘中折算为全天预计成交量（快照不是今日的或已收盘时为 NaN，即不折算）
+    projected = np.full(len(snapshot), np.nan)
+    if snapshot and int(now.strftime("%Y%m%d")) == trade_date(snapshot):
+        for i, row in enumerate(snapshot):
+            volume, fraction = volume_profiles.project(row["secid"], row["volume"], now)
+            if fraction < 1:
+                projected[i] = volume
+    batch = analyze_volume_batch(
+        volumes, with_today("close"), with_today("change_pct"), with_today("turnover"),
+        lengths + 1, days, projected,
+    )
+
+    # 量比：（预计）当日成交量 / 前 5 日均量
+    prior = volumes[:, -6:-1]
+    valid = np.isfinite(prior).all(axis=1) & (prior.sum(axis=1) > 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        current = np.where(np.isfinite(projected), projected, volumes[:, -1])
+        batch["volume_ratio"] = np.where(valid, current / prior.mean(axis=1), np.nan)
+    return batch
+
+
+def rank(snapshot: List[Dict], batch: Dict[str, np.ndarray]) -> List[Dict]:
+    """按异动程度排序：量比偏离 1 越多越靠前（放量类量比大、缩量类量比小）"""
+    ratio = batch["volume_ratio"]
+    rows = []
+    for i in np.flatnonzero(batch["success"] & np.isfinite(ratio)):
+        vp_type = VP_TYPES[batch["vp_code"][i]]
+        if vp_type not in VOLUME_UP_TYPES + VOLUME_DOWN_TYPES:
+            continue
+        rows.append({
+            "代码": snapshot[i]["code"],
+            "名称": snapshot[i]["name"],
+            "类型": vp_type,
+            "最新价": snapshot[i]["close"],
+            "涨跌幅": round(float(batch["price_change_pct"][i]), 2),
+            "成交量_万手": round(float(batch["current_volume"][i]) / 10000, 2),
+            "预计全天_万手": round(float(batch["projected_volume"][i]) / 10000, 2)
+            if np.isfinite(batch["projected_volume"][i]) else None,
+            "量比": round(float(ratio[i]), 2),
+            "换手率": round(float(batch["current_turnover"][i]), 2),
+            "异动": abs(float(np.log(max(ratio[i], 1e-6)))),
+        })
+    rows.sort(key=lambda r: r["异动"], reverse=True)
+    return rows
+
+
+def format_report(ranked: List[Dict], total: int, today: int, elapsed: float, top: int = TOP_N) -> str:
+    """生成 Markdown 报告（每类取前 top 名）"""
+    lines = [
+        f"# 全市场成交量异动扫描 - {int_to_date(today)}",
+        "",
+        f"- 扫描时间：{datetime.now().strftime('%Y-%m-%d %H:%M')}，共 {total} 只，异动 {len(ranked)} 只，耗时 {elapsed:.1f} 秒",
+        "",
+    ]
+    for vp_type in VOLUME_UP_TYPES + VOLUME_DOWN_TYPES:
+        group = [r for r in ranked if r["类型"] == vp_type]
+        lines.append(f"## {vp_type}（{len(group)} 只）")
+        lines.append("")
+        if not group:
+            lines.append("*无*")
+            lines.append("")
+            continue
+        lines.append("| 代码 | 名称 | 最新价 | 涨跌幅 | 成交量(万手) | 预计全天(万手) | 量比 | 换手率 |")
+        lines.append("|------|------|--------|--------|--------------|----------------|------|--------|")
+        for r in group[:top]:
+            projected = f"{r['预计全天_万手']:.2f}" if r["预计全天_万手"] is not None else "-"
+            lines.append(
+                f"| {r['代码']} | {r['名称']} | {r['最新价']:.2f} | {r['涨跌幅']:.2f}% | {r['成交量_万手']:.2f} | "
+                f"{projected} | {r['量比']:.2f} | {r['换手率']:.2f}% |"
+            )
+        lines.append("")
+    return "\n".join(lines)
+
+
+def save_results(report: str, ranked: List[Dict], today: int) -> Tuple[Path, Path]:
+    """保存 Markdown 报告和完整排行 CSV"""
+    reports_dir = config.reports_dir
+    reports_dir.mkdir(parents=True, exist_ok=True)
+    stamp = f"{int_to_date(today)}_{datetime.now().strftime('%H%M')}"
+    md_path = reports_dir / f"{stamp}_成交量异动扫描.md"
+    md_path.write_text(report, encoding="utf-8")
+    csv_path = reports_dir / f"{stamp}_成交量异动扫描.csv"
+    with open(csv_path, "w", encoding="utf-8-sig", newline="") as f:
+        fields = [key for key in (ranked[0] if ranked else {}) if key != "异动"]
+        writer = csv.DictWriter(f, fieldnames=fields, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(ranked)
+    return md_path, csv_path
+
+
+# ========== 入口 ==========
+
+async def _fetch(days: int):
+    async with AsyncEastMoneyClient() as em:
+        snapshot = await fetch_market_snapshot(em)
+        today = trade_date(snapshot)
+        stale = stale_secids([row["secid"] for row in snapshot], today, days + 1)
+        if stale:
+            print(f"本地K线缺失或落后的标的 {len(stale)} 只，开始补齐...")
+            await refresh_histories(em, stale, days + 1)
+    return snapshot, today
+
+
+def scan(days: int = SCAN_DAYS, top: int = TOP_N, workers: Optional[int] = None) -> Tuple[Path, Path]:
+    """执行全市场扫描并保存结果"""
+    start = time.perf_counter()
+    snapshot, today = asyncio.run(_fetch(days))
+    print(f"全市场快照 {len(snapshot)} 只（{time.perf_counter() - start:.1f} 秒）")
+
+    secids = [row["secid"] for row in snapshot]
+    columns, lengths = load_histories(secids, days, today, workers)
+    print(f"读取历史K线完成（{time.perf_counter() - start:.1f} 秒）")
+
+    now = datetime.now()
+    batch = classify(snapshot, columns, lengths, days, now)
+    ranked = rank(snapshot, batch)
+    elapsed = time.perf_counter() - start
+    md_path, csv_path = save_results(format_report(ranked, len(snapshot), today, elapsed, top), ranked, today)
+    print(f"扫描完成，耗时 {elapsed:.1f} 秒，异动 {len(ranked)} 只")
+    print(f"报告: {md_path}")
+    print(f"排行: {csv_path}")
+
+    # 收盘后写回当日K线，次日扫描不必逐只补齐
+    if int(now.strftime("%Y%m%d")) == today and now.hour * 100 + now.minute >= 1500:
+        store_snapshot(snapshot, today)
+    return md_path, csv_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="全市场成交量异动扫描")
+    parser.add_argument("--days", type=int, default=SCAN_DAYS, help="成交量分析天数")
+    parser.add_argument("--top", type=int, default=TOP_N, help="报告中每类显示的数量")
+    parser.add_argument("--workers", type=int, default=None, help="解析历史K线的进程数（默认 CPU 核数）")
+    args = parser.parse_args()
+    scan(args.days, args.top, args.workers)
+
+
+if __name__ == "__main__":
+    main()
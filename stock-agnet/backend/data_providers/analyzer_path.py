@@ -0,0 +1,15 @@
+"""
+分析脚本目录的导入路径
+K线列式存储、周期合成等纯计算模块只在分析脚本（stock-reports/analyzer）中维护一份，
+后端导入本模块后即可按分析脚本的扁平模块名导入（from kline_frame import ...）。
+默认为仓库中与 stock-agnet 同级的 analyzer 目录，可通过环境变量 STOCK_ANALYZER_DIR 覆盖。
+"""
+import os
+import sys
+from pathlib import Path
+
+ANALYZER_DIR = Path(os.getenv("STOCK_ANALYZER_DIR", str(Path(__file__).resolve().parents[3] / "analyzer")))
+
+# 追加在末尾，后端自身的同名模块优先
+if str(ANALYZER_DIR) not in sys.path:
+    sys.path.append(str(ANALYZER_DIR))
@@ -5,11 +5,14 @@
 """
 import requests
 import json
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from datetime import datetime
 
 from models import MarketIndex, StockQuote, TechnicalIndicators, CapitalFlow, MACD, KDJ
 import database
+from data_providers.kline_store import KlineStore
+from data_providers.kline_frame import KlineFrame, parse_kline_columns
+from data_providers.resampler import DAILY_KLT, resample, source_count, source_klt
 
 # 东方财富 API Headers - 模拟浏览器请求
 HEADERS = {
@@ -28,6 +31,12 @@ HEADERS = {
 }
 
 
+def _number(d: Dict[str, Any], key: str) -> float:
+    """取数值字段，停牌等情况下接口返回 "-" 时按 0 处理"""
+    value = d.get(key)
+    return value if isinstance(value, (int, float)) else 0
+
+
 class EastMoneyDataProvider:
     """东方财富数据提供者"""
     
@@ -36,6 +45,8 @@ class EastMoneyDataProvider:
         self.history_url = "http://push2his.eastmoney.com/api/qt"
         # 添加UT令牌用于API验证
         self.ut_token = "fa5fd1943c7b386f172d6893dbfba10b"
+        # K线本地存储（与分析脚本共用同一个库文件）
+        self.kline_store = KlineStore()
     
     def get_market_index(self, code: str = "1.000001") -> MarketIndex:
         """
@@ -230,6 +241,102 @@ class EastMoneyDataProvider:
         
         return None
     
+    def get_stock_quotes(self, symbols: List[str]) -> Dict[str, StockQuote]:
+        """
+        批量获取个股实时行情 - 使用东方财富多标的列表接口，一次请求最多 100 只
+        Args:
+            symbols: 股票代码列表 (如 ["600519", "000001"])
+        Returns:
+            {symbol: StockQuote}，获取失败的股票不包含在结果中
+        """
+        quotes = {}
+        pending = []
+        for symbol in dict.fromkeys(symbols):
+            cached = database.get_cached_quote(symbol)
+            if cached:
+                quotes[symbol] = StockQuote(
+                    symbol=cached.get("symbol", symbol),
+                    name=cached.get("name", ""),
+                    current=cached.get("current", 0),
+                    open=cached.get("open", 0),
+                    high=cached.get("high", 0),
+                    low=cached.get("low", 0),
+                    volume=cached.get("volume", 0),
+                    amount=cached.get("amount", 0),
+                    change=cached.get("change", 0),
+                    changeRate=cached.get("change_rate", 0)
+                )
+            else:
+                pending.append(symbol)
+        
+        for i in range(0, len(pending), 100):
+            chunk = pending[i:i + 100]
+            # 按 "市场.代码" 映射回请求的 symbol（可能带 SH/SZ 前缀），沪深同代码的标的不会互相覆盖
+            by_secid = {self._to_secid(symbol): symbol for symbol in chunk}
+            params = {
+                'fltt': 1,
+                'invt': 2,
+                'fields': 'f2,f3,f4,f5,f6,f12,f13,f14,f15,f16,f17,f20,f21',
+                'secids': ','.join(self._to_secid(symbol) for symbol in chunk),
+                'ut': self.ut_token,
+            }
+            try:
+                response = requests.get(f"{self.base_url}/ulist.np/get", params=params, headers=HEADERS, timeout=15)
+                data = json.loads(response.text)
+                diff = (data.get('data') or {}).get('diff') or []
+                if isinstance(diff, dict):
+                    diff = list(diff.values())
+                
+                for d in diff:
+                    symbol = by_secid.get(f"{d.get('f13')}.{d.get('f12')}")
+                    if symbol is None:
+                        continue
+                    quote = StockQuote(
+                        symbol=symbol,
+                        name=d.get('f14', ''),
+                        current=_number(d, 'f2'),
+                        open=_number(d, 'f17'),
+                        high=_number(d, 'f15'),
+                        low=_number(d, 'f16'),
+                        volume=_number(d, 'f5'),
+                        amount=_number(d, 'f6'),
+                        change=_number(d, 'f4'),
+                        changeRate=_number(d, 'f3') / 100,
+                        totalValue=_number(d, 'f20'),
+                        circulationValue=_number(d, 'f21')
+                    )
+                    quotes[symbol] = quote
+                    
+                    # 保存到数据库缓存，后续单只查询直接命中
+                    database.cache_stock_quote({
+                        "symbol": symbol,
+                        "name": quote.name,
+                        "current": quote.current,
+                        "open": quote.open,
+                        "high": quote.high,
+                        "low": quote.low,
+                        "volume": quote.volume,
+                        "amount": quote.amount,
+                        "change": quote.change,
+                        "changeRate": quote.changeRate
+                    })
+            except Exception as e:
+                print(f"批量获取股票行情失败: {e}")
+                print(f"请求参数: {params}")
+        
+        return quotes
+    
+    @staticmethod
+    def _to_secid(symbol: str) -> str:
+        """股票代码（支持 SH/SZ 前缀）转换为东方财富 secid"""
+        if symbol.startswith('SH'):
+            return f"1.{symbol[2:]}"
+        if symbol.startswith('SZ'):
+            return f"0.{symbol[2:]}"
+        if symbol.startswith(('6', '5')):  # 上海市场
+            return f"1.{symbol}"
+        return f"0.{symbol}"  # 深圳市场
+    
     def get_technical_indicators(self, symbol: str) -> TechnicalIndicators:
         """
         获取技术指标（基于历史K线数据计算）
@@ -267,25 +374,26 @@ class EastMoneyDataProvider:
         
         if kline_data and len(kline_data) >= 20:
             # 计算移动平均线
-            closes = [float(item['收盘']) for item in kline_data]
-            ma5 = sum(closes[-5:]) / 5 if len(closes) >= 5 else closes[-1]
-            ma10 = sum(closes[-10:]) / 10 if len(closes) >= 10 else closes[-1]
-            ma20 = sum(closes[-20:]) / 20 if len(closes) >= 20 else closes[-1]
-            ma60 = sum(closes[-60:]) / 60 if len(closes) >= 60 else ma20
+            closes = kline_data.close
+            ma5 = float(closes[-5:].mean()) if len(closes) >= 5 else float(closes[-1])
+            ma10 = float(closes[-10:].mean()) if len(closes) >= 10 else float(closes[-1])
+            ma20 = float(closes[-20:].mean()) if len(closes) >= 20 else float(closes[-1])
+            ma60 = float(closes[-60:].mean()) if len(closes) >= 60 else ma20
             
             # 简化的MACD计算（实际应用中应使用更精确的算法）
-            ema12 = sum(closes[-12:]) / 12
-            ema26 = sum(closes[-26:]) / 26
+            ema12 = float(closes[-12:].mean())
+            ema26 = float(closes[-26:].mean())
             diff = ema12 - ema26
             dea = diff * 0.2  # 简化计算
             histogram = diff - dea
             
             # 简化的KDJ计算
-            high_prices = [float(item['最高']) for item in kline_data[-9:]]
-            low_prices = [float(item['最低']) for item in kline_data[-9:]]
-            current_close = closes[-1]
+            recent = kline_data.tail(9)
+            high_price = float(recent.high.max())
+            low_price = float(recent.low.min())
+            current_close = float(closes[-1])
             
-            rsv = ((current_close - min(low_prices)) / (max(high_prices) - min(low_prices))) * 100
+            rsv = ((current_close - low_price) / (high_price - low_price)) * 100
             k = rsv * 0.333 + 50 * 0.667  # 简化计算
             d = k * 0.333 + 50 * 0.667
             j = 3 * k - 2 * d
@@ -402,67 +510,41 @@ class EastMoneyDataProvider:
         })
         
         return capital
-    def _get_kline_data(self, secid: str, days: int = 30):
-        """获取K线历史数据 - 使用东方财富真实API"""
+    def _get_kline_data(self, secid: str, days: int = 30, klt: int = DAILY_KLT) -> Optional[KlineFrame]:
+        """获取K线历史数据 - 经本地K线存储增量更新，只请求缺失的尾部
+        返回按列保存的 KlineFrame，kline_data[-1] 仍可按中文键取值
+        klt: 1/5/15/30/60 分钟、101 日线、102 周线、103 月线；
+        只有 1 分钟线和日线请求接口，其余周期由其在本地合成
+        """
+        base = source_klt(klt)
+        if base != klt:
+            frame = self._get_kline_data(secid, source_count(days, klt), base)
+            return resample(frame, klt, secid).tail(days) if frame else None
         try:
-            url = (
-                f"{self.history_url}/stock/kline/get?"
-                f"cb=jQuery123456789&"
-                f"secid={secid}&"
-                f"ut={self.ut_token}&"
-                f"fields1=f1,f2,f3,f4,f5,f6&"
-                f"fields2=f51,f52,f53,f54,f55,f56,f57,f58,f59,f60,f61&"
-                f"klt=101&fqt=1&beg=0&end=20500101&smplmt=460&lmt={days + 5}"
-            )
+            klines = self.kline_store.get_klines(secid, days, klt)
             
-            resp = requests.get(url, headers=HEADERS, timeout=15)
-            # 处理JSONP响应
-            json_str = resp.text.strip()
-            if json_str.startswith('jQuery'):
-                start = json_str.find('(') + 1
-                end = json_str.rfind(')')
-                json_str = json_str[start:end]
-            
-            # 确保有有效内容
-            if not json_str or json_str.isspace():
-                print(f"K线API返回空内容")
-                return None
-                
-            try:
-                data = json.loads(json_str)
-            except json.JSONDecodeError as e:
-                print(f"JSON解析失败: {e}")
-                print(f"原始响应长度: {len(resp.text)}, 内容: {resp.text[:200]}...")
-                return None
-            
-            if data.get("data") and data["data"].get("klines"):
-                klines = data["data"]["klines"][-days:]
-                result = []
-                for line in klines:
-                    parts = line.split(",")
-                    result.append({
-                        "日期": parts[0],
-                        "开盘": float(parts[1]),
-                        "收盘": float(parts[2]),
-                        "最高": float(parts[3]),
-                        "最低": float(parts[4]),
-                        "成交量": float(parts[5]),
-                        "成交额": float(parts[6]),
-                        "振幅": float(parts[7]) if parts[7] != "-" else 0,
-                        "涨跌幅": float(parts[8]) if parts[8] != "-" else 0,
-                        "涨跌额": float(parts[9]) if parts[9] != "-" else 0,
-                        "换手率": float(parts[10]) if parts[10] != "-" else 0,
-                    })
-                return result
+            if klines:
+                return KlineFrame.from_lines(klines)
             return None
         except Exception as e:
             print(f"获取K线数据失败: {e}")
-            print(f"请求URL: {url}")
             return None
     
-    def _get_money_flow_data(self, secid: str, days: int = 3):
-        """获取资金流向数据 - 使用东方财富真实API"""
-        try:
+    def _get_money_flow_data(self, secid: str, days: int = 3, klt: int = DAILY_KLT):
+        """获取资金流向数据 - 使用东方财富真实API
+        默认请求日级资金流向（只取最近 days 天）；klt=1 时请求当日分钟级资金流向
+        """
+        if klt == DAILY_KLT:
+            url = (
+                f"{self.history_url}/stock/fflow/daykline/get?"
+                f"lmt={days}&klt=101&"
+                f"secid={secid}&"
+                f"fields1=f1,f2,f3,f7&"
+                f"fields2=f51,f52,f53,f54,f55,f56&"
+                f"ut={self.ut_token}&"
+                f"cb=jQuery123456789"
+            )
+        else:
             url = (
                 f"{self.base_url}/stock/fflow/kline/get?"
                 f"lmt=0&klt=1&"
@@ -472,7 +554,7 @@ class EastMoneyDataProvider:
                 f"ut={self.ut_token}&"
                 f"cb=jQuery123456789"
             )
-            
+        try:
             resp = requests.get(url, headers=HEADERS, timeout=15)
             # 处理JSONP响应
             json_str = resp.text
@@ -484,19 +566,13 @@ class EastMoneyDataProvider:
             data = json.loads(json_str)
             
             if data.get("data") and data["data"].get("klines"):
-                klines = data["data"]["klines"][-days:]
-                result = []
-                for line in klines:
-                    parts = line.split(",")
-                    result.append({
-                        "日期": parts[0],
-                        "主力净流入": float(parts[1]) if parts[1] != "-" else 0,
-                        "小单净流入": float(parts[2]) if parts[2] != "-" else 0,
-                        "中单净流入": float(parts[3]) if parts[3] != "-" else 0,
-                        "大单净流入": float(parts[4]) if parts[4] != "-" else 0,
-                        "超大单净流入": float(parts[5]) if parts[5] != "-" else 0,
-                    })
-                return result
+                labels = ("主力净流入", "小单净流入", "中单净流入", "大单净流入", "超大单净流入")
+                date_strs, values = parse_kline_columns(data["data"]["klines"][-days:], len(labels))
+                columns = [values[j].tolist() for j in range(len(labels))]
+                return [
+                    {"日期": date, **{label: column[i] for label, column in zip(labels, columns)}}
+                    for i, date in enumerate(date_strs.tolist())
+                ]
             return None
         except Exception as e:
             print(f"获取资金流向失败: {e}")
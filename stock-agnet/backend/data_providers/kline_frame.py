@@ -0,0 +1,16 @@
+"""
+K线列式存储
+直接使用 stock-reports/analyzer/kline_frame.py（不再维护副本，导入路径见 analyzer_path.py）
+"""
+from data_providers import analyzer_path  # noqa: F401
+from kline_frame import (  # noqa: E402
+    COLUMNS,
+    MISSING,
+    KlineFrame,
+    date_to_int,
+    format_time,
+    int_to_date,
+    parse_dates,
+    parse_kline_columns,
+    parse_times,
+)
@@ -0,0 +1,7 @@
+"""
+K线本地增量存储
+直接使用 stock-reports/analyzer/kline_store.py（不再维护副本，导入路径见 analyzer_path.py）：
+与分析脚本读写同一个库文件（分析脚本 DATA_DIR 下的 kline.db，WAL 模式，可同时读写）
+"""
+from data_providers import analyzer_path  # noqa: F401
+from kline_store import DB_PATH, TAIL_REFRESH_SECONDS, KlineStore, store  # noqa: E402
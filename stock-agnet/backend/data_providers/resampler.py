@@ -0,0 +1,23 @@
+"""
+K线周期合成
+直接使用 stock-reports/analyzer/resampler.py（不再维护副本，导入路径见 analyzer_path.py）
+"""
+from data_providers import analyzer_path  # noqa: F401
+from resampler import (  # noqa: E402
+    A_SHARE_SESSIONS,
+    DAILY_KLT,
+    DAYS_PER_BAR,
+    HK_MARKETS,
+    HK_SESSIONS,
+    KLT_NAMES,
+    KLTS,
+    MINUTE_KLTS,
+    MONTHLY_KLT,
+    WEEKLY_KLT,
+    resample,
+    resample_calendar,
+    resample_minutes,
+    sessions_for,
+    source_count,
+    source_klt,
+)
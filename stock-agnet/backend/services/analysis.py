@@ -2,7 +2,7 @@
 多维度分析引擎
 提供技术面、基本面、资金面等综合分析
 """
-from typing import List
+from typing import List, Optional
 from models import (
     Portfolio, Position, StockQuote, Analysis, TechnicalIndicators,
     CapitalFlow, Recommendation, StockAnalysis, MarketIndex
@@ -41,20 +41,25 @@ class AnalysisEngine:
         """分析整个持仓组合"""
         stock_analyses = []
         
-        for position in portfolio.positions:
-            analysis = self.analyze_stock(position)
+        # 一次请求批量获取所有持仓的实时行情
+        symbols = [self._normalize_symbol(p.symbol) for p in portfolio.positions]
+        quotes = data_provider.get_stock_quotes(symbols)
+        
+        for position, symbol in zip(portfolio.positions, symbols):
+            analysis = self.analyze_stock(position, quote=quotes.get(symbol))
             stock_analyses.append(analysis)
         
         return stock_analyses
     
-    def analyze_stock(self, position: Position) -> StockAnalysis:
-        """分析单只股票"""
+    def analyze_stock(self, position: Position, quote: Optional[StockQuote] = None) -> StockAnalysis:
+        """分析单只股票（quote 为已批量获取的行情，为 None 时单独请求）"""
         # 标准化股票代码格式
         normalized_symbol = self._normalize_symbol(position.symbol)
         print(f"分析股票: {position.symbol} -> {normalized_symbol}")
         
         # 获取实时行情
-        quote = data_provider.get_stock_quote(normalized_symbol)
+        if quote is None:
+            quote = data_provider.get_stock_quote(normalized_symbol)
         if not quote:
             quote = StockQuote(
                 symbol=normalized_symbol,